@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 """
 Точка входа для утилиты gitops.
-Позволяет выполнять операции push и pull через интерактивный интерфейс.
+Позволяет выполнять операции push и pull через интерактивный интерфейс
+или без него (команды `status`, `push`, `pull` для скриптов и cron).
 """
 
-from apps.gitops.src.core import main
+from apps.gitops.src.cli import main
 
 if __name__ == "__main__":
     main()
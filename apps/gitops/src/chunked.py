@@ -0,0 +1,231 @@
+"""
+Коммит и отправка больших наборов изменений частями.
+
+После крупного импорта (десятки тысяч переименованных изображений)
+один автоматический коммит даёт один огромный пакет, отправка которого
+по HTTP часто обрывается по тайм-ауту и начинается заново. Вместо
+этого изменения делятся на коммиты, ограниченные числом файлов и
+объёмом (секция `gitops.chunked` в `config.yml`), а коммиты
+отправляются по одному.
+
+Возобновление не требует отдельного состояния: после каждой успешной
+отправки Git обновляет ссылку отслеживания, поэтому при повторном
+запуске `pending_commits()` возвращает только неотправленные части.
+"""
+from time import perf_counter
+from typing import NamedTuple
+
+from apps.gitops.src.largefiles import SizeReport, measure_changes
+from apps.gitops.src.utils import FileChange, GitSession, UpstreamRef
+
+MIB: int = 1024 * 1024
+DEFAULT_CHUNK_FILES: int = 2000
+DEFAULT_CHUNK_SIZE_MIB: float = 100.0
+
+
+class ChunkLimits(NamedTuple):
+    """Ограничения одной части (секция `gitops.chunked`)."""
+    max_files: int = DEFAULT_CHUNK_FILES
+    max_size: int = round(DEFAULT_CHUNK_SIZE_MIB * MIB)
+
+    @classmethod
+    def from_config(cls, config: dict | None) -> "ChunkLimits":
+        """
+        Создаёт ограничения из секции конфига.
+
+        Args:
+            config (dict | None): Секция `gitops.chunked`.
+
+        Returns:
+            ChunkLimits: Ограничения (по умолчанию для отсутствующих
+                ключей).
+        """
+        config = config or {}
+        return cls(
+            max_files=max(
+                1, int(config.get("max_files", DEFAULT_CHUNK_FILES))
+            ),
+            max_size=round(
+                float(config.get("max_size_mib", DEFAULT_CHUNK_SIZE_MIB))
+                * MIB
+            ),
+        )
+
+
+class Chunk(NamedTuple):
+    """Часть изменений для одного коммита."""
+    changes: list[FileChange]
+    size: int
+
+
+class PushedChunk(NamedTuple):
+    """Итог отправки одного коммита."""
+    commit: str
+    # Объём объектов коммита на диске (`git rev-list --disk-usage`)
+    size: int | None
+    elapsed: float
+    ok: bool
+
+    @property
+    def throughput(self) -> float | None:
+        """Скорость отправки в байтах в секунду."""
+        if self.size is None or self.elapsed <= 0:
+            return None
+        return self.size / self.elapsed
+
+
+def plan_chunks(
+    git: GitSession,
+    changes: list[FileChange],
+    limits: ChunkLimits | None = None,
+    report: SizeReport | None = None,
+) -> list[Chunk]:
+    """
+    Делит изменения на части.
+
+    Файлы идут в порядке `git status` (по путям), поэтому файлы одной
+    директории обычно попадают в одну часть. Файл больше `max_size`
+    образует отдельную часть.
+
+    Args:
+        git (GitSession): Сеанс Git.
+        changes (list[FileChange]): Изменения из снимка состояния.
+        limits (ChunkLimits | None): Ограничения части.
+        report (SizeReport | None): Размеры тех же изменений, уже
+            полученные `measure_changes()` (например, при проверке
+            крупных файлов). По умолчанию файлы измеряются заново.
+
+    Returns:
+        list[Chunk]: Части (пустой список, если изменений нет).
+    """
+    limits = limits or ChunkLimits()
+    report = report or measure_changes(git, changes)
+    changes = report.changes
+    sizes = {file.path: file.size for file in report.files}
+
+    chunks: list[Chunk] = []
+    current: list[FileChange] = []
+    current_size = 0
+    for change in changes:
+        size = sizes.get(change.path, 0)
+        if current and (
+            len(current) >= limits.max_files
+            or current_size + size > limits.max_size
+        ):
+            chunks.append(Chunk(current, current_size))
+            current, current_size = [], 0
+        current.append(change)
+        current_size += size
+    if current:
+        chunks.append(Chunk(current, current_size))
+    return chunks
+
+
+def commit_chunk(git: GitSession, chunk: Chunk, message: str) -> bool:
+    """
+    Создаёт коммит только из файлов части.
+
+    Файлы добавляются в индекс (`GitSession.stage()`), а `git commit
+    --only` фиксирует только их: изменения, уже находящиеся в индексе
+    для других частей, в коммит не попадают.
+
+    Args:
+        git (GitSession): Сеанс Git.
+        chunk (Chunk): Часть изменений.
+        message (str): Сообщение коммита.
+
+    Returns:
+        bool: True, если коммит создан.
+    """
+    paths: list[str] = []
+    for change in chunk.changes:
+        paths.append(change.path)
+        # У переименования в коммит должен попасть и исходный путь
+        if change.orig_path:
+            paths.append(change.orig_path)
+    return git.stage(chunk.changes, silent=True) and bool(git.run(
+        [
+            "commit",
+            "--quiet",
+            "--only",
+            "-m", message,
+            "--pathspec-from-file=-",
+            "--pathspec-file-nul",
+        ],
+        silent=True,
+        env={"GIT_LITERAL_PATHSPECS": "1"},
+        input="".join(f"{path}\0" for path in paths),
+    ))
+
+
+def pending_commits(git: GitSession) -> list[str]:
+    """
+    Возвращает неотправленные коммиты от старых к новым.
+
+    Returns:
+        list[str]: Хэши коммитов `@{u}..HEAD`.
+    """
+    output = git.query(["rev-list", "--reverse", "@{u}..HEAD"])
+    return output.split() if output else []
+
+
+def commit_size(git: GitSession, commit: str, base: str) -> int | None:
+    """
+    Оценивает объём объектов, которые отправит push коммита.
+
+    Args:
+        git (GitSession): Сеанс Git.
+        commit (str): Отправляемый коммит.
+        base (str): Последний отправленный коммит или ссылка.
+
+    Returns:
+        int | None: Объём в байтах или None, если Git его не сообщил.
+    """
+    output = git.query(
+        ["rev-list", "--objects", "--disk-usage", commit, f"^{base}"]
+    )
+    try:
+        return int(output) if output else None
+    except ValueError:
+        return None
+
+
+def push_commits(
+    git: GitSession,
+    upstream: UpstreamRef,
+    commits: list[str],
+    silent: bool = False,
+) -> list[PushedChunk]:
+    """
+    Отправляет коммиты по одному, начиная со старого.
+
+    Каждый push передаёт только объекты своего коммита, поэтому обрыв
+    связи теряет одну часть, а не всю отправку. Отправка
+    останавливается на первой ошибке.
+
+    Args:
+        git (GitSession): Сеанс Git.
+        upstream (UpstreamRef): Upstream текущей ветки.
+        commits (list[str]): Коммиты из `pending_commits()`.
+        silent (bool): Если True — без вывода и индикатора прогресса.
+
+    Returns:
+        list[PushedChunk]: Итоги отправленных (и первой неудачной) частей.
+    """
+    results: list[PushedChunk] = []
+    base = upstream.tracking_ref
+    for commit in commits:
+        size = commit_size(git, commit, base)
+        started = perf_counter()
+        args = ["push", upstream.remote, f"{commit}:{upstream.remote_ref}"]
+        if silent:
+            ok = bool(git.run([*args, "--quiet"], silent=True))
+        else:
+            ok = git.stream(args)
+        results.append(
+            PushedChunk(commit, size, perf_counter() - started, ok)
+        )
+        if not ok:
+            break
+        base = commit
+    return results
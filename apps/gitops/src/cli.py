@@ -0,0 +1,643 @@
+"""
+Неинтерактивный интерфейс GitOps для скриптов и cron.
+
+Команды `status`, `push` и `pull` не задают вопросов: изменяющие
+действия выполняются только с флагом `--yes`, а без него команда
+сообщает, что нужно сделать, и завершается с кодом `EXIT_PENDING`.
+С флагом `--json` результат выводится одним JSON-объектом.
+
+Модуль не импортирует rich и questionary: они загружаются только
+при запуске интерактивного меню (без команды), поэтому вызов из cron
+стартует быстро.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from apps.gitops.src.chunked import (
+    ChunkLimits,
+    PushedChunk,
+    commit_chunk,
+    pending_commits,
+    plan_chunks,
+    push_commits,
+)
+from apps.gitops.src.largefiles import (
+    SizeLimits,
+    SizeReport,
+    lfs_available,
+    measure_changes,
+    renormalize,
+    track_with_lfs,
+)
+from apps.gitops.src.maintenance import (
+    ObjectStats,
+    benchmark,
+    object_stats,
+    recommend_tasks,
+    run_tasks,
+    schedule,
+)
+from apps.gitops.src.utils import (
+    FetchOptions,
+    GitSession,
+    RepoState,
+    auto_commit_message,
+)
+from apps.shared import profiling
+from apps.shared.formatting import format_size
+
+CONFIG_PATH: Path = Path(__file__).resolve().parents[2] / "config.yml"
+
+# Коды завершения
+EXIT_OK: int = 0  # Успех, делать нечего
+EXIT_ERROR: int = 1  # Ошибка Git или репозиторий недоступен
+EXIT_USAGE: int = 2  # Неверные аргументы (argparse)
+EXIT_PENDING: int = 3  # Требуются действия, но не подтверждены `--yes`
+
+
+class CommandResult:
+    """Результат команды: состояние, выполненные действия и ошибка."""
+
+    def __init__(self, command: str, repo: Path):
+        self.command = command
+        self.repo = repo
+        self.state: RepoState | None = None
+        self.actions: list[str] = []
+        self.pending: list[str] = []
+        self.settings: dict[str, str | None] = {}
+        self.sizes: SizeReport | None = None
+        self.chunks: list[PushedChunk] = []
+        self.objects: ObjectStats | None = None
+        self.timings: dict[str, dict[str, float]] = {}
+        self.error: str | None = None
+
+    @property
+    def exit_code(self) -> int:
+        """Код завершения процесса."""
+        if self.error:
+            return EXIT_ERROR
+        if self.pending:
+            return EXIT_PENDING
+        return EXIT_OK
+
+    def to_dict(self) -> dict:
+        """Представление для вывода в JSON."""
+        state = self.state
+        return {
+            "command": self.command,
+            "repo": str(self.repo),
+            "ok": self.error is None,
+            "exit_code": self.exit_code,
+            "branch": state.branch if state else None,
+            "head": state.head if state else None,
+            "upstream": state.upstream if state else None,
+            "ahead": state.ahead if state else None,
+            "behind": state.behind if state else None,
+            "upstream_gone": state.upstream_gone if state else None,
+            "changes": [
+                change._asdict() for change in state.changes
+            ] if state else [],
+            "actions": self.actions,
+            "pending": self.pending,
+            "settings": self.settings,
+            "growth": self.sizes.growth if self.sizes else None,
+            "large_files": [
+                file._asdict() for file in self.sizes.large
+            ] if self.sizes else [],
+            "chunks": [
+                dict(chunk._asdict(), throughput=chunk.throughput)
+                for chunk in self.chunks
+            ],
+            "objects": self.objects._asdict() if self.objects else None,
+            "timings": self.timings,
+            "error": self.error,
+        }
+
+    def print_text(self) -> None:
+        """Выводит результат в текстовом виде."""
+        state = self.state
+        if state:
+            branch = state.branch or "(HEAD отсоединён)"
+            upstream = state.upstream or "не задан"
+            print(f"Ветка: {branch}, upstream: {upstream}")
+            if state.upstream_gone:
+                print(f"Ветка {state.upstream} не найдена")
+            elif state.upstream:
+                print(f"Впереди: {state.ahead}, позади: {state.behind}")
+            print(f"Изменённых файлов: {len(state.changes)}")
+            for change in state.changes:
+                print(f"  {change.short}")
+        if self.sizes:
+            print(f"Прирост истории: {format_size(self.sizes.growth)}")
+            for file in self.sizes.large:
+                note = " (LFS)" if file.lfs else ""
+                print(f"  {format_size(file.size):>10}  {file.path}{note}")
+        for number, chunk in enumerate(self.chunks, 1):
+            status = "ok" if chunk.ok else "ошибка"
+            speed = chunk.throughput
+            print(
+                f"Часть {number}: {chunk.commit[:10]}, {chunk.elapsed:.1f} с"
+                + (f", {format_size(speed)}/с" if speed else "")
+                + f" — {status}"
+            )
+        if self.objects:
+            for name, value in self.objects.as_rows():
+                print(f"{name}: {value}")
+        for stage, timings in self.timings.items():
+            stage = {"before": "до", "after": "после"}.get(stage, stage)
+            print(f"Время команд ({stage}): " + ", ".join(
+                f"{name} {elapsed * 1000:.1f} мс"
+                for name, elapsed in timings.items()
+            ))
+        for key, value in self.settings.items():
+            print(f"{key} = {value if value is not None else '(не задано)'}")
+        for action in self.actions:
+            print(f"Выполнено: {action}")
+        for action in self.pending:
+            print(f"Требуется: {action} (запустите с --yes)")
+        if self.error:
+            print(f"Ошибка: {self.error}", file=sys.stderr)
+
+
+def load_gitops_config() -> dict:
+    """
+    Читает секцию `gitops` из `config.yml`.
+
+    Returns:
+        dict: Секция (пустая, если конфиг недоступен).
+    """
+    # yaml нужен только командам, которые читают настройки
+    import yaml
+
+    try:
+        with open(CONFIG_PATH, "r", encoding="utf-8") as file:
+            config = yaml.safe_load(file) or {}
+    except (OSError, yaml.YAMLError):
+        return {}
+    return config.get("gitops") or {}
+
+
+def load_fetch_options() -> FetchOptions:
+    """
+    Читает параметры fetch из секции `gitops.fetch` в `config.yml`.
+
+    Returns:
+        FetchOptions: Параметры (по умолчанию, если конфиг недоступен).
+    """
+    return FetchOptions.from_config(load_gitops_config().get("fetch"))
+
+
+def _load_state(
+    git: GitSession,
+    result: CommandResult,
+    untracked: bool = True,
+) -> RepoState | None:
+    """Получает состояние репозитория, записывая ошибку в результат."""
+    result.state = git.state(untracked=untracked)
+    if result.state is None:
+        result.error = f"не удалось получить состояние {git.cwd}"
+    return result.state
+
+
+def run_status(git: GitSession, result: CommandResult, args) -> None:
+    """
+    Команда `status`: состояние без сетевых запросов (с `--fetch` —
+    после `git fetch`). Незакоммиченные, неотправленные и неполученные
+    изменения считаются ожидающими действиями.
+    """
+    if args.fetch and git.fetch(load_fetch_options(), silent=True) is None:
+        result.error = "git fetch завершился ошибкой"
+        return
+    state = _load_state(git, result)
+    if state is None:
+        return
+    if state.changes:
+        result.pending.append("commit")
+    if state.upstream_gone:
+        if git.unpushed_count():
+            result.pending.append("push")
+    elif state.ahead:
+        result.pending.append("push")
+    if state.behind:
+        result.pending.append("pull")
+
+
+def _commit(
+    git: GitSession,
+    result: CommandResult,
+    state: RepoState,
+    args,
+    lfs_paths: list[str],
+    chunk_limits: ChunkLimits,
+    report: SizeReport | None = None,
+) -> int:
+    """
+    Создаёт автоматический коммит (с `--chunked` — несколько коммитов
+    по частям). Части планируются по уже измеренным размерам `report`,
+    если они относятся к тому же снимку.
+
+    Returns:
+        int: Число созданных коммитов (при ошибке она записывается
+            в результат).
+    """
+    message = args.message or auto_commit_message()
+    chunks = (
+        plan_chunks(git, state.changes, chunk_limits, report)
+        if args.chunked else []
+    )
+    if len(chunks) < 2:
+        if not (
+            git.stage(state.changes, silent=True)
+            and (not lfs_paths or renormalize(git, lfs_paths))
+            and git.run(["commit", "-q", "-m", message], silent=True)
+        ):
+            result.error = "не удалось создать коммит"
+            return 0
+        result.actions.append("commit")
+        return 1
+
+    if lfs_paths and not renormalize(git, lfs_paths):
+        result.error = "не удалось создать коммит"
+        return 0
+    for number, chunk in enumerate(chunks, 1):
+        part = f"{number}/{len(chunks)}"
+        if not commit_chunk(git, chunk, f"{message} ({part})"):
+            result.error = f"не удалось создать коммит {part}"
+            return number - 1
+        result.actions.append(f"commit {part}")
+    return len(chunks)
+
+
+def _push_chunked(git: GitSession, result: CommandResult) -> bool:
+    """
+    Отправляет неотправленные коммиты по одному (`--chunked`).
+
+    Returns:
+        bool: True, если отправка выполнялась по частям; False, если
+            неотправленный коммит один и нужен обычный push.
+    """
+    upstream = git.upstream()
+    commits = pending_commits(git)
+    if upstream is None or len(commits) < 2:
+        return False
+    result.chunks = push_commits(git, upstream, commits, silent=True)
+    sent = sum(chunk.ok for chunk in result.chunks)
+    if sent < len(commits):
+        result.error = (
+            f"отправлено {sent} из {len(commits)} коммитов "
+            "(повторный push продолжит с первого неотправленного)"
+        )
+    else:
+        result.actions.append("push")
+    return True
+
+
+def run_push(git: GitSession, result: CommandResult, args) -> None:
+    """
+    Команда `push`: автоматический коммит (если есть изменения и не
+    указан `--no-commit`) и отправка неотправленных коммитов.
+
+    Файлы больше `gitops.large_files.max_size_mib` не коммитятся: их
+    можно перевести в Git LFS (`--lfs`, для расширений из
+    `lfs_extensions`) или разрешить явно (`--allow-large`).
+
+    С `--chunked` изменения делятся на коммиты по ограничениям секции
+    `gitops.chunked`, а коммиты отправляются по одному: повторный
+    запуск после обрыва продолжает с первого неотправленного.
+    """
+    state = _load_state(git, result)
+    if state is None:
+        return
+
+    config = load_gitops_config()
+    ahead = state.ahead
+    if state.changes and not args.no_commit:
+        limits = SizeLimits.from_config(config.get("large_files"))
+        result.sizes = measure_changes(git, state.changes, limits)
+        lfs_paths = [
+            file.path for file in result.sizes.lfs_candidates
+        ] if args.lfs else []
+        if lfs_paths and not lfs_available(git):
+            result.error = "Git LFS не установлен"
+            return
+        oversized = [
+            file.path for file in result.sizes.oversized
+            if file.path not in lfs_paths
+        ]
+        if oversized and not args.allow_large:
+            result.error = (
+                f"файлы больше {format_size(limits.max_size)} "
+                f"(--lfs или --allow-large): {', '.join(oversized)}"
+            )
+            return
+        if not args.yes:
+            result.pending.append("commit")
+        else:
+            if lfs_paths:
+                if not track_with_lfs(git, limits.lfs_extensions):
+                    result.error = "не удалось выполнить git lfs track"
+                    return
+                result.actions.append("lfs track")
+                # .gitattributes тоже должен попасть в коммит
+                state = _load_state(git, result)
+                if state is None:
+                    return
+            ahead += _commit(
+                git,
+                result,
+                state,
+                args,
+                lfs_paths,
+                ChunkLimits.from_config(config.get("chunked")),
+                # После `git lfs track` снимок обновлён и не измерен
+                None if lfs_paths else result.sizes,
+            )
+            if result.error:
+                return
+
+    if state.upstream is None:
+        result.error = "upstream для текущей ветки не задан"
+        return
+    if state.upstream_gone:
+        # Расхождение неизвестно: считаются коммиты вне удалённых веток
+        ahead = git.unpushed_count() or 0
+    if not ahead and "commit" not in result.pending:
+        return
+    if not args.yes:
+        result.pending.append("push")
+        return
+    if args.chunked and _push_chunked(git, result):
+        return
+    if not git.run(["push", "--quiet"], silent=True):
+        result.error = "не удалось выполнить push (выполните pull)"
+        return
+    result.actions.append("push")
+
+
+def run_pull(git: GitSession, result: CommandResult, args) -> None:
+    """
+    Команда `pull`: `git fetch` (если upstream изменился) и, если ветка
+    отстаёт, `git merge --ff-only @{u}`.
+    """
+    if git.fetch(load_fetch_options(), silent=True) is None:
+        result.error = "git fetch завершился ошибкой"
+        return
+    state = _load_state(git, result, untracked=False)
+    if state is None:
+        return
+    if state.upstream is None:
+        result.error = "upstream для текущей ветки не задан"
+        return
+    if state.upstream_gone:
+        result.error = f"ветка {state.upstream} не найдена"
+        return
+    if not state.behind:
+        return
+    if not args.yes:
+        result.pending.append("pull")
+        return
+    if not git.run(["merge", "--ff-only", "--quiet", "@{u}"], silent=True):
+        result.error = "не удалось выполнить fast-forward"
+        return
+    result.actions.append("pull")
+
+
+def run_tune(git: GitSession, result: CommandResult, args) -> None:
+    """
+    Команда `tune`: проверка и включение настроек, ускоряющих `git status`
+    и `git add` (`core.untrackedCache`, `core.fsmonitor`).
+    """
+    settings = git.performance_settings()
+    result.settings = {key: current for key, (current, _) in settings.items()}
+    missing = [
+        key for key, (current, value) in settings.items() if current != value
+    ]
+    if not missing:
+        return
+    if not args.yes:
+        result.pending.extend(f"config {key}=true" for key in missing)
+        return
+    changed = git.enable_performance_settings()
+    result.actions.extend(f"config {key}=true" for key in changed)
+    if len(changed) != len(missing):
+        result.error = "не удалось изменить настройки Git"
+
+
+def run_maintenance(git: GitSession, result: CommandResult, args) -> None:
+    """
+    Команда `maintenance`: статистика хранилища объектов, подбор задач
+    `git maintenance run` и замер `git status` / `git rev-list` до и
+    после их выполнения. С `--schedule` включает фоновое обслуживание
+    (`git maintenance start`).
+    """
+    result.objects = object_stats(git)
+    if result.objects is None:
+        result.error = f"не удалось прочитать хранилище объектов {git.cwd}"
+        return
+    tasks = recommend_tasks(result.objects)
+    if tasks:
+        result.timings["before"] = benchmark(git)
+        if not args.yes:
+            result.pending.extend(f"maintenance {task}" for task in tasks)
+        elif not run_tasks(git, tasks, silent=True):
+            result.error = "git maintenance run завершился ошибкой"
+            return
+        else:
+            result.actions.extend(f"maintenance {task}" for task in tasks)
+            result.timings["after"] = benchmark(git)
+            result.objects = object_stats(git)
+
+    if args.schedule:
+        if not args.yes:
+            result.pending.append("maintenance start")
+        elif schedule(git, silent=True):
+            result.actions.append("maintenance start")
+        else:
+            result.error = "не удалось включить фоновое обслуживание"
+
+
+COMMANDS = {
+    "status": run_status,
+    "push": run_push,
+    "pull": run_pull,
+    "tune": run_tune,
+    "maintenance": run_maintenance,
+}
+
+
+def _add_common_arguments(
+    parser: argparse.ArgumentParser,
+    suppress: bool = False,
+) -> None:
+    """
+    Добавляет общие аргументы.
+
+    Они принимаются и до, и после команды. У подкоманд значения по
+    умолчанию подавлены, чтобы не затирать указанные до команды.
+    """
+    default = argparse.SUPPRESS if suppress else None
+    parser.add_argument(
+        "--repo",
+        metavar="PATH",
+        type=Path,
+        default=default,
+        help="Путь к репозиторию (по умолчанию — репозиторий Repo-Tools)."
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        default=argparse.SUPPRESS if suppress else False,
+        help="Выводит результат одним JSON-объектом."
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        nargs="?",
+        const="",
+        default=default,
+        help="Записывает трассу вызовов Git в JSON и выводит сводку."
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Создаёт парсер аргументов CLI."""
+    parser = argparse.ArgumentParser(
+        description=(
+            "Push и pull через Git. Без команды запускается интерактивное "
+            "меню."
+        ),
+        epilog=(
+            f"Коды завершения: {EXIT_OK} — успех, {EXIT_ERROR} — ошибка, "
+            f"{EXIT_USAGE} — неверные аргументы, {EXIT_PENDING} — нужны "
+            "действия, не подтверждённые --yes."
+        ),
+    )
+    _add_common_arguments(parser)
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    status = commands.add_parser("status", help="Состояние репозитория.")
+    status.add_argument(
+        "--fetch",
+        action="store_true",
+        help="Выполнить git fetch перед проверкой."
+    )
+
+    push = commands.add_parser("push", help="Коммит и отправка изменений.")
+    push.add_argument(
+        "--yes", "-y",
+        action="store_true",
+        help="Выполнить коммит и push без подтверждения."
+    )
+    push.add_argument(
+        "--no-commit",
+        action="store_true",
+        help="Не создавать автоматический коммит."
+    )
+    push.add_argument(
+        "--message", "-m",
+        default=None,
+        help="Сообщение коммита (по умолчанию — auto: <время UTC>)."
+    )
+    push.add_argument(
+        "--lfs",
+        action="store_true",
+        help="Перевести крупные изображения в Git LFS перед коммитом."
+    )
+    push.add_argument(
+        "--allow-large",
+        action="store_true",
+        help="Коммитить файлы больше допустимого размера."
+    )
+    push.add_argument(
+        "--chunked",
+        action="store_true",
+        help=(
+            "Делить изменения на коммиты (gitops.chunked в config.yml) "
+            "и отправлять их по одному."
+        )
+    )
+
+    pull = commands.add_parser(
+        "pull", help="Получение обновлений (только fast-forward)."
+    )
+    pull.add_argument(
+        "--yes", "-y",
+        action="store_true",
+        help="Выполнить pull без подтверждения."
+    )
+
+    tune = commands.add_parser(
+        "tune",
+        help="Проверка настроек core.untrackedCache и core.fsmonitor."
+    )
+    tune.add_argument(
+        "--yes", "-y",
+        action="store_true",
+        help="Включить рекомендуемые настройки в репозитории."
+    )
+
+    maintenance = commands.add_parser(
+        "maintenance",
+        help="Обслуживание хранилища объектов (git maintenance run)."
+    )
+    maintenance.add_argument(
+        "--yes", "-y",
+        action="store_true",
+        help="Выполнить рекомендуемые задачи обслуживания."
+    )
+    maintenance.add_argument(
+        "--schedule",
+        action="store_true",
+        help="Включить фоновое обслуживание (git maintenance start)."
+    )
+
+    for command in (status, push, pull, tune, maintenance):
+        _add_common_arguments(command, suppress=True)
+    return parser
+
+
+def main() -> None:
+    """
+    Точка входа GitOps.
+
+    Пример использования:
+        python -m apps.gitops.gitops status --json
+        python -m apps.gitops.gitops pull --yes --repo ~/cuberbug-walls
+
+    Аргументы CLI:
+        status [--fetch] — состояние репозитория.
+        push [--yes] [--no-commit] [--message MSG] [--lfs]
+            [--allow-large] [--chunked] — коммит и push.
+        pull [--yes] — fetch и pull --ff-only.
+        tune [--yes] — проверка и включение настроек производительности.
+        maintenance [--yes] [--schedule] — обслуживание хранилища
+            объектов с замером команд до и после.
+        --repo PATH — путь к репозиторию.
+        --json — вывод в JSON.
+        --profile [FILE] — замер вызовов Git с записью трассы в JSON
+            (также переменная `REPO_TOOLS_PROFILE`).
+    """
+    args = build_parser().parse_args()
+    profiling.setup(args.profile)
+
+    if args.command is None:
+        # UI-библиотеки нужны только интерактивному меню
+        from apps.gitops.src.core import main as interactive_main
+        interactive_main(args.repo)
+        return
+
+    git = GitSession(args.repo)
+    result = CommandResult(args.command, git.cwd)
+    if git.git_dir is None:
+        result.error = f"{git.cwd} не является репозиторием Git"
+    else:
+        COMMANDS[args.command](git, result, args)
+
+    if args.json:
+        json.dump(result.to_dict(), sys.stdout, ensure_ascii=False)
+        sys.stdout.write("\n")
+    else:
+        result.print_text()
+    sys.exit(result.exit_code)
@@ -1,82 +1,360 @@
-from datetime import datetime
 from pathlib import Path
 
 import questionary
 from rich.console import Console
-
-from apps.gitops.src.utils import run_git, repo_is_clean
+from rich.table import Table
+
+from apps.gitops.src.chunked import (
+    ChunkLimits,
+    PushedChunk,
+    commit_chunk,
+    commit_size,
+    pending_commits,
+    plan_chunks,
+    push_commits,
+)
+from apps.gitops.src.largefiles import (
+    SizeLimits,
+    SizeReport,
+    lfs_available,
+    measure_changes,
+    renormalize,
+    track_with_lfs,
+)
+from apps.gitops.src.maintenance import (
+    benchmark,
+    object_stats,
+    recommend_tasks,
+    run_tasks,
+    schedule,
+)
+from apps.gitops.src.utils import (
+    FetchOptions,
+    GitSession,
+    RepoState,
+    auto_commit_message,
+)
+from apps.shared.formatting import format_size
 
 console = Console()
 
 
-def git_push(repo_root_path: Path | None = None) -> None:
+def _print_state_error() -> None:
+    """Сообщает, что состояние репозитория получить не удалось."""
+    console.print(
+        "Не удалось получить состояние репозитория (git status).",
+        style="red"
+    )
+
+
+def _check_large_files(
+    git: GitSession,
+    state: RepoState,
+    limits: SizeLimits,
+) -> tuple[RepoState, list[str], SizeReport | None] | None:
+    """
+    Проверяет размер изменений перед коммитом.
+
+    Выводит крупные файлы и оценку прироста истории, предлагает
+    перевести подходящие файлы в Git LFS и запрашивает подтверждение
+    для файлов больше допустимого размера.
+
+    Args:
+        git (GitSession): Сеанс Git.
+        state (RepoState): Снимок состояния репозитория.
+        limits (SizeLimits): Пороги размера.
+
+    Returns:
+        tuple[RepoState, list[str], SizeReport | None] | None: Снимок
+            (обновлённый, если изменился `.gitattributes`), пути, которые
+            после добавления в индекс нужно пропустить через фильтр LFS,
+            и размеры изменений снимка (None, если снимок обновлён);
+            None, если коммит отменён.
+    """
+    report = measure_changes(git, state.changes, limits)
+    console.print(
+        f"Коммит увеличит историю примерно на {format_size(report.growth)}"
+        + (
+            f" (ещё {format_size(report.lfs_size)} — в Git LFS)"
+            if report.lfs_size else ""
+        ),
+        style="cyan",
+    )
+    if not report.large:
+        return state, [], report
+
+    console.print("Крупные файлы:", style="yellow")
+    for file in report.large:
+        note = " (LFS)" if file.lfs else ""
+        console.print(
+            f"  {format_size(file.size):>10}  {file.path}{note}",
+            style="dim",
+            markup=False,
+        )
+
+    lfs_paths: list[str] = []
+    candidates = report.lfs_candidates
+    if candidates and lfs_available(git):
+        patterns = ", ".join(
+            f"*{ext}" for ext in sorted(limits.lfs_extensions)
+        )
+        if questionary.confirm(
+            f"Хранить изображения ({patterns}) в Git LFS?"
+        ).ask():
+            if track_with_lfs(git, limits.lfs_extensions):
+                console.print(
+                    " ✔ Шаблоны добавлены в .gitattributes", style="green"
+                )
+                lfs_paths = [file.path for file in candidates]
+                # .gitattributes тоже должен попасть в коммит, а размеры
+                # нового снимка не измерены
+                state = git.state() or state
+                report = None
+            else:
+                console.print(
+                    " ✘ Не удалось выполнить git lfs track", style="red"
+                )
+    elif candidates:
+        console.print(
+            " ⚠ Git LFS не установлен: изображения попадут в историю.",
+            style="yellow"
+        )
+
+    oversized = [
+        file for file in report.oversized if file.path not in lfs_paths
+    ]
+    if oversized and not questionary.confirm(
+        f"Файлов больше {format_size(limits.max_size)}: {len(oversized)}. "
+        "Они навсегда останутся в истории. Всё равно закоммитить?",
+        default=False,
+    ).ask():
+        return None
+    return state, lfs_paths, report
+
+
+def _commit_changes(
+    git: GitSession,
+    state: RepoState,
+    lfs_paths: list[str],
+    limits: ChunkLimits,
+    report: SizeReport | None = None,
+) -> int:
+    """
+    Создаёт автоматический коммит или, с согласия пользователя,
+    несколько коммитов по частям.
+
+    Args:
+        git (GitSession): Сеанс Git.
+        state (RepoState): Снимок состояния репозитория.
+        lfs_paths (list[str]): Файлы, которые нужно пропустить через
+            фильтр LFS (см. `_check_large_files()`).
+        limits (ChunkLimits): Ограничения одной части.
+        report (SizeReport | None): Размеры изменений снимка из
+            `_check_large_files()`: части планируются без повторных
+            `ls-files` и `stat`.
+
+    Returns:
+        int: Число созданных коммитов.
+    """
+    message = auto_commit_message()
+    chunks = plan_chunks(git, state.changes, limits, report)
+    if len(chunks) > 1 and questionary.confirm(
+        f"Изменений много ({sum(len(c.changes) for c in chunks)} файлов, "
+        f"{format_size(sum(c.size for c in chunks))}). Разбить на "
+        f"{len(chunks)} коммитов и отправлять их по одному?"
+    ).ask():
+        if lfs_paths and not renormalize(git, lfs_paths):
+            console.print(" ✘ Не удалось создать коммит", style="red")
+            return 0
+        for number, chunk in enumerate(chunks, 1):
+            console.print(
+                f"Создание коммита {number}/{len(chunks)} "
+                f"({len(chunk.changes)} файлов, {format_size(chunk.size)})",
+                style="cyan",
+            )
+            if not commit_chunk(
+                git, chunk, f"{message} ({number}/{len(chunks)})"
+            ):
+                console.print(
+                    " ✘ Не удалось создать коммит", style="red"
+                )
+                return number - 1
+        console.print(
+            f" ✔ Создано коммитов: {len(chunks)}", style="green"
+        )
+        return len(chunks)
+
+    console.print("Создание коммита...", style="cyan")
+    committed = (
+        git.stage(state.changes)
+        and (not lfs_paths or renormalize(git, lfs_paths))
+        and git.run(["commit", "-m", message])
+    )
+    if committed:
+        console.print(" ✔ Коммит создан", style="green")
+        return 1
+    console.print(" ✘ Не удалось создать коммит", style="red")
+    return 0
+
+
+def _print_chunks(results: list[PushedChunk]) -> None:
+    """Выводит таблицу отправки по частям со скоростью каждой части."""
+    table = Table(title="Отправка по частям", show_lines=True)
+    table.add_column("№", justify="right")
+    table.add_column("Коммит", style="bold cyan")
+    table.add_column("Объём", justify="right")
+    table.add_column("Время, с", justify="right")
+    table.add_column("Скорость", style="bold white", justify="right")
+    for number, result in enumerate(results, 1):
+        throughput = result.throughput
+        table.add_row(
+            str(number),
+            result.commit[:10],
+            format_size(result.size) if result.size is not None else "—",
+            f"{result.elapsed:.1f}",
+            f"{format_size(throughput)}/с" if result.ok and throughput
+            else ("ошибка" if not result.ok else "—"),
+        )
+    console.print(table)
+
+
+def _push_in_chunks(git: GitSession, limits: ChunkLimits) -> bool:
+    """
+    Отправляет неотправленные коммиты по одному, если их суммарный
+    объём больше одной части.
+
+    Args:
+        git (GitSession): Сеанс Git.
+        limits (ChunkLimits): Ограничения одной части.
+
+    Returns:
+        bool: True, если отправка выполнялась по частям (её итог уже
+            выведен); False — нужна обычная отправка.
+    """
+    upstream = git.upstream()
+    commits = pending_commits(git)
+    if upstream is None or len(commits) < 2:
+        return False
+    total = commit_size(git, "HEAD", upstream.tracking_ref)
+    if total is None or total <= limits.max_size:
+        return False
+
+    console.print(
+        f"Отправка по частям: {len(commits)} коммитов, "
+        f"{format_size(total)}",
+        style="cyan",
+    )
+    results = push_commits(git, upstream, commits)
+    _print_chunks(results)
+    sent = sum(result.ok for result in results)
+    if sent == len(commits):
+        console.print(" ✔ Изменения успешно отправлены", style="green")
+    else:
+        console.print(
+            f"Отправлено {sent} из {len(commits)} коммитов. Повторный push "
+            "продолжит с первого неотправленного.",
+            style="yellow",
+        )
+    return True
+
+
+def git_push(
+    repo_root_path: Path | None = None,
+    session: GitSession | None = None,
+    state: RepoState | None = None,
+    size_limits: SizeLimits | None = None,
+    chunk_limits: ChunkLimits | None = None,
+) -> None:
     """
     Выполняет коммит и отправку изменений в удалённый репозиторий.
 
     Алгоритм:
-      1. Проверяет наличие незакоммиченных изменений.
+      1. Получает снимок состояния репозитория (`GitSession.state()`),
+         если он не передан: один вызов `git status` даёт и список
+         изменений, и число неотправленных коммитов.
       2. Показывает краткий список изменённых файлов.
       3. Предлагает создать автоматический коммит (UTC-время в сообщении).
-      4. Проверяет наличие неотправленных коммитов.
-      5. Если они есть — предлагает выполнить git push.
+         Перед ним проверяет размер изменений (`measure_changes()`):
+         показывает крупные файлы, предлагает перевести изображения
+         в Git LFS и не коммитит слишком большие файлы без подтверждения.
+         В индекс добавляются только файлы из снимка (`GitSession.stage()`).
+         Если изменений больше, чем помещается в одну часть
+         (`ChunkLimits`), предлагает разбить их на несколько коммитов.
+      4. Проверяет наличие неотправленных коммитов (с учётом нового).
+      5. Если они есть — предлагает выполнить git push (с индикатором
+         прогресса передачи, см. `GitSession.stream()`). Крупные серии
+         коммитов отправляются по одному, а прерванная отправка
+         продолжается с первого неотправленного коммита.
       6. Сообщает об успехе или ошибке операции.
 
     Args:
         repo_root_path (Path | None): Путь к корню репозитория.
+        session (GitSession | None): Общий сеанс Git (например, меню).
+            По умолчанию создаётся новый.
+        state (RepoState | None): Свежий снимок состояния (например,
+            фоновой проверки меню). По умолчанию снимается заново.
+        size_limits (SizeLimits | None): Пороги размера файлов
+            (секция `gitops.large_files` в `config.yml`).
+        chunk_limits (ChunkLimits | None): Ограничения частей для больших
+            наборов изменений (секция `gitops.chunked` в `config.yml`).
     """
     console.print(
         "Проверка состояния репозитория...", style="bold cyan"
     )
+    git = session or GitSession(repo_root_path)
+    state = state or git.state()
+    if state is None:
+        _print_state_error()
+        return
 
+    chunk_limits = chunk_limits or ChunkLimits()
+    committed = 0
     # --- Проверяем наличие незакоммиченных изменений ---
-    if not repo_is_clean(repo_root_path=repo_root_path):
+    if not state.is_clean:
         console.print(
             "\nОбнаружены незакоммиченные изменения:", style="yellow"
         )
-        diff_output = run_git(
-            ["status", "--short"],
-            repo_root_path=repo_root_path,
-            capture_output=True,
+        console.print(
+            "\n".join(change.short for change in state.changes),
+            style="dim",
+            markup=False,
         )
 
-        if diff_output:
-            console.print(f"[dim]{diff_output}[/dim]")
-        else:
-            console.print(
-                "Не удалось получить список изменений.\n", style="red"
-            )
-
+        checked = None
         if questionary.confirm("Составить автоматический коммит?").ask():
-            dt = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-            console.print("Создание коммита...", style="cyan")
-            run_git(["add", "."], repo_root_path=repo_root_path)
-            run_git(
-                ["commit", "-m", f"auto: {dt}"],
-                repo_root_path=repo_root_path,
+            checked = _check_large_files(
+                git, state, size_limits or SizeLimits()
+            )
+        if checked:
+            state, lfs_paths, report = checked
+            committed = _commit_changes(
+                git, state, lfs_paths, chunk_limits, report
             )
-            console.print(" ✔ Коммит создан", style="green")
         else:
             console.print(" ✘ Коммит отменён", style="yellow")
     else:
         console.print(" ○ Нет изменений для коммита", style="green")
 
-    ahead_check = run_git(
-        ["rev-list", "@{u}..HEAD", "--count"],
-        repo_root_path=repo_root_path,
-        capture_output=True,
-    )
-
-    if ahead_check is None:
+    if state.upstream is None:
         console.print(
             " ⚠ Не удалось определить состояние ветки относительно origin.",
             style="yellow"
         )
         return
 
-    try:
-        ahead_count = int(ahead_check.strip())
-    except ValueError:
-        ahead_count = 0
+    if state.upstream_gone:
+        # Без ссылки отслеживания git status не сообщает расхождение:
+        # считаются коммиты, которых нет ни в одной удалённой ветке
+        console.print(
+            f" ⚠ Ветка {state.upstream} не найдена: удалена на сервере "
+            "или ещё не получена.",
+            style="yellow"
+        )
+        ahead_count = git.unpushed_count() or 0
+    else:
+        # Новые коммиты ложатся поверх HEAD, поэтому повторный status
+        # не нужен
+        ahead_count = state.ahead + committed
 
     if ahead_count == 0:
         console.print(" ○ Нет новых коммитов для отправки.", style="green")
@@ -88,7 +366,9 @@ def git_push(repo_root_path: Path | None = None) -> None:
         return
 
     console.print("Сохранение и отправка изменений...", style="cyan")
-    if not run_git(["push"], repo_root_path=repo_root_path):
+    if ahead_count > 1 and _push_in_chunks(git, chunk_limits):
+        return
+    if not git.stream(["push"]):
         console.print(
             "Не удалось выполнить push.",
             "Возможная причина: удалённый репозиторий был обновлён.",
@@ -100,49 +380,67 @@ def git_push(repo_root_path: Path | None = None) -> None:
     console.print(" ✔ Изменения успешно отправлены", style="green")
 
 
-def git_pull(repo_root_path: Path | None = None) -> None:
+def git_pull(
+    repo_root_path: Path | None = None,
+    session: GitSession | None = None,
+    fetch_options: FetchOptions | None = None,
+    state: RepoState | None = None,
+) -> None:
     """
     Выполняет git pull при наличии обновлений в удалённом репозитории.
 
     Алгоритм:
-      1. Выполняет `git fetch` и сравнивает количество коммитов между
-        локальной и удалённой ветками.
-      2. Сообщает пользователю, если репозиторий неактуален.
-      3. Предлагает выполнить обновление (`git pull --ff-only`).
-      4. Выводит результат операции.
+      1. Сверяет вершину удалённой ветки (`git ls-remote`, с кэшем)
+        с локальной ссылкой отслеживания и выполняет `git fetch`, только
+        если они различаются (`GitSession.fetch()`).
+      2. Получает снимок состояния репозитория (`GitSession.state()` без
+        поиска неотслеживаемых файлов): число коммитов, на которое
+        локальная ветка отстаёт от удалённой.
+      3. Сообщает пользователю, если репозиторий неактуален.
+      4. Предлагает выполнить обновление. Данные уже получены, поэтому
+        вместо `git pull --ff-only` выполняется `git merge --ff-only`
+        без повторного обращения к сети (с индикатором прогресса).
+      5. Выводит результат операции.
 
     Args:
         repo_root_path (Path | None): Путь к корню репозитория.
+        session (GitSession | None): Общий сеанс Git (например, меню).
+            По умолчанию создаётся новый.
+        fetch_options (FetchOptions | None): Параметры fetch
+            (секция `gitops.fetch` в `config.yml`).
+        state (RepoState | None): Свежий снимок состояния, снятый после
+            fetch (например, фоновой проверкой меню). Если передан,
+            шаги 1 и 2 пропускаются.
     """
     console.print("Проверка обновлений...", style="bold cyan")
-    run_git(
-        ["fetch", "--quiet"],
-        repo_root_path=repo_root_path,
-    )
-    updates_count_str = run_git(
-        ["rev-list", "@..@{u}", "--count"],
-        repo_root_path=repo_root_path,
-        capture_output=True,
-        silent=True,
-    )
+    git = session or GitSession(repo_root_path)
+    if state is None:
+        if git.fetch(fetch_options or FetchOptions()) is None:
+            console.print(
+                " ⚠ Не удалось получить данные удалённого репозитория.",
+                style="yellow"
+            )
+        state = git.state(untracked=False)
+    if state is None:
+        _print_state_error()
+        return
 
-    if not updates_count_str:
+    if state.upstream is None:
         console.print(
             " ⚠ Upstream для текущей ветки не задан.",
             "Невозможно проверить актуальность.",
             style="yellow"
         )
         return
-
-    try:
-        updates_count = int(updates_count_str.strip())
-    except ValueError:
+    if state.upstream_gone:
         console.print(
-            "Ошибка: Не удалось распознать счётчик коммитов от Git.",
-            style="red"
+            f" ⚠ Ветка {state.upstream} не найдена: удалена на сервере "
+            "или ещё не получена.",
+            style="yellow"
         )
         return
 
+    updates_count = state.behind
     if updates_count == 0:
         console.print(" ✔ Репозиторий уже актуален", style="green")
         return
@@ -152,6 +450,12 @@ def git_pull(repo_root_path: Path | None = None) -> None:
         f"[red]{updates_count}[/red] коммитов.",
         style="yellow"
     )
+    if not state.is_clean:
+        console.print(
+            " ⚠ В репозитории есть незакоммиченные изменения "
+            f"({len(state.changes)}): pull может завершиться ошибкой.",
+            style="yellow"
+        )
 
     if not questionary.confirm(
         "Обновить локальный репозиторий (git pull)?"
@@ -159,39 +463,139 @@ def git_pull(repo_root_path: Path | None = None) -> None:
         console.print(" ✘ Обновление отменено", style="yellow")
         return
 
-    result = run_git(
-        ["pull", "--ff-only"],
-        repo_root_path=repo_root_path,
-        capture_output=True,
-    )
-    if result:
+    if git.stream(["merge", "--ff-only", "@{u}"]):
         console.print(" ✔ Репозиторий обновлён", style="green")
         return
 
     console.print("Не удалось выполнить pull.", style="red")
 
 
-def main():
+def _print_timings(
+    before: dict[str, float],
+    after: dict[str, float] | None = None,
+) -> None:
+    """Выводит время команд GitOps до и после обслуживания."""
+    table = Table(title="Время команд GitOps (медиана)", show_lines=True)
+    table.add_column("Команда", style="bold cyan")
+    table.add_column("До, мс", justify="right")
+    if after:
+        table.add_column("После, мс", justify="right")
+        table.add_column("Изменение", style="bold white", justify="right")
+    for name, elapsed in before.items():
+        row = [name, f"{elapsed * 1000:.1f}"]
+        if after:
+            change = (after[name] - elapsed) / elapsed if elapsed else 0.0
+            row += [f"{after[name] * 1000:.1f}", f"{change:+.0%}"]
+        table.add_row(*row)
+    console.print(table)
+
+
+def git_maintenance(
+    repo_root_path: Path | None = None,
+    session: GitSession | None = None,
+) -> None:
+    """
+    Проверяет хранилище объектов и выполняет обслуживание репозитория.
+
+    Алгоритм:
+      1. Выводит статистику `git count-objects -v`, наличие графа
+         коммитов и multi-pack-index.
+      2. Подбирает задачи `git maintenance run` (`recommend_tasks()`)
+         и замеряет время `git status` и `git rev-list`.
+      3. Предлагает выполнить задачи сейчас или включить фоновое
+         обслуживание по расписанию (`git maintenance start`).
+      4. После выполнения повторяет замеры и выводит сравнение.
+
+    Args:
+        repo_root_path (Path | None): Путь к корню репозитория.
+        session (GitSession | None): Общий сеанс Git (например, меню).
+            По умолчанию создаётся новый.
+    """
+    console.print("Проверка хранилища объектов...", style="bold cyan")
+    git = session or GitSession(repo_root_path)
+    stats = object_stats(git)
+    if stats is None:
+        _print_state_error()
+        return
+
+    table = Table(title="Хранилище объектов", show_lines=True)
+    table.add_column("Показатель", style="bold cyan")
+    table.add_column("Значение", style="bold white", justify="right")
+    for name, value in stats.as_rows():
+        table.add_row(name, value)
+    console.print(table)
+
+    with console.status("Замер команд GitOps..."):
+        before = benchmark(git)
+    tasks = recommend_tasks(stats)
+    if tasks:
+        console.print(
+            f"Рекомендуемые задачи: {', '.join(tasks)}", style="yellow"
+        )
+    else:
+        console.print(" ✔ Обслуживание не требуется", style="green")
+        _print_timings(before)
+
+    run_now = f"Выполнить сейчас ({', '.join(tasks)})"
+    start = "Включить фоновое обслуживание (git maintenance start)"
+    cancel = "Отмена"
+    choice = questionary.select(
+        "Обслуживание репозитория:",
+        choices=[*([run_now] if tasks else []), start, cancel],
+    ).ask()
+
+    if choice == start:
+        if schedule(git):
+            console.print(
+                " ✔ Фоновое обслуживание включено", style="green"
+            )
+        else:
+            console.print(
+                " ✘ Не удалось включить обслуживание", style="red"
+            )
+        return
+    if choice != run_now:
+        console.print(" ✘ Обслуживание отменено", style="yellow")
+        return
+
+    console.print("Выполнение обслуживания...", style="cyan")
+    if not run_tasks(git, tasks):
+        console.print(" ✘ Обслуживание завершилось ошибкой", style="red")
+        return
+    with console.status("Повторный замер..."):
+        after = benchmark(git)
+    console.print(" ✔ Обслуживание выполнено", style="green")
+    _print_timings(before, after)
+
+
+def main(repo_root_path: Path | None = None):
     """
     Отображает интерактивное меню для выбора Git-действий.
 
     Доступные опции:
       - Push (отправка изменений)
       - Pull (обновление репозитория)
+      - Обслуживание репозитория
       - Выход
+
+    Args:
+        repo_root_path (Path | None): Путь к корню репозитория.
     """
     action = questionary.select(
         "Выберите действие:",
         choices=[
             "Push (отправить изменения)",
             "Pull (обновить репозиторий)",
+            "Обслуживание репозитория",
             "Выход"
         ]
     ).ask()
 
     if action.startswith("Push"):
-        git_push()
+        git_push(repo_root_path)
     elif action.startswith("Pull"):
-        git_pull()
+        git_pull(repo_root_path)
+    elif action.startswith("Обслуживание"):
+        git_maintenance(repo_root_path)
     else:
         console.print("Выход", style="yellow")
@@ -0,0 +1,286 @@
+"""
+Проверка размера изменений перед автоматическим коммитом.
+
+Каждый закоммиченный файл навсегда остаётся в истории: один обой на
+80 МиБ замедляет все последующие `clone` и `fetch`. Перед коммитом
+размеры файлов из снимка `git status` измеряются параллельно (только
+`stat`, без чтения содержимого), крупные файлы отмечаются по порогам
+из секции `gitops.large_files` в `config.yml`, а изображения можно
+перевести в Git LFS: тогда в истории хранится только указатель.
+"""
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+from apps.gitops.src.utils import FileChange, GitSession
+from apps.shared.images import SUPPORTED_IMAGE_EXTENSIONS
+
+MIB: int = 1024 * 1024
+DEFAULT_WARN_SIZE_MIB: float = 5.0
+DEFAULT_MAX_SIZE_MIB: float = 50.0
+DEFAULT_SIZE_WORKERS: int = 8
+# Примерный размер указателя LFS в истории
+LFS_POINTER_SIZE: int = 130
+LFS_FILTER: str = "lfs"
+
+
+class SizeLimits(NamedTuple):
+    """Пороги размера файлов (секция `gitops.large_files`)."""
+    # Файлы от этого размера показываются пользователю
+    warn_size: int = round(DEFAULT_WARN_SIZE_MIB * MIB)
+    # Файлы от этого размера не коммитятся без подтверждения
+    max_size: int = round(DEFAULT_MAX_SIZE_MIB * MIB)
+    # Расширения, которые предлагается хранить в Git LFS
+    lfs_extensions: frozenset[str] = frozenset(SUPPORTED_IMAGE_EXTENSIONS)
+
+    @classmethod
+    def from_config(cls, config: dict | None) -> "SizeLimits":
+        """
+        Создаёт пороги из секции конфига.
+
+        Args:
+            config (dict | None): Секция `gitops.large_files`.
+
+        Returns:
+            SizeLimits: Пороги (по умолчанию для отсутствующих ключей).
+        """
+        config = config or {}
+        extensions = config.get("lfs_extensions")
+        return cls(
+            warn_size=round(
+                float(config.get("warn_size_mib", DEFAULT_WARN_SIZE_MIB))
+                * MIB
+            ),
+            max_size=round(
+                float(config.get("max_size_mib", DEFAULT_MAX_SIZE_MIB)) * MIB
+            ),
+            lfs_extensions=frozenset(
+                ext.lower() for ext in extensions
+            ) if extensions else frozenset(SUPPORTED_IMAGE_EXTENSIONS),
+        )
+
+
+class SizedFile(NamedTuple):
+    """Файл из изменений с размером в рабочем дереве."""
+    path: str
+    size: int
+    # Файл уже попадает в Git LFS по `.gitattributes`
+    lfs: bool = False
+
+
+class SizeReport(NamedTuple):
+    """Размеры изменений, которые попадут в коммит."""
+    files: list[SizedFile]
+    limits: SizeLimits
+    # Измеренные изменения, в которых каждая запись — файл
+    # (`expand_changes()`)
+    changes: list[FileChange]
+
+    @property
+    def growth(self) -> int:
+        """
+        Верхняя оценка прироста истории в байтах.
+
+        Git сжимает объекты, но изображения почти не сжимаются, поэтому
+        оценка по размеру файлов близка к действительности.
+        """
+        return sum(
+            LFS_POINTER_SIZE if file.lfs else file.size
+            for file in self.files
+        )
+
+    @property
+    def lfs_size(self) -> int:
+        """Объём файлов, которые уйдут в хранилище LFS."""
+        return sum(file.size for file in self.files if file.lfs)
+
+    @property
+    def large(self) -> list[SizedFile]:
+        """Файлы не меньше порога предупреждения, по убыванию размера."""
+        files = [
+            file for file in self.files
+            if file.size >= self.limits.warn_size
+        ]
+        return sorted(files, key=lambda file: file.size, reverse=True)
+
+    @property
+    def oversized(self) -> list[SizedFile]:
+        """Файлы больше допустимого размера, не хранящиеся в LFS."""
+        return [
+            file for file in self.large
+            if not file.lfs and file.size >= self.limits.max_size
+        ]
+
+    @property
+    def lfs_candidates(self) -> list[SizedFile]:
+        """Крупные файлы вне LFS с расширением из `lfs_extensions`."""
+        return [
+            file for file in self.large
+            if not file.lfs
+            and Path(file.path).suffix.lower() in self.limits.lfs_extensions
+        ]
+
+
+def expand_changes(
+    git: GitSession,
+    changes: list[FileChange],
+) -> list[FileChange]:
+    """
+    Раскрывает неотслеживаемые директории в списки файлов.
+
+    `git status` показывает новую директорию одной строкой (`dir/`);
+    её файлы без учёта игнорируемых перечисляются одним вызовом
+    `git ls-files --others`. Вложенные репозитории пропускаются.
+
+    Args:
+        git (GitSession): Сеанс Git.
+        changes (list[FileChange]): Изменения из снимка состояния.
+
+    Returns:
+        list[FileChange]: Изменения, в которых каждая запись — файл.
+    """
+    directories = [
+        change.path for change in changes if change.path.endswith("/")
+    ]
+    if not directories:
+        return list(changes)
+    output = git.query(
+        [
+            "ls-files", "-z", "--others", "--exclude-standard", "--",
+            *(f":(literal){path}" for path in directories),
+        ],
+        cache=False,
+    )
+    expanded = [
+        change for change in changes if not change.path.endswith("/")
+    ]
+    expanded.extend(
+        FileChange("??", path)
+        for path in (output or "").split("\0")
+        if path and not path.endswith("/")
+    )
+    return expanded
+
+
+def _file_size(path: Path) -> int | None:
+    """Размер файла или None, если файла нет или это не файл."""
+    try:
+        info = os.stat(path, follow_symlinks=False)
+    except OSError:
+        return None
+    # Для символических ссылок в истории хранится только путь
+    return info.st_size if stat.S_ISREG(info.st_mode) else None
+
+
+def _lfs_paths(git: GitSession, paths: list[str]) -> set[str]:
+    """Отбирает пути, которые `.gitattributes` направляет в Git LFS."""
+    if not paths:
+        return set()
+    # Вывод: <путь>\0<атрибут>\0<значение>\0 для каждого пути
+    output = git.query(
+        ["check-attr", "-z", "--stdin", "filter"],
+        input="".join(f"{path}\0" for path in paths),
+    )
+    fields = (output or "").split("\0")
+    return {
+        fields[i] for i in range(0, len(fields) - 2, 3)
+        if fields[i + 2] == LFS_FILTER
+    }
+
+
+def measure_changes(
+    git: GitSession,
+    changes: list[FileChange],
+    limits: SizeLimits | None = None,
+    max_workers: int = DEFAULT_SIZE_WORKERS,
+) -> SizeReport:
+    """
+    Измеряет файлы, которые попадут в коммит.
+
+    Размеры запрашиваются в пуле потоков: на сетевых и медленных дисках
+    задержки отдельных `stat` перекрываются. Принадлежность к LFS
+    определяется одним вызовом `git check-attr`.
+
+    Args:
+        git (GitSession): Сеанс Git.
+        changes (list[FileChange]): Изменения из снимка состояния.
+        limits (SizeLimits | None): Пороги размера.
+        max_workers (int): Число потоков для `stat`.
+
+    Returns:
+        SizeReport: Размеры файлов и пороги.
+    """
+    limits = limits or SizeLimits()
+    root = git.root or git.cwd
+    changes = expand_changes(git, changes)
+    # Удалённые файлы не увеличивают историю
+    paths = [change.path for change in changes if "D" not in change.xy]
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        sizes = list(pool.map(lambda path: _file_size(root / path), paths))
+    measured = [
+        (path, size) for path, size in zip(paths, sizes) if size is not None
+    ]
+    # Атрибуты важны только для файлов, попадающих под пороги
+    lfs = _lfs_paths(
+        git, [path for path, size in measured if size >= limits.warn_size]
+    )
+    return SizeReport(
+        [SizedFile(path, size, path in lfs) for path, size in measured],
+        limits,
+        changes,
+    )
+
+
+def lfs_available(git: GitSession) -> bool:
+    """Проверяет, установлено ли расширение Git LFS."""
+    return git.query(["lfs", "version"]) is not None
+
+
+def track_with_lfs(git: GitSession, extensions: frozenset[str]) -> bool:
+    """
+    Добавляет шаблоны расширений в `.gitattributes` (`git lfs track`).
+
+    Шаблоны Git чувствительны к регистру, поэтому добавляются варианты
+    в нижнем и верхнем регистре (`*.jpg` и `*.JPG`).
+
+    Args:
+        git (GitSession): Сеанс Git.
+        extensions (frozenset[str]): Расширения с точкой.
+
+    Returns:
+        bool: True, если шаблоны добавлены.
+    """
+    patterns = sorted(
+        {f"*{ext.lower()}" for ext in extensions}
+        | {f"*{ext.upper()}" for ext in extensions}
+    )
+    return bool(git.run(["lfs", "track", *patterns], silent=True))
+
+
+def renormalize(git: GitSession, paths: list[str]) -> bool:
+    """
+    Заново добавляет файлы в индекс после изменения `.gitattributes`.
+
+    Файлы, уже находившиеся в индексе обычными объектами, иначе не
+    пройдут через фильтр LFS.
+
+    Args:
+        git (GitSession): Сеанс Git.
+        paths (list[str]): Пути файлов.
+
+    Returns:
+        bool: True при успехе.
+    """
+    return bool(git.run(
+        [
+            "add",
+            "--renormalize",
+            "--pathspec-from-file=-",
+            "--pathspec-file-nul",
+        ],
+        silent=True,
+        env={"GIT_LITERAL_PATHSPECS": "1"},
+        input="".join(f"{path}\0" for path in paths),
+    ))
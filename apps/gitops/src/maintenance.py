@@ -0,0 +1,194 @@
+"""
+Обслуживание репозитория, от которого зависит скорость GitOps.
+
+Со временем в репозитории копятся несжатые объекты и пакеты, а без
+графа коммитов (`commit-graph`) каждый обход истории читает объекты
+коммитов по одному. От этого замедляются `git status` и `git rev-list`,
+которые GitOps вызывает при каждом действии.
+
+Модуль читает статистику `git count-objects -v`, подбирает задачи
+`git maintenance run` (граф коммитов, упаковка несжатых объектов,
+инкрементальная переупаковка с multi-pack-index, полная сборка при
+большом числе пакетов) и замеряет время
+команд GitOps до и после обслуживания.
+"""
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+from typing import Callable, NamedTuple
+
+from apps.gitops.src.utils import GitSession
+
+# Задачи `git maintenance run`
+COMMIT_GRAPH_TASK: str = "commit-graph"
+LOOSE_OBJECTS_TASK: str = "loose-objects"
+INCREMENTAL_REPACK_TASK: str = "incremental-repack"
+GC_TASK: str = "gc"
+# Пороги, после которых задачи упаковки имеют смысл
+LOOSE_OBJECTS_LIMIT: int = 1000
+PACKS_LIMIT: int = 10
+DEFAULT_BENCHMARK_RUNS: int = 3
+# Команды только на чтение, которые GitOps выполняет при каждом действии
+BENCHMARK_COMMANDS: dict[str, Callable[[GitSession], object]] = {
+    "git status": lambda git: git.state(),
+    "git rev-list": lambda git: git.query(
+        ["rev-list", "--count", "HEAD"], cache=False
+    ),
+}
+
+
+class ObjectStats(NamedTuple):
+    """Статистика хранилища объектов (`git count-objects -v`)."""
+    loose: int
+    loose_size: int
+    in_pack: int
+    packs: int
+    pack_size: int
+    garbage: int
+    # Есть ли граф коммитов и multi-pack-index
+    commit_graph: bool
+    multi_pack_index: bool
+
+    def as_rows(self) -> list[tuple[str, str]]:
+        """Строки для таблицы: название и значение."""
+        return [
+            ("Несжатых объектов", str(self.loose)),
+            ("Их объём, КиБ", str(self.loose_size)),
+            ("Объектов в пакетах", str(self.in_pack)),
+            ("Пакетов", str(self.packs)),
+            ("Объём пакетов, КиБ", str(self.pack_size)),
+            ("Мусорных файлов", str(self.garbage)),
+            ("Граф коммитов", "есть" if self.commit_graph else "нет"),
+            (
+                "multi-pack-index",
+                "есть" if self.multi_pack_index else "нет",
+            ),
+        ]
+
+
+def object_stats(git: GitSession) -> ObjectStats | None:
+    """
+    Читает статистику хранилища объектов.
+
+    Args:
+        git (GitSession): Сеанс Git.
+
+    Returns:
+        ObjectStats | None: Статистика или None, если Git недоступен.
+    """
+    output = git.query(["count-objects", "-v"], cache=False)
+    if output is None or git.common_dir is None:
+        return None
+    values: dict[str, int] = {}
+    for line in output.splitlines():
+        key, _, value = line.partition(":")
+        try:
+            values[key.strip()] = int(value)
+        except ValueError:
+            continue
+    objects = Path(git.common_dir) / "objects"
+    return ObjectStats(
+        loose=values.get("count", 0),
+        loose_size=values.get("size", 0),
+        in_pack=values.get("in-pack", 0),
+        packs=values.get("packs", 0),
+        pack_size=values.get("size-pack", 0),
+        garbage=values.get("garbage", 0),
+        commit_graph=(
+            (objects / "info" / "commit-graph").exists()
+            or (objects / "info" / "commit-graphs").is_dir()
+        ),
+        multi_pack_index=(objects / "pack" / "multi-pack-index").exists(),
+    )
+
+
+def recommend_tasks(stats: ObjectStats) -> list[str]:
+    """
+    Подбирает задачи `git maintenance run` по статистике.
+
+    Args:
+        stats (ObjectStats): Статистика хранилища.
+
+    Returns:
+        list[str]: Задачи в порядке выполнения (пустой список, если
+            обслуживание не требуется).
+    """
+    tasks: list[str] = []
+    if not stats.commit_graph:
+        tasks.append(COMMIT_GRAPH_TASK)
+    if stats.packs >= PACKS_LIMIT:
+        # Инкрементальная переупаковка объединяет мелкие пакеты
+        # постепенно, за много запусков; полная сборка — сразу,
+        # заодно упаковывая и несжатые объекты
+        tasks.append(GC_TASK)
+        return tasks
+    if stats.loose >= LOOSE_OBJECTS_LIMIT:
+        tasks.append(LOOSE_OBJECTS_TASK)
+    # Переупаковка пишет multi-pack-index: поиск объекта не перебирает
+    # индексы всех пакетов
+    if stats.packs > 1 and not stats.multi_pack_index:
+        tasks.append(INCREMENTAL_REPACK_TASK)
+    return tasks
+
+
+def benchmark(
+    git: GitSession,
+    runs: int = DEFAULT_BENCHMARK_RUNS,
+) -> dict[str, float]:
+    """
+    Замеряет команды, от которых зависит скорость GitOps.
+
+    Args:
+        git (GitSession): Сеанс Git.
+        runs (int): Число запусков каждой команды.
+
+    Returns:
+        dict[str, float]: Медианное время в секундах по названиям команд.
+    """
+    timings: dict[str, float] = {}
+    for name, command in BENCHMARK_COMMANDS.items():
+        samples: list[float] = []
+        for _ in range(max(1, runs)):
+            started = perf_counter()
+            command(git)
+            samples.append(perf_counter() - started)
+        timings[name] = median(samples)
+    return timings
+
+
+def run_tasks(
+    git: GitSession,
+    tasks: list[str],
+    silent: bool = False,
+) -> bool:
+    """
+    Выполняет задачи обслуживания (`git maintenance run`).
+
+    Args:
+        git (GitSession): Сеанс Git.
+        tasks (list[str]): Задачи из `recommend_tasks()`.
+        silent (bool): Если True — подавляет вывод в консоль.
+
+    Returns:
+        bool: True при успехе.
+    """
+    args = ["maintenance", "run", *(f"--task={task}" for task in tasks)]
+    if silent:
+        args.append("--quiet")
+    return bool(git.run(args, silent=silent))
+
+
+def schedule(git: GitSession, silent: bool = False) -> bool:
+    """
+    Включает фоновое обслуживание по расписанию (`git maintenance
+    start`): Git регистрирует репозиторий и создаёт задание cron,
+    systemd или планировщика ОС.
+
+    Args:
+        git (GitSession): Сеанс Git.
+        silent (bool): Если True — подавляет вывод в консоль.
+
+    Returns:
+        bool: True при успехе.
+    """
+    return bool(git.run(["maintenance", "start"], silent=silent))
@@ -0,0 +1,135 @@
+"""
+Фоновая проверка состояния репозитория.
+
+Пока пользователь читает меню, отдельный поток выполняет `git fetch`
+(если upstream изменился, см. `GitSession.fetch()`) и снимает
+состояние репозитория. Меню показывает по снимку значки у пунктов
+(«отстаёт на 3»), а выбранное действие использует готовый снимок
+вместо повторных `fetch` и `status`. Чтобы обновить уже открытое меню,
+вызывающий код задаёт обработчик завершения (`on_done`).
+
+`GitSession` не потокобезопасен, поэтому, пока проверка идёт, сеанс
+принадлежит фоновому потоку: прежде чем обращаться к нему самому,
+вызывающий код дожидается завершения (`wait()`).
+"""
+import threading
+from time import monotonic
+from typing import Callable
+
+from apps.gitops.src.utils import FetchOptions, GitSession, RepoState
+from apps.shared import profiling
+
+# Сколько секунд снимок считается свежим. Изменения рабочего дерева
+# не видны по файлам `.git`, поэтому срок ограничен
+DEFAULT_PREFETCH_MAX_AGE: float = 30.0
+
+
+class Prefetcher:
+    """Фоновый `fetch` и снимок состояния для одного сеанса Git."""
+
+    def __init__(
+        self,
+        session: GitSession,
+        fetch_options: FetchOptions | None = None,
+    ):
+        """
+        Args:
+            session (GitSession): Сеанс Git, общий с вызывающим кодом.
+            fetch_options (FetchOptions | None): Параметры fetch.
+        """
+        self.session = session
+        self.fetch_options = fetch_options or FetchOptions()
+        self.fetched: bool | None = None
+        self._state: RepoState | None = None
+        self._taken_at: float = 0.0
+        self._stamp: tuple[int, ...] | None = None
+        self._thread: threading.Thread | None = None
+        # Вызывается в фоновом потоке с новым снимком по завершении
+        self.on_done: Callable[[RepoState | None], None] | None = None
+
+    @property
+    def running(self) -> bool:
+        """Идёт ли проверка."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """
+        Запускает проверку в фоновом потоке.
+
+        Предыдущий снимок сбрасывается. Если проверка уже идёт или
+        каталог не является репозиторием, ничего не делает.
+        """
+        if self.running or self.session.git_dir is None:
+            return
+        self._state = None
+        self._thread = threading.Thread(
+            target=self._run, name="git-prefetch", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        """Выполняет fetch и снимает состояние (в фоновом потоке)."""
+        with profiling.phase("gitops.prefetch"):
+            # Фоновый поток не пишет в терминал и не ждёт ввода пароля:
+            # при ошибке снимок просто остаётся без fetch
+            self.fetched = self.session.fetch(
+                self.fetch_options, silent=True, interactive=False
+            )
+            # Отпечаток до status: изменения во время status сделают
+            # снимок устаревшим
+            stamp = self.session.stamp()
+            state = self.session.state()
+        self._taken_at = monotonic()
+        self._stamp = stamp
+        self._state = state
+        on_done = self.on_done
+        if on_done is not None:
+            on_done(state)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Дожидается завершения проверки.
+
+        Args:
+            timeout (float | None): Максимальное ожидание в секундах.
+
+        Returns:
+            bool: True, если проверка завершена (или не запускалась).
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.running
+
+    def peek(self) -> RepoState | None:
+        """
+        Возвращает последний снимок, не дожидаясь проверки.
+
+        Returns:
+            RepoState | None: Снимок или None, если он ещё не готов.
+        """
+        return None if self.running else self._state
+
+    def snapshot(
+        self,
+        max_age: float = DEFAULT_PREFETCH_MAX_AGE,
+    ) -> RepoState | None:
+        """
+        Возвращает снимок, если он ещё отражает состояние репозитория.
+
+        Снимок устаревает по сроку `max_age` и при любом изменении
+        `.git` (коммит, индекс, обновление ссылок) после его получения.
+        Вызывать после `wait()`.
+
+        Args:
+            max_age (float): Срок свежести снимка в секундах.
+
+        Returns:
+            RepoState | None: Снимок или None, если его нужно получить
+                заново.
+        """
+        state = self.peek()
+        if state is None or monotonic() - self._taken_at > max_age:
+            return None
+        if self.session.stamp() != self._stamp:
+            return None
+        return state
@@ -1,9 +1,97 @@
+import os
+import re
+import signal
 import subprocess
+from datetime import datetime, timezone
 from pathlib import Path
+from time import monotonic, perf_counter
+from typing import TYPE_CHECKING, NamedTuple
 
-from rich.console import Console
+try:
+    from apps.shared import profiling
+except ImportError:  # Автономный запуск из директории `apps`
+    from shared import profiling
 
-console = Console()
+if TYPE_CHECKING:
+    from rich.console import Console
+
+# Окружение для команд только на чтение: Git не берёт необязательные
+# блокировки (например, index.lock при обновлении индекса в `git status`)
+# и не мешает редакторам и IDE, работающим с тем же репозиторием
+READ_ONLY_ENV: dict[str, str] = {"GIT_OPTIONAL_LOCKS": "0"}
+# Команда SSH по умолчанию, к которой добавляется `BatchMode`
+DEFAULT_SSH_COMMAND: str = "ssh"
+# Файлы в `.git`, изменение которых означает новое состояние ссылок
+STATE_FILES: tuple[str, ...] = (
+    "index", "HEAD", "ORIG_HEAD", "FETCH_HEAD", "packed-refs",
+)
+# Настройки, ускоряющие `git status` и `git add` на больших рабочих деревьях
+UNTRACKED_CACHE_KEY: str = "core.untrackedCache"
+FSMONITOR_KEY: str = "core.fsmonitor"
+# Признак встроенного демона fsmonitor в `git version --build-options`
+FSMONITOR_BUILD_OPTION: str = "fsmonitor--daemon"
+# Сколько секунд результат `git ls-remote` считается актуальным
+DEFAULT_REMOTE_CHECK_TTL: float = 30.0
+# Удалённый репозиторий `git fetch` без аргументов и upstream
+DEFAULT_REMOTE: str = "origin"
+
+AUTO_COMMIT_FORMAT: str = "auto: %Y-%m-%d %H:%M:%S"
+
+# Строка прогресса Git, например
+# «Receiving objects:  45% (9/20), 1.20 MiB | 2.30 MiB/s»
+PROGRESS_RE = re.compile(
+    r"^(?:remote: )?(?P<phase>[A-Z][\w ]*?):\s+\d+% "
+    r"\((?P<done>\d+)/(?P<total>\d+)\)"
+    r"(?:, (?P<size>[\d.]+ \w+))?(?: \| (?P<rate>[\d.]+ \w+/s))?"
+)
+PROGRESS_CHUNK_SIZE: int = 4096
+# Незавершённая строка вывода не хранится целиком
+MAX_PROGRESS_LINE: int = 64 * 1024
+# Сколько секунд ждать завершения Git после Ctrl-C
+CANCEL_TIMEOUT: float = 10.0
+
+_console: "Console | None" = None
+
+
+def get_console() -> "Console":
+    """
+    Возвращает общую консоль rich.
+
+    rich импортируется при первом обращении: команды без вывода (например,
+    `gitops status --json` из cron) не тратят время на его загрузку.
+
+    Returns:
+        Console: Консоль для вывода.
+    """
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
+
+
+def auto_commit_message() -> str:
+    """Возвращает сообщение автоматического коммита (время UTC)."""
+    return datetime.now(timezone.utc).strftime(AUTO_COMMIT_FORMAT)
+
+
+def non_interactive_env() -> dict[str, str]:
+    """
+    Возвращает окружение сетевых команд, которые не должны ждать ввода.
+
+    Git не запрашивает логин и пароль в терминале, а SSH не спрашивает
+    пароль ключа и подтверждение ключа хоста (`BatchMode=yes`): без
+    сохранённых учётных данных команда сразу завершается ошибкой.
+    Заданная пользователем команда `GIT_SSH_COMMAND` сохраняется.
+
+    Returns:
+        dict[str, str]: Дополнительные переменные окружения.
+    """
+    ssh = os.environ.get("GIT_SSH_COMMAND") or DEFAULT_SSH_COMMAND
+    return {
+        "GIT_TERMINAL_PROMPT": "0",
+        "GIT_SSH_COMMAND": f"{ssh} -o BatchMode=yes",
+    }
 
 
 def run_git(
@@ -11,6 +99,8 @@ def run_git(
     repo_root_path: Path | None = None,
     capture_output: bool = False,
     silent: bool = False,
+    env: dict[str, str] | None = None,
+    input: str | None = None,
 ) -> str | bool:
     """
     Выполняет команду Git с обработкой ошибок и опциональным выводом.
@@ -22,6 +112,8 @@ def run_git(
         capture_output (bool): Если True — возвращает stdout, иначе True/False
             по результату выполнения.
         silent (bool): Если True — подавляет вывод в консоль.
+        env (dict[str, str] | None): Дополнительные переменные окружения.
+        input (str | None): Данные для стандартного ввода команды.
 
     Returns:
         str | bool: Стандартный вывод команды, если capture_output=True,
@@ -29,6 +121,9 @@ def run_git(
     """
     cwd = repo_root_path or Path(__file__).resolve().parent
 
+    started = perf_counter()
+    returncode = None
+    output = None
     try:
         result = subprocess.run(
             ["git"] + args,
@@ -36,14 +131,21 @@ def run_git(
             check=True,
             text=True,
             capture_output=capture_output,
+            env={**os.environ, **env} if env else None,
+            input=input,
         )
+        returncode = result.returncode
+        output = result.stdout
         if capture_output:
             return result.stdout
         if not silent and result.stdout:
-            console.print(result.stdout.strip())
+            get_console().print(result.stdout.strip())
         return True
     except subprocess.CalledProcessError as e:
+        returncode = e.returncode
+        output = e.stdout
         if not silent:
+            console = get_console()
             console.print(
                 f"Ошибка при выполнении git {' '.join(args)}",
                 style="red"
@@ -51,24 +153,754 @@ def run_git(
             if e.stderr:
                 console.print(e.stderr.strip())
         return False
+    finally:
+        profiling.record_subprocess(
+            ["git"] + args,
+            started,
+            perf_counter() - started,
+            returncode,
+            output,
+        )
 
 
-def repo_is_clean(repo_root_path: Path | None = None) -> bool:
+def run_git_progress(
+    args: list[str],
+    repo_root_path: Path | None = None,
+    env: dict[str, str] | None = None,
+) -> bool:
     """
-    Проверяет, есть ли незакоммиченные изменения в репозитории.
+    Выполняет команду Git с живым индикатором прогресса.
+
+    Git запускается с `--progress`, а его вывод читается по мере
+    поступления блоками по `PROGRESS_CHUNK_SIZE` байт: счётчики объектов,
+    объём и скорость передачи отображаются индикатором rich, остальные
+    строки выводятся сразу. Вывод не накапливается, поэтому память не
+    растёт даже для многословных команд.
+
+    При Ctrl-C Git получает SIGINT и сам удаляет файлы блокировок;
+    функция дожидается его завершения (не дольше `CANCEL_TIMEOUT`,
+    затем SIGTERM), поэтому репозиторий не остаётся заблокированным.
+
+    Args:
+        args (list[str]): Аргументы git-команды, например `["push"]`.
+            Команда должна поддерживать `--progress` (`push`, `fetch`,
+            `merge`, `clone` и др.).
+        repo_root_path (Path | None): Путь к корню репозитория. По умолчанию
+            — текущая директория.
+        env (dict[str, str] | None): Дополнительные переменные окружения.
+
+    Returns:
+        bool: True, если команда завершилась успешно.
+    """
+    # rich.progress нужен только интерактивным командам
+    from rich.progress import MofNCompleteColumn, Progress, TextColumn
+
+    cwd = repo_root_path or Path(__file__).resolve().parent
+    command = ["git", args[0], "--progress", *args[1:]]
+    console = get_console()
+    progress = Progress(
+        *Progress.get_default_columns(),
+        MofNCompleteColumn(),
+        TextColumn("{task.fields[transfer]}"),
+        console=console,
+        transient=True,
+    )
+    tasks: dict[str, int] = {}
+
+    def show(line: str) -> None:
+        match = PROGRESS_RE.match(line)
+        if match is None:
+            if line.strip():
+                progress.console.print(line, style="dim", markup=False)
+            return
+        phase = match["phase"]
+        transfer = " | ".join(filter(None, (match["size"], match["rate"])))
+        if phase not in tasks:
+            tasks[phase] = progress.add_task(phase, transfer=transfer)
+        progress.update(
+            tasks[phase],
+            completed=int(match["done"]),
+            total=int(match["total"]),
+            transfer=transfer,
+        )
+
+    started = perf_counter()
+    returncode = None
+    try:
+        process = subprocess.Popen(
+            command,
+            cwd=cwd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env={**os.environ, **env} if env else None,
+        )
+    except OSError as e:
+        console.print(f"Не удалось запустить git: {e}", style="red")
+        return False
+
+    try:
+        with progress, process.stdout:
+            buffer = b""
+            # Прогресс обновляется через «\r», обычные строки — через «\n»
+            while chunk := process.stdout.read1(PROGRESS_CHUNK_SIZE):
+                *lines, buffer = re.split(rb"[\r\n]", buffer + chunk)
+                buffer = buffer[-MAX_PROGRESS_LINE:]
+                for line in lines:
+                    show(line.decode("utf-8", "replace"))
+            show(buffer.decode("utf-8", "replace"))
+            returncode = process.wait()
+    except KeyboardInterrupt:
+        # Терминал обычно уже отправил SIGINT всей группе процессов;
+        # повтор нужен, если Git запущен в другой группе
+        process.send_signal(signal.SIGINT)
+        try:
+            returncode = process.wait(CANCEL_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.terminate()
+            returncode = process.wait()
+        console.print(
+            f" ✘ git {args[0]} прерван", style="yellow"
+        )
+        return False
+    finally:
+        profiling.record_subprocess(
+            command, started, perf_counter() - started, returncode
+        )
+
+    if returncode:
+        console.print(
+            f"Ошибка при выполнении git {' '.join(args)}", style="red"
+        )
+        return False
+    return True
+
+
+class FileChange(NamedTuple):
+    """Изменённый файл из `git status`."""
+    # Состояние в индексе и рабочем дереве (`M.`, `.M`, `??`, `UU` и т. п.)
+    xy: str
+    path: str
+    # Исходный путь для переименований и копий
+    orig_path: str | None = None
+
+    @property
+    def short(self) -> str:
+        """Строка в формате `git status --short`."""
+        xy = self.xy.replace(".", " ")
+        if self.orig_path:
+            return f"{xy} {self.orig_path} -> {self.path}"
+        return f"{xy} {self.path}"
+
+
+class RepoState(NamedTuple):
+    """Снимок состояния репозитория, полученный одним вызовом Git."""
+    # Имя текущей ветки или None, если HEAD отсоединён
+    branch: str | None
+    # Хэш HEAD или None, если коммитов ещё нет
+    head: str | None
+    # Upstream текущей ветки или None, если он не задан
+    upstream: str | None
+    ahead: int
+    behind: int
+    changes: list[FileChange]
+    # Upstream задан, но его ссылки отслеживания нет (ветку удалили
+    # на сервере или её ещё не получали): `ahead` и `behind` неизвестны
+    upstream_gone: bool = False
+
+    @property
+    def is_clean(self) -> bool:
+        """True, если в репозитории нет незакоммиченных изменений."""
+        return not self.changes
+
+
+def parse_status(output: str) -> RepoState:
+    """
+    Разбирает вывод `git status --porcelain=v2 --branch -z`.
+
+    Args:
+        output (str): Вывод команды.
+
+    Returns:
+        RepoState: Состояние репозитория.
+    """
+    branch = head = upstream = None
+    ahead = behind = 0
+    divergence_known = False
+    changes: list[FileChange] = []
+
+    fields = iter(output.split("\0"))
+    for field in fields:
+        if not field:
+            continue
+        kind = field[0]
+        if kind == "#":
+            _, key, value = field.split(" ", 2)
+            if key == "branch.oid" and value != "(initial)":
+                head = value
+            elif key == "branch.head" and value != "(detached)":
+                branch = value
+            elif key == "branch.upstream":
+                upstream = value
+            elif key == "branch.ab":
+                ahead_str, behind_str = value.split()
+                ahead, behind = int(ahead_str), -int(behind_str)
+                divergence_known = True
+        elif kind == "1":
+            # 1 XY sub mH mI mW hH hI path
+            parts = field.split(" ", 8)
+            changes.append(FileChange(parts[1], parts[8]))
+        elif kind == "2":
+            # 2 XY sub mH mI mW hH hI Xscore path, затем исходный путь
+            parts = field.split(" ", 9)
+            changes.append(FileChange(parts[1], parts[9], next(fields, "")))
+        elif kind == "u":
+            # u XY sub m1 m2 m3 mW h1 h2 h3 path
+            parts = field.split(" ", 10)
+            changes.append(FileChange(parts[1], parts[10]))
+        elif kind == "?":
+            changes.append(FileChange("??", field[2:]))
+
+    return RepoState(
+        branch,
+        head,
+        upstream,
+        ahead,
+        behind,
+        changes,
+        upstream_gone=upstream is not None and not divergence_known,
+    )
+
+
+def get_repo_state(
+    repo_root_path: Path | None = None,
+    untracked: bool = True,
+) -> RepoState | None:
+    """
+    Получает снимок состояния репозитория одним вызовом `git status`.
+
+    Ветка, upstream, расхождение с ним и список изменений берутся из
+    `git status --porcelain=v2 --branch -z`, поэтому рабочее дерево
+    сканируется один раз за операцию.
 
     Args:
         repo_root_path (Path | None): Путь к корню репозитория.
             Если не задан — используется текущая директория.
+        untracked (bool): Искать ли неотслеживаемые файлы. Без них
+            `git status` не обходит директории рабочего дерева.
 
     Returns:
-        bool: True, если в репозитории нет изменений, иначе False.
+        RepoState | None: Состояние репозитория или None, если Git
+            завершился ошибкой (например, директория не репозиторий).
     """
-    cwd = repo_root_path or Path(__file__).resolve().parent
-    result = subprocess.run(
-        ["git", "status", "--porcelain"],
-        cwd=cwd,
+    output = run_git(
+        _status_args(untracked),
+        repo_root_path=repo_root_path,
         capture_output=True,
-        text=True,
+        silent=True,
+        env=READ_ONLY_ENV,
     )
-    return len(result.stdout.strip()) == 0
+    if output is False:
+        return None
+    return parse_status(output)
+
+
+def _status_args(untracked: bool) -> list[str]:
+    """Аргументы `git status` для `parse_status()`."""
+    args = ["status", "--porcelain=v2", "--branch", "-z"]
+    if not untracked:
+        args.append("--untracked-files=no")
+    return args
+
+
+def repo_is_clean(repo_root_path: Path | None = None) -> bool:
+    """
+    Проверяет, есть ли незакоммиченные изменения в репозитории.
+
+    Args:
+        repo_root_path (Path | None): Путь к корню репозитория.
+            Если не задан — используется текущая директория.
+
+    Returns:
+        bool: True, если в репозитории нет изменений, иначе False
+            (в том числе если состояние получить не удалось).
+    """
+    state = get_repo_state(repo_root_path)
+    return state is not None and state.is_clean
+
+
+class UpstreamRef(NamedTuple):
+    """Upstream текущей ветки."""
+    # Имя удалённого репозитория, например `origin`
+    remote: str
+    # Ветка в удалённом репозитории, например `refs/heads/main`
+    remote_ref: str
+    # Локальная ссылка отслеживания, например `refs/remotes/origin/main`
+    tracking_ref: str
+
+
+class FetchOptions(NamedTuple):
+    """Параметры `git fetch` (секция `gitops.fetch` в `config.yml`)."""
+    # Фильтр частичного клона, например `blob:none`. Применяется только
+    # к удалённым репозиториям, уже настроенным как частичный клон
+    filter: str | None = None
+    # Получать только upstream текущей ветки
+    single_branch: bool = False
+    extra_args: tuple[str, ...] = ()
+    # Время жизни результата проверки удалённой ветки; 0 — без кэша
+    remote_check_ttl: float = DEFAULT_REMOTE_CHECK_TTL
+    # Сверять вершину ветки через `git ls-remote` перед fetch
+    remote_check: bool = True
+
+    @classmethod
+    def from_config(cls, config: dict | None) -> "FetchOptions":
+        """
+        Создаёт параметры из секции конфига.
+
+        Args:
+            config (dict | None): Секция `gitops.fetch` (может
+                отсутствовать).
+
+        Returns:
+            FetchOptions: Параметры; незаданные ключи — по умолчанию.
+        """
+        config = config or {}
+        return cls(
+            filter=config.get("filter") or None,
+            single_branch=bool(config.get("single_branch", False)),
+            extra_args=tuple(config.get("extra_args") or ()),
+            remote_check_ttl=float(
+                config.get("remote_check_ttl", DEFAULT_REMOTE_CHECK_TTL)
+            ),
+            remote_check=bool(config.get("remote_check", True)),
+        )
+
+
+class GitSession:
+    """
+    Сеанс работы с одним репозиторием.
+
+    Репозиторий определяется один раз при создании сеанса. Команды только
+    на чтение (`query()`, `state()`) выполняются без необязательных
+    блокировок (`READ_ONLY_ENV`), а их результаты запоминаются, пока не
+    изменится состояние `.git`: индекс, HEAD, FETCH_HEAD, packed-refs или
+    директории ссылок. Изменяющие команды (`run()`) сбрасывают кэш.
+
+    `git status` не кэшируется: его результат зависит и от рабочего
+    дерева, изменения в котором не видны по файлам `.git`.
+    """
+
+    def __init__(self, repo_root_path: Path | None = None):
+        """
+        Определяет корень рабочей копии и директорию `.git`.
+
+        Args:
+            repo_root_path (Path | None): Путь внутри репозитория.
+                Если не задан — используется текущая директория.
+        """
+        self.cwd: Path = repo_root_path or Path(__file__).resolve().parent
+        self.root: Path | None = None
+        self.git_dir: Path | None = None
+        self.common_dir: Path | None = None
+        self._cache: dict[tuple[str, ...], str] = {}
+        self._cache_stamp: tuple[int, ...] | None = None
+        # Вершины удалённых веток: (remote, ref) → (время проверки, хэш)
+        self._remote_tips: dict[tuple[str, str], tuple[float, str | None]] = {}
+
+        output = run_git(
+            [
+                "rev-parse",
+                "--show-toplevel",
+                "--absolute-git-dir",
+                "--git-common-dir",
+            ],
+            repo_root_path=self.cwd,
+            capture_output=True,
+            silent=True,
+            env=READ_ONLY_ENV,
+        )
+        lines = output.splitlines() if output else []
+        if len(lines) == 3:
+            self.root = self.cwd = Path(lines[0])
+            self.git_dir = Path(lines[1])
+            # --git-common-dir может быть относительным путём
+            self.common_dir = (self.cwd / lines[2]).resolve()
+
+    def stamp(self) -> tuple[int, ...]:
+        """
+        Возвращает отпечаток состояния `.git` по времени модификации.
+
+        Обновление ссылки записывает новый файл и переименовывает его,
+        поэтому меняется время модификации директории, в которой ссылка
+        лежит: достаточно проверить директории `refs`, а не каждый файл.
+        """
+        paths = [self.git_dir / name for name in STATE_FILES]
+        if self.common_dir != self.git_dir:
+            paths.append(self.common_dir / "packed-refs")
+        for directory, _, _ in os.walk(self.common_dir / "refs"):
+            paths.append(Path(directory))
+
+        stamp: list[int] = []
+        for path in paths:
+            try:
+                stamp.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                stamp.append(0)
+        return tuple(stamp)
+
+    def invalidate(self) -> None:
+        """Сбрасывает запомненные результаты."""
+        self._cache.clear()
+        self._cache_stamp = None
+
+    def run(
+        self,
+        args: list[str],
+        capture_output: bool = False,
+        silent: bool = False,
+        env: dict[str, str] | None = None,
+        input: str | None = None,
+    ) -> str | bool:
+        """
+        Выполняет изменяющую команду Git (см. `run_git()`).
+
+        Returns:
+            str | bool: Результат `run_git()`.
+        """
+        self.invalidate()
+        return run_git(
+            args,
+            repo_root_path=self.cwd,
+            capture_output=capture_output,
+            silent=silent,
+            env=env,
+            input=input,
+        )
+
+    def stream(
+        self,
+        args: list[str],
+        env: dict[str, str] | None = None,
+    ) -> bool:
+        """
+        Выполняет изменяющую команду Git с живым прогрессом
+        (см. `run_git_progress()`).
+
+        Returns:
+            bool: True, если команда завершилась успешно.
+        """
+        self.invalidate()
+        return run_git_progress(args, repo_root_path=self.cwd, env=env)
+
+    def stage(self, changes: list[FileChange], silent: bool = False) -> bool:
+        """
+        Добавляет в индекс только изменённые файлы.
+
+        В отличие от `git add .`, Git не обходит и не хэширует всё
+        рабочее дерево: пути из `RepoState.changes` передаются одним
+        вызовом через стандартный ввод (`--pathspec-from-file=-`,
+        разделитель — NUL), поэтому длина списка не упирается в лимит
+        командной строки. Пути трактуются буквально
+        (`GIT_LITERAL_PATHSPECS`), а не как шаблоны. Изменения, уже
+        полностью находящиеся в индексе, пропускаются.
+
+        Args:
+            changes (list[FileChange]): Изменения из снимка состояния.
+            silent (bool): Если True — подавляет вывод в консоль.
+
+        Returns:
+            bool: True, если файлы добавлены (или добавлять нечего).
+        """
+        # Второй символ XY — состояние в рабочем дереве («.» — без
+        # изменений относительно индекса)
+        paths = [
+            change.path for change in changes
+            if change.xy == "??" or change.xy[1] != "."
+        ]
+        if not paths:
+            return True
+        return bool(self.run(
+            ["add", "--pathspec-from-file=-", "--pathspec-file-nul"],
+            silent=silent,
+            env={"GIT_LITERAL_PATHSPECS": "1"},
+            input="".join(f"{path}\0" for path in paths),
+        ))
+
+    def fsmonitor_supported(self) -> bool:
+        """Проверяет, собран ли Git со встроенным демоном fsmonitor."""
+        output = self.query(["version", "--build-options"])
+        return bool(output) and FSMONITOR_BUILD_OPTION in output
+
+    def performance_settings(self) -> dict[str, tuple[str | None, str]]:
+        """
+        Сравнивает настройки производительности с рекомендуемыми.
+
+        `core.untrackedCache` кэширует списки неотслеживаемых файлов по
+        директориям, `core.fsmonitor` позволяет не проверять `stat` всех
+        файлов при каждом `git status`. Второй параметр предлагается,
+        только если Git собран со встроенным демоном (macOS, Windows).
+
+        Returns:
+            dict[str, tuple[str | None, str]]: Текущее (None — не задано)
+                и рекомендуемое значение по именам настроек.
+        """
+        keys = [UNTRACKED_CACHE_KEY]
+        if self.fsmonitor_supported():
+            keys.append(FSMONITOR_KEY)
+        settings: dict[str, tuple[str | None, str]] = {}
+        for key in keys:
+            current = self.query(["config", "--get", key], cache=False)
+            settings[key] = (current.strip() if current else None, "true")
+        return settings
+
+    def enable_performance_settings(self) -> list[str]:
+        """
+        Включает рекомендуемые настройки в `.git/config` репозитория.
+
+        Returns:
+            list[str]: Имена изменённых настроек.
+        """
+        changed: list[str] = []
+        for key, (current, value) in self.performance_settings().items():
+            if current == value:
+                continue
+            if self.run(["config", "--local", key, value], silent=True):
+                changed.append(key)
+        return changed
+
+    def query(
+        self,
+        args: list[str],
+        cache: bool = True,
+        input: str | None = None,
+    ) -> str | None:
+        """
+        Выполняет команду Git только на чтение.
+
+        Args:
+            args (list[str]): Аргументы git-команды.
+            cache (bool): Запоминать ли результат до изменения
+                состояния `.git`.
+            input (str | None): Данные для стандартного ввода (команды
+                с вводом не кэшируются).
+
+        Returns:
+            str | None: Стандартный вывод команды или None при ошибке.
+        """
+        cache = cache and input is None and self.git_dir is not None
+        key = tuple(args)
+        if cache:
+            # Отпечаток снимается до запуска: изменения во время команды
+            # сбросят кэш при следующем обращении
+            stamp = self.stamp()
+            if stamp != self._cache_stamp:
+                self._cache.clear()
+                self._cache_stamp = stamp
+            if key in self._cache:
+                profiling.count("git.cache_hits")
+                return self._cache[key]
+
+        output = run_git(
+            args,
+            repo_root_path=self.cwd,
+            capture_output=True,
+            silent=True,
+            env=READ_ONLY_ENV,
+            input=input,
+        )
+        if output is False:
+            return None
+        if cache:
+            self._cache[key] = output
+        return output
+
+    def state(self, untracked: bool = True) -> RepoState | None:
+        """
+        Получает снимок состояния репозитория (см. `get_repo_state()`).
+
+        Args:
+            untracked (bool): Искать ли неотслеживаемые файлы.
+
+        Returns:
+            RepoState | None: Состояние репозитория или None при ошибке.
+        """
+        output = self.query(_status_args(untracked), cache=False)
+        return None if output is None else parse_status(output)
+
+    def unpushed_count(self) -> int | None:
+        """
+        Считает коммиты HEAD, которых нет ни в одной удалённой ветке.
+
+        Используется вместо `RepoState.ahead`, когда ссылки отслеживания
+        upstream нет (`RepoState.upstream_gone`).
+
+        Returns:
+            int | None: Число коммитов или None при ошибке.
+        """
+        output = self.query(
+            ["rev-list", "--count", "HEAD", "--not", "--remotes"]
+        )
+        try:
+            return int(output) if output else None
+        except ValueError:
+            return None
+
+    def upstream(self) -> UpstreamRef | None:
+        """
+        Определяет upstream текущей ветки без сетевых запросов.
+
+        Returns:
+            UpstreamRef | None: Upstream или None, если HEAD отсоединён
+                либо upstream не задан.
+        """
+        head = self.query(["symbolic-ref", "-q", "HEAD"])
+        if not head:
+            return None
+        output = self.query([
+            "for-each-ref",
+            "--format=%(upstream:remotename)%00%(upstream:remoteref)"
+            "%00%(upstream)",
+            head.strip(),
+        ])
+        fields = (output or "").strip().split("\0")
+        if len(fields) != 3 or not all(fields):
+            return None
+        return UpstreamRef(*fields)
+
+    def remote_tip(
+        self,
+        upstream: UpstreamRef,
+        ttl: float = DEFAULT_REMOTE_CHECK_TTL,
+    ) -> str | None:
+        """
+        Получает хэш вершины удалённой ветки одним `git ls-remote`.
+
+        Результат запоминается на `ttl` секунд, поэтому повторные
+        действия меню не обращаются к сети.
+
+        Args:
+            upstream (UpstreamRef): Upstream ветки.
+            ttl (float): Время жизни результата в секундах.
+
+        Returns:
+            str | None: Хэш коммита или None, если удалённый репозиторий
+                недоступен либо ветки в нём нет.
+        """
+        key = (upstream.remote, upstream.remote_ref)
+        cached = self._remote_tips.get(key)
+        if cached and monotonic() - cached[0] < ttl:
+            profiling.count("git.remote_tip_cache_hits")
+            return cached[1]
+
+        # Проверка не должна ждать ввода пароля: без неё fetch
+        # выполняется как обычно
+        output = run_git(
+            ["ls-remote", "--quiet", upstream.remote, upstream.remote_ref],
+            repo_root_path=self.cwd,
+            capture_output=True,
+            silent=True,
+            env={**READ_ONLY_ENV, **non_interactive_env()},
+        )
+        if output is False:
+            output = None
+        tip = None
+        # Шаблон ls-remote совпадает и с окончанием других ссылок
+        for line in (output or "").splitlines():
+            object_id, _, ref = line.partition("\t")
+            if ref == upstream.remote_ref:
+                tip = object_id
+                break
+        if output is not None:
+            self._remote_tips[key] = (monotonic(), tip)
+        return tip
+
+    def is_partial_clone(self, remote: str) -> bool:
+        """
+        Проверяет, настроен ли удалённый репозиторий как частичный клон
+        (`remote.<имя>.promisor`).
+
+        Args:
+            remote (str): Имя удалённого репозитория.
+
+        Returns:
+            bool: True, если недостающие объекты догружаются из него.
+        """
+        output = self.query(
+            ["config", "--type=bool", "--get", f"remote.{remote}.promisor"]
+        )
+        return (output or "").strip() == "true"
+
+    def fetch(
+        self,
+        options: FetchOptions = FetchOptions(),
+        silent: bool = False,
+        interactive: bool = True,
+    ) -> bool | None:
+        """
+        Выполняет `git fetch`, если upstream мог измениться.
+
+        Сначала вершина удалённой ветки (`remote_tip()`) сравнивается
+        с локальной ссылкой отслеживания: если они совпадают, fetch не
+        нужен. При недоступности проверки fetch выполняется как обычно.
+
+        `fetch --filter` навсегда превращает репозиторий в частичный
+        клон (Git записывает `remote.<имя>.promisor` и догружает
+        недостающие объекты по сети), поэтому фильтр применяется, только
+        если удалённый репозиторий уже им является (`is_partial_clone()`).
+
+        Args:
+            options (FetchOptions): Параметры fetch и проверки.
+            silent (bool): Если True — подавляет вывод в консоль.
+            interactive (bool): Если False — вывод Git (включая stderr)
+                перехватывается, а запросы учётных данных отключены
+                (`non_interactive_env()`): fetch без сохранённых учётных
+                данных завершается ошибкой, а не ждёт ввода. Для
+                фоновых проверок.
+
+        Returns:
+            bool | None: True — fetch выполнен, False — пропущен (ссылка
+                отслеживания актуальна), None — fetch завершился ошибкой.
+        """
+        upstream = self.upstream()
+        if upstream and options.remote_check:
+            local_tip = self.query(
+                ["rev-parse", "--verify", "-q", upstream.tracking_ref]
+            )
+            remote_tip = self.remote_tip(upstream, options.remote_check_ttl)
+            if remote_tip and local_tip and local_tip.strip() == remote_tip:
+                profiling.count("git.fetch_skipped")
+                return False
+
+        # Без silent прогресс передачи отображается индикатором
+        args = ["fetch", "--quiet"] if silent else ["fetch"]
+        remote = upstream.remote if upstream else DEFAULT_REMOTE
+        if options.filter and self.is_partial_clone(remote):
+            args.append(f"--filter={options.filter}")
+        args.extend(options.extra_args)
+        if options.single_branch and upstream:
+            args.extend([
+                upstream.remote,
+                f"+{upstream.remote_ref}:{upstream.tracking_ref}",
+            ])
+        if not interactive:
+            ok = self.run(
+                args,
+                capture_output=True,
+                silent=True,
+                env=non_interactive_env(),
+            ) is not False
+        elif silent:
+            ok = bool(self.run(args, silent=True))
+        else:
+            ok = self.stream(args)
+        if not ok:
+            return None
+        if upstream:
+            # Ссылка отслеживания теперь совпадает с удалённой веткой
+            tip = self.query(
+                ["rev-parse", "--verify", "-q", upstream.tracking_ref]
+            )
+            self._remote_tips[(upstream.remote, upstream.remote_ref)] = (
+                monotonic(), tip.strip() if tip else None
+            )
+        return True
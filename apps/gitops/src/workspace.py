@@ -0,0 +1,395 @@
+"""
+Одновременная синхронизация нескольких репозиториев.
+
+Рабочее пространство — корневой репозиторий, его сабмодули (по
+`.gitmodules`, рекурсивно) и дополнительные репозитории из конфига.
+Команды Git для всех репозиториев запускаются через
+`asyncio.create_subprocess_exec`, а семафор ограничивает число
+одновременно работающих процессов, поэтому сетевые задержки
+`fetch`/`pull`/`push` разных репозиториев перекрываются. Ход работы
+отображается общей таблицей, обновляемой на месте.
+
+Режим не создаёт коммиты: `push` отправляет только уже созданные
+коммиты, а незакоммиченные изменения отмечаются в таблице.
+
+Сетевые команды выполняются без запросов учётных данных
+(`non_interactive_env()`): параллельные процессы не могут делить один
+терминал, поэтому репозиторий без сохранённых учётных данных
+отмечается в таблице ошибкой аутентификации.
+"""
+import asyncio
+import os
+import re
+from pathlib import Path
+from time import perf_counter
+from typing import NamedTuple
+
+from rich.console import Console
+from rich.live import Live
+from rich.markup import escape
+from rich.table import Table
+
+from apps.gitops.src.utils import (
+    READ_ONLY_ENV,
+    RepoState,
+    non_interactive_env,
+    parse_status,
+)
+from apps.shared import profiling
+
+WORKSPACE_ACTIONS: tuple[str, ...] = ("fetch", "pull", "push")
+DEFAULT_MAX_CONCURRENCY: int = 4
+GITMODULES_FILE_NAME: str = ".gitmodules"
+# Строка `path = <путь>` в секции сабмодуля
+SUBMODULE_PATH_RE = re.compile(r"^\s*path\s*=\s*(.+?)\s*$", re.MULTILINE)
+# Сообщения Git и SSH об отсутствии или отказе в учётных данных
+AUTH_ERROR_RE = re.compile(
+    r"Authentication failed"
+    r"|could not read (?:Username|Password)"
+    r"|terminal prompts disabled"
+    r"|Permission denied \((?:publickey|password|keyboard-interactive)"
+    r"|Host key verification failed",
+    re.IGNORECASE,
+)
+
+console = Console()
+
+
+class SyncResult(NamedTuple):
+    """Итог синхронизации одного репозитория."""
+    path: Path
+    ok: bool
+    message: str
+    state: RepoState | None = None
+
+
+def read_submodules(repo: Path) -> list[Path]:
+    """
+    Читает пути сабмодулей из `.gitmodules`.
+
+    Args:
+        repo (Path): Корень репозитория.
+
+    Returns:
+        list[Path]: Абсолютные пути сабмодулей, существующих на диске.
+    """
+    try:
+        content = (repo / GITMODULES_FILE_NAME).read_text(encoding="utf-8")
+    except OSError:
+        return []
+
+    paths: list[Path] = []
+    for match in SUBMODULE_PATH_RE.finditer(content):
+        path = (repo / match.group(1).strip('"')).resolve()
+        # У инициализированного сабмодуля есть файл или директория .git
+        if (path / ".git").exists():
+            paths.append(path)
+    return paths
+
+
+def discover_repos(
+    root: Path,
+    extra: list[str | Path] | None = None,
+) -> list[Path]:
+    """
+    Собирает репозитории рабочего пространства.
+
+    Args:
+        root (Path): Корневой репозиторий.
+        extra (list[str | Path] | None): Дополнительные репозитории;
+            относительные пути отсчитываются от `root`.
+
+    Returns:
+        list[Path]: Пути репозиториев без повторов: корень, его
+            сабмодули (рекурсивно) и дополнительные репозитории.
+    """
+    repos: dict[Path, None] = {}
+    queue = [root.resolve()]
+    queue.extend(
+        (root / path).resolve() for path in reversed(extra or [])
+    )
+    while queue:
+        repo = queue.pop(0)
+        if repo in repos or not (repo / ".git").exists():
+            continue
+        repos[repo] = None
+        queue[:0] = read_submodules(repo)
+    return list(repos)
+
+
+async def _git(
+    repo: Path,
+    args: list[str],
+    semaphore: asyncio.Semaphore,
+    read_only: bool = False,
+    network: bool = False,
+) -> tuple[int, str]:
+    """
+    Выполняет команду Git в отдельном процессе.
+
+    Args:
+        repo (Path): Корень репозитория.
+        args (list[str]): Аргументы git-команды.
+        semaphore (asyncio.Semaphore): Ограничение числа процессов.
+        read_only (bool): Запускать без необязательных блокировок.
+        network (bool): Команда обращается к удалённому репозиторию:
+            запросы учётных данных отключаются.
+
+    Returns:
+        tuple[int, str]: Код возврата и вывод (stdout, а при ошибке —
+            stderr).
+    """
+    extra_env: dict[str, str] = {}
+    if read_only:
+        extra_env.update(READ_ONLY_ENV)
+    if network:
+        extra_env.update(non_interactive_env())
+    env = {**os.environ, **extra_env} if extra_env else None
+    async with semaphore:
+        started = perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            "git", *args,
+            cwd=repo,
+            env=env,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await process.communicate()
+        profiling.record_subprocess(
+            ["git", *args],
+            started,
+            perf_counter() - started,
+            process.returncode,
+            stdout,
+        )
+    output = stdout if process.returncode == 0 else stderr
+    return process.returncode, output.decode("utf-8", "replace")
+
+
+def _last_line(text: str) -> str:
+    """Возвращает последнюю непустую строку вывода Git."""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    return lines[-1] if lines else ""
+
+
+def _error(command: str, output: str) -> str:
+    """
+    Формирует сообщение об ошибке команды для таблицы.
+
+    Args:
+        command (str): Название команды Git.
+        output (str): Вывод ошибки.
+
+    Returns:
+        str: Сообщение; для ошибок аутентификации — подсказка вместо
+            последней строки вывода.
+    """
+    if AUTH_ERROR_RE.search(output):
+        return f"{command}: требуется аутентификация (нет учётных данных)"
+    return f"{command}: {_last_line(output)}"
+
+
+async def sync_repo(
+    repo: Path,
+    action: str,
+    semaphore: asyncio.Semaphore,
+    statuses: dict[Path, str],
+) -> SyncResult:
+    """
+    Синхронизирует один репозиторий.
+
+    Алгоритм:
+      1. Для `fetch` и `pull` выполняет `git fetch`.
+      2. Получает состояние репозитория одним вызовом `git status`.
+      3. Для `pull` выполняет `git merge --ff-only @{u}`, если ветка
+         отстаёт (коммиты уже получены на шаге 1, повторный fetch
+         внутри `git pull` не нужен);
+         для `push` — `git push`, если есть неотправленные коммиты.
+
+    Args:
+        repo (Path): Корень репозитория.
+        action (str): Действие из `WORKSPACE_ACTIONS`.
+        semaphore (asyncio.Semaphore): Ограничение числа процессов.
+        statuses (dict[Path, str]): Текущие этапы для таблицы.
+
+    Returns:
+        SyncResult: Итог синхронизации.
+    """
+    if action in ("fetch", "pull"):
+        statuses[repo] = "fetch..."
+        code, output = await _git(
+            repo, ["fetch", "--quiet"], semaphore, network=True
+        )
+        if code:
+            return SyncResult(repo, False, _error("fetch", output))
+
+    statuses[repo] = "status..."
+    code, output = await _git(
+        repo,
+        ["status", "--porcelain=v2", "--branch", "-z"],
+        semaphore,
+        read_only=True,
+    )
+    if code:
+        return SyncResult(repo, False, f"status: {_last_line(output)}")
+    state = parse_status(output)
+    if state.branch is None:
+        return SyncResult(repo, True, "HEAD отсоединён, пропущен", state)
+    if state.upstream is None:
+        return SyncResult(repo, True, "upstream не задан, пропущен", state)
+    if state.upstream_gone:
+        if action != "push":
+            return SyncResult(
+                repo, False, f"ветка {state.upstream} не найдена", state
+            )
+        # Расхождение неизвестно: считаются коммиты вне удалённых веток
+        code, output = await _git(
+            repo,
+            ["rev-list", "--count", "HEAD", "--not", "--remotes"],
+            semaphore,
+            read_only=True,
+        )
+        if code:
+            return SyncResult(
+                repo, False, f"rev-list: {_last_line(output)}", state
+            )
+        state = state._replace(ahead=int(output))
+
+    if action == "pull" and state.behind:
+        statuses[repo] = f"pull ({state.behind})..."
+        code, output = await _git(
+            repo, ["merge", "--ff-only", "--quiet", "@{u}"], semaphore
+        )
+        if code:
+            return SyncResult(repo, False, _error("pull", output), state)
+        return SyncResult(
+            repo, True, f"получено коммитов: {state.behind}", state
+        )
+
+    if action == "push" and state.ahead:
+        statuses[repo] = f"push ({state.ahead})..."
+        code, output = await _git(repo, ["push"], semaphore, network=True)
+        if code:
+            return SyncResult(repo, False, _error("push", output), state)
+        return SyncResult(
+            repo, True, f"отправлено коммитов: {state.ahead}", state
+        )
+
+    if action == "fetch" and (state.ahead or state.behind):
+        return SyncResult(
+            repo,
+            True,
+            f"впереди: {state.ahead}, позади: {state.behind}",
+            state,
+        )
+    return SyncResult(repo, True, "актуален", state)
+
+
+def _build_table(
+    repos: list[Path],
+    root: Path,
+    statuses: dict[Path, str],
+    results: dict[Path, SyncResult],
+) -> Table:
+    """Строит таблицу состояния синхронизации."""
+    table = Table(title="Синхронизация репозиториев", show_lines=True)
+    table.add_column("Репозиторий", style="bold cyan")
+    table.add_column("Ветка")
+    table.add_column("Изменения", justify="right")
+    table.add_column("Состояние", style="bold white")
+    for repo in repos:
+        name = escape(
+            "." if repo == root else os.path.relpath(repo, root)
+        )
+        result = results.get(repo)
+        if result is None:
+            table.add_row(
+                name, "", "", f"[dim]{statuses.get(repo, 'ожидание')}[/dim]"
+            )
+            continue
+        state = result.state
+        style = "green" if result.ok else "red"
+        table.add_row(
+            name,
+            (state.branch or "—") if state else "",
+            str(len(state.changes)) if state and state.changes else "",
+            f"[{style}]{escape(result.message)}[/{style}]",
+        )
+    return table
+
+
+async def _sync_all(
+    repos: list[Path],
+    action: str,
+    max_concurrency: int,
+    live: Live,
+    root: Path,
+) -> dict[Path, SyncResult]:
+    """Запускает синхронизацию всех репозиториев и обновляет таблицу."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    statuses: dict[Path, str] = {}
+    results: dict[Path, SyncResult] = {}
+
+    async def run(repo: Path) -> None:
+        try:
+            results[repo] = await sync_repo(
+                repo, action, semaphore, statuses
+            )
+        except OSError as e:
+            results[repo] = SyncResult(repo, False, str(e))
+
+    tasks = [asyncio.create_task(run(repo)) for repo in repos]
+    pending = set(tasks)
+    while pending:
+        # Таблица перестраивается при каждом завершении и раз в 0.2 с
+        _, pending = await asyncio.wait(pending, timeout=0.2)
+        live.update(_build_table(repos, root, statuses, results))
+    return results
+
+
+def sync_workspace(
+    repos: list[Path],
+    action: str = "pull",
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> list[SyncResult]:
+    """
+    Синхронизирует репозитории одновременно.
+
+    Args:
+        repos (list[Path]): Репозитории (см. `discover_repos()`); первый
+            считается корнем для отображения путей.
+        action (str): Действие из `WORKSPACE_ACTIONS`.
+        max_concurrency (int): Максимальное число одновременно
+            работающих процессов Git.
+
+    Returns:
+        list[SyncResult]: Итоги в порядке `repos`.
+    """
+    if not repos:
+        console.print("Репозитории не найдены.", style="yellow")
+        return []
+
+    root = repos[0]
+    console.print(
+        f"[bold cyan]Репозиториев:[/bold cyan] {len(repos)}, "
+        f"[bold cyan]действие:[/bold cyan] {action}"
+    )
+    with (
+        profiling.phase("gitops.workspace", action=action, repos=len(repos)),
+        Live(
+            _build_table(repos, root, {}, {}),
+            console=console,
+            refresh_per_second=8,
+        ) as live,
+    ):
+        results = asyncio.run(
+            _sync_all(repos, action, max(1, max_concurrency), live, root)
+        )
+
+    failed = sum(not result.ok for result in results.values())
+    if failed:
+        console.print(f" ✘ Ошибок: {failed}", style="red")
+    else:
+        console.print(" ✔ Все репозитории обработаны", style="green")
+    return [results[repo] for repo in repos]
@@ -1,3 +1,4 @@
+import argparse
 from pathlib import Path
 
 import questionary
@@ -9,11 +10,30 @@ from apps.menu.src.utils import (
     get_cuberbug_walls_path,
     get_root_path
 )
-from apps.gitops.src.core import git_pull, git_push
-from apps.renamer.src.core import rename_files
+from apps.gitops.src.core import git_maintenance, git_pull, git_push
+from apps.gitops.src.chunked import ChunkLimits
+from apps.gitops.src.largefiles import SizeLimits
+from apps.gitops.src.prefetch import DEFAULT_PREFETCH_MAX_AGE, Prefetcher
+from apps.gitops.src.utils import FetchOptions, GitSession, RepoState
+from apps.gitops.src.workspace import (
+    DEFAULT_MAX_CONCURRENCY,
+    discover_repos,
+    sync_workspace,
+)
+from apps.renamer.src.core import (
+    dedupe_files,
+    rename_files,
+    undo_renames,
+    watch_files,
+)
+from apps.renamer.src.journal import find_latest_journal
+from apps.shared import profiling
 
 console = Console()
 
+# Пункты главного меню со значками фоновой проверки
+GIT_ITEMS: tuple[str, ...] = ("git_push", "git_pull")
+
 
 class Menu:
     """Управляет меню."""
@@ -30,11 +50,20 @@ class Menu:
         self.questionary_title = self.config.get("questionary_title", "")
         self.menu = self.config["menu"]
         self.renamer = self.config["renamer"]
+        self.workspace = self.config["workspace"]
+        gitops = self.config.get("gitops", {})
+        self.fetch_options = FetchOptions.from_config(gitops.get("fetch"))
+        self.prefetch = gitops.get("prefetch") or {}
+        self.size_limits = SizeLimits.from_config(gitops.get("large_files"))
+        self.chunk_limits = ChunkLimits.from_config(gitops.get("chunked"))
 
     def _load_config(self, config_path: Path) -> dict:
         """Загружает YAML-конфигурацию."""
         try:
-            with open(config_path, "r", encoding="utf-8") as file:
+            with (
+                profiling.phase("menu.load_config"),
+                open(config_path, "r", encoding="utf-8") as file,
+            ):
                 return yaml.safe_load(file)
         except yaml.YAMLError as e:
             console.print(
@@ -42,6 +71,54 @@ class Menu:
             )
             raise
 
+    def _ask_git_choice(
+        self,
+        actions: dict[str, str],
+        prefetcher: Prefetcher,
+    ) -> str | None:
+        """
+        Задаёт вопрос главного меню со значками пунктов Git.
+
+        Пока идёт фоновая проверка, пункты Git показывают
+        `pending_badge`; когда она завершается, заголовки обновляются
+        в уже открытом меню.
+
+        Args:
+            actions (dict[str, str]): Заголовки пунктов и их ключи.
+            prefetcher (Prefetcher): Фоновая проверка состояния.
+
+        Returns:
+            str | None: Ключ выбранного пункта или None при отмене.
+        """
+        pending = prefetcher.running
+        state = None if pending else prefetcher.peek()
+        choices = [
+            questionary.Choice(
+                self._git_title(key, state, pending)
+                if key in GIT_ITEMS else title,
+                value=key,
+            )
+            for title, key in actions.items()
+        ]
+        question = questionary.select(self.questionary_title, choices=choices)
+
+        def refresh(state: RepoState | None) -> None:
+            # questionary перерисовывает заголовки выбора при каждом
+            # обновлении экрана
+            for choice in choices:
+                if choice.value in GIT_ITEMS:
+                    choice.title = self._git_title(choice.value, state)
+            question.application.invalidate()
+
+        prefetcher.on_done = refresh
+        # Проверка могла завершиться, пока строилось меню
+        if pending and not prefetcher.running:
+            refresh(prefetcher.peek())
+        try:
+            return question.ask()
+        finally:
+            prefetcher.on_done = None
+
     def _ask_choice(self, message: str, choices: list[str]) -> str | None:
         """Единая обёртка для вопроса выбора."""
         return questionary.select(message, choices=choices).ask()
@@ -50,50 +127,184 @@ class Menu:
         """Отображает главное меню Repo-Tools."""
         console.print(self.title_menu)
 
-        submodule_mode = is_submodule()
-        repo_root_path = get_root_path(submodule_mode)
-        cuberbug_walls_path = (
-            get_cuberbug_walls_path() if submodule_mode else None
-        )
-
-        base_actions = [
-            self.menu["git_push"]["title"],
-            self.menu["git_pull"]["title"],
-            self.menu["renamer_menu"]["title"],
-            self.menu["exit"]["title"]
-        ]
+        with profiling.phase("menu.detect_context"):
+            submodule_mode = is_submodule()
+            repo_root_path = get_root_path(submodule_mode)
+            cuberbug_walls_path = (
+                get_cuberbug_walls_path() if submodule_mode else None
+            )
+        # Один сеанс Git на всё время работы меню; пока пользователь
+        # выбирает пункт, состояние проверяется в фоне
+        git_session = GitSession(repo_root_path)
+        prefetcher = Prefetcher(git_session, self.fetch_options)
+        prefetch_enabled = self.prefetch.get("enabled", True)
+        max_age = self.prefetch.get("max_age", DEFAULT_PREFETCH_MAX_AGE)
+        if prefetch_enabled:
+            prefetcher.start()
 
         while True:
-            choice = self._ask_choice(self.questionary_title, base_actions)
-
-            if choice in (None, self.menu["exit"]["title"]):
+            actions = {
+                self.menu[key]["title"]: key
+                for key in (
+                    "git_push",
+                    "git_pull",
+                    "workspace_menu",
+                    "git_maintenance",
+                    "renamer_menu",
+                    "exit",
+                )
+            }
+            action = self._ask_git_choice(actions, prefetcher)
+
+            if action in (None, "exit"):
                 console.print("\nВыход из программы...", style="bold yellow")
                 break
 
-            if choice == self.menu["git_push"]["title"]:
-                git_push(repo_root_path)
+            if action == "git_push":
+                git_push(
+                    repo_root_path,
+                    session=git_session,
+                    state=self._prefetched_state(prefetcher),
+                    size_limits=self.size_limits,
+                    chunk_limits=self.chunk_limits,
+                )
+
+            elif action == "git_pull":
+                state = self._prefetched_state(prefetcher)
+                git_pull(
+                    repo_root_path,
+                    session=git_session,
+                    fetch_options=self.fetch_options,
+                    # Снимок без успешного fetch не годится для pull
+                    state=state if prefetcher.fetched is not None else None,
+                )
+
+            elif action == "workspace_menu":
+                # Фоновый fetch и синхронизация не должны работать
+                # с одним репозиторием одновременно
+                self._prefetched_state(prefetcher)
+                self.workspace_menu(repo_root_path)
+
+            elif action == "git_maintenance":
+                # Сеанс Git занят фоновой проверкой до её завершения
+                self._prefetched_state(prefetcher)
+                git_maintenance(repo_root_path, session=git_session)
+
+            elif action == "renamer_menu":
+                self.renamer_menu(cuberbug_walls_path)
 
-            elif choice == self.menu["git_pull"]["title"]:
-                git_pull(repo_root_path)
+            # Снимок устаревает при любом изменении `.git`, поэтому
+            # проверка перезапускается только после действий, которые
+            # могли изменить состояние (или по сроку `max_age`)
+            if prefetch_enabled and prefetcher.snapshot(max_age) is None:
+                prefetcher.start()
+
+    def _git_title(
+        self,
+        key: str,
+        state: RepoState | None,
+        pending: bool = False,
+    ) -> str:
+        """
+        Возвращает заголовок пункта Git со значком фоновой проверки.
+
+        Args:
+            key (str): Ключ пункта в секции `menu` (`git_push`, `git_pull`).
+            state (RepoState | None): Снимок фоновой проверки.
+            pending (bool): Идёт ли проверка.
+
+        Returns:
+            str: Заголовок, например «Обновить (git pull) (отстаёт на 3)».
+        """
+        title = self.menu[key]["title"]
+        badge = self.menu[key].get("badge")
+        if not badge:
+            return title
+        if pending:
+            pending_badge = self.prefetch.get("pending_badge")
+            return f"{title} ({pending_badge})" if pending_badge else title
+        if state is None:
+            return title
+        counts = {
+            "changes": len(state.changes),
+            "ahead": state.ahead,
+            "behind": state.behind,
+        }
+        # Значок показывается, только если есть что отправить или получить
+        relevant = ("changes", "ahead") if key == "git_push" else ("behind",)
+        if not any(counts[name] for name in relevant):
+            return title
+        return f"{title} ({badge.format(**counts)})"
+
+    def _prefetched_state(self, prefetcher: Prefetcher) -> RepoState | None:
+        """
+        Дожидается фоновой проверки и возвращает её свежий снимок.
+
+        Args:
+            prefetcher (Prefetcher): Фоновая проверка состояния.
+
+        Returns:
+            RepoState | None: Снимок или None, если он устарел.
+        """
+        if prefetcher.running:
+            with console.status("Завершается фоновая проверка..."):
+                prefetcher.wait()
+        return prefetcher.snapshot(
+            self.prefetch.get("max_age", DEFAULT_PREFETCH_MAX_AGE)
+        )
 
-            elif choice == self.menu["renamer_menu"]["title"]:
-                self.renamer_menu(cuberbug_walls_path)
+    def workspace_menu(self, repo_root_path: Path | None) -> None:
+        """Подменю одновременной синхронизации репозиториев."""
+        console.print(self.workspace["title"], style="bold cyan")
+
+        root = repo_root_path or get_root_path()
+        if root is None:
+            console.print("Корень репозитория не найден.", style="red")
+            return
+
+        actions = {
+            self.workspace[key]["title"]: self.workspace[key]["action"]
+            for key in ("fetch", "pull", "push")
+        }
+        choices = [*actions, self.workspace["back"]["title"]]
+
+        while True:
+            choice = self._ask_choice(self.questionary_title, choices)
+            if choice in (None, self.workspace["back"]["title"]):
+                break
+
+            # Сабмодули могли появиться после прошлого действия
+            repos = discover_repos(root, self.workspace.get("repos"))
+            sync_workspace(
+                repos,
+                action=actions[choice],
+                max_concurrency=self.workspace.get(
+                    "max_concurrency", DEFAULT_MAX_CONCURRENCY
+                ),
+            )
 
     def renamer_menu(self, cuberbug_walls_path: Path | None) -> None:
         """Подменю для запуска Renamer."""
         console.print(self.renamer["title"], style="bold cyan")
 
-        choices = []
-
-        # Добавляем автоматические действия, если путь найден
+        # Автоматические действия для cuberbug_walls: заголовок → настройки
+        auto_actions = {}
         if cuberbug_walls_path:
-            choices.extend([
-                self.renamer["dry_run_cuberbug_walls"]["title"],
-                self.renamer["full_cuberbug_walls"]["title"]
-            ])
+            for key in (
+                "dry_run_cuberbug_walls",
+                "full_cuberbug_walls",
+                "fast_cuberbug_walls",
+                "dedupe_cuberbug_walls",
+                "watch_cuberbug_walls",
+            ):
+                action = self.renamer.get(key)
+                if action:
+                    auto_actions[action["title"]] = action
 
+        choices = list(auto_actions)
         choices.extend([
             self.renamer["custom_path"]["title"],
+            self.renamer["undo_last"]["title"],
             self.renamer["back"]["title"]
         ])
 
@@ -104,14 +315,42 @@ class Menu:
                 break
 
             # Варианты для cuberbug_walls
-            if cuberbug_walls_path and choice in (
-                self.renamer["dry_run_cuberbug_walls"]["title"],
-                self.renamer["full_cuberbug_walls"]["title"]
-            ):
-                if choice == self.renamer["dry_run_cuberbug_walls"]["title"]:
-                    dry_run = self.renamer["dry_run_cuberbug_walls"]["dry_run"]
+            if choice in auto_actions:
+                action = auto_actions[choice]
+                if action.get("dedupe"):
+                    dedupe_files(
+                        cuberbug_walls_path,
+                        action=action["dedupe"],
+                        dry_run=action.get("dry_run", False),
+                    )
+                    continue
+                if action.get("watch"):
+                    watch_files(
+                        cuberbug_walls_path,
+                        backend=action["watch"],
+                        log_path=action.get("log_file"),
+                    )
+                    continue
 
-                rename_files(cuberbug_walls_path, dry_run=dry_run)
+                rename_files(
+                    cuberbug_walls_path,
+                    dry_run=action.get("dry_run", False),
+                    fast=action.get("fast", False),
+                    log_path=action.get("log_file"),
+                    timestamp_source=action.get("timestamp_source", "mtime"),
+                )
+                continue
+
+            # Отмена последнего запуска по журналу
+            if choice == self.renamer["undo_last"]["title"]:
+                journal_path = find_latest_journal(applied_only=True)
+                if journal_path is None:
+                    console.print(
+                        "Журнал переименований не найден.", style="yellow"
+                    )
+                    continue
+
+                undo_renames(journal_path)
                 continue
 
             # Пользовательский путь
@@ -134,11 +373,34 @@ class Menu:
                     self.renamer["question_dry_run"]["title"]
                 ).ask()
 
-                rename_files(path, dry_run=dry_run)
+                fast = questionary.confirm(
+                    self.renamer["question_fast"]["title"],
+                    default=False,
+                ).ask()
+
+                rename_files(path, dry_run=dry_run, fast=fast)
 
 
 def main() -> None:
-    """Точка входа: загружает конфиг и запускает меню."""
+    """
+    Точка входа: загружает конфиг и запускает меню.
+
+    Аргументы CLI:
+        --profile [FILE] — замер этапов с записью трассы в JSON (также
+            переменная `REPO_TOOLS_PROFILE`, удобная при запуске через
+            `start`).
+    """
+    parser = argparse.ArgumentParser(description="Главное меню Repo-Tools.")
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        nargs="?",
+        const="",
+        default=None,
+        help="Записывает трассу этапов в JSON и выводит сводку при выходе."
+    )
+    profiling.setup(parser.parse_args().profile)
+
     file_dir = Path(__file__).resolve().parent
     config_path = file_dir.parent.parent / Menu.CONFIG_NAME
 
@@ -0,0 +1,187 @@
+"""
+Бенчмарк Renamer на синтетическом дереве изображений.
+"""
+import argparse
+import sys
+
+from rich.console import Console
+from rich.table import Table
+
+from .src.bench import (
+    BENCH_BACKENDS,
+    DEFAULT_REGRESSION_THRESHOLD,
+    TreeSpec,
+    compare_results,
+    load_results,
+    run_benchmark,
+    save_results,
+)
+
+console = Console()
+
+
+def _print_results(results: dict) -> None:
+    """Выводит таблицы с результатами замеров."""
+    counts = results["counts"]
+    console.print(
+        f"Файлов: {counts['files']}, директорий: {counts['directories']}, "
+        f"переименовано: {counts['renamed']}, "
+        f"пропущено: {counts['skipped']}"
+    )
+
+    table = Table(title="Этапы", show_lines=True)
+    table.add_column("Этап", style="bold cyan")
+    table.add_column("Лучшее, с", style="bold white")
+    table.add_column("Медиана, с")
+    for name, values in results["phases"].items():
+        table.add_row(name, f"{values['best']:.3f}", f"{values['median']:.3f}")
+    console.print(table)
+
+    table = Table(title="Функции", show_lines=True)
+    table.add_column("Функция", style="bold cyan")
+    table.add_column("Лучшее, нс/вызов", style="bold white")
+    table.add_column("Медиана, нс/вызов")
+    for name, values in results["micro_ns"].items():
+        table.add_row(name, f"{values['best']:.0f}", f"{values['median']:.0f}")
+    console.print(table)
+
+
+def main():
+    """
+    Точка входа бенчмарка.
+
+    Генерирует дерево во временной директории, замеряет этапы
+    сканирования, планирования и переименования, а также функции
+    проверки имён, и при необходимости сравнивает результаты с базовым
+    запуском. При обнаружении регрессии завершается с кодом 1.
+
+    Пример использования:
+        python -m apps.renamer.benchmark --files 50000 --output new.json
+        python -m apps.renamer.benchmark --compare old.json
+
+    Аргументы CLI:
+        --files N — количество файлов.
+        --depth N — глубина дерева директорий.
+        --fanout N — число поддиректорий в каждой директории.
+        --collision-rate X — доля файлов с совпадающим mtime.
+        --renamed-ratio X — доля уже переименованных файлов.
+        --seed N — зерно генератора случайных чисел.
+        --repeat N — количество повторов.
+        --backend {fs,git} — способ перечисления файлов.
+        --tmp-dir DIR — где создавать временное дерево.
+        --output FILE — файл для результатов в JSON.
+        --compare FILE — результаты базового запуска для сравнения.
+        --threshold X — допустимое относительное замедление.
+    """
+    defaults = TreeSpec()
+    parser = argparse.ArgumentParser(
+        description="Замеряет производительность Renamer."
+    )
+    parser.add_argument("--files", type=int, default=defaults.files)
+    parser.add_argument("--depth", type=int, default=defaults.depth)
+    parser.add_argument("--fanout", type=int, default=defaults.fanout)
+    parser.add_argument(
+        "--collision-rate", type=float, default=defaults.collision_rate
+    )
+    parser.add_argument(
+        "--renamed-ratio", type=float, default=defaults.renamed_ratio
+    )
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend", choices=BENCH_BACKENDS, default="fs")
+    parser.add_argument(
+        "--tmp-dir",
+        metavar="DIR",
+        default=None,
+        help="Где создавать временное дерево (по умолчанию — системный tmp)."
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        default=None,
+        help="Записывает результаты в JSON-файл."
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="FILE",
+        default=None,
+        help="Сравнивает результаты с сохранённым базовым запуском."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_REGRESSION_THRESHOLD,
+        help="Допустимое относительное замедление (по умолчанию 0.1)."
+    )
+    args = parser.parse_args()
+
+    if args.files < 0 or args.depth < 0:
+        parser.error("--files и --depth не могут быть отрицательными")
+    if args.fanout < 1:
+        parser.error("--fanout должен быть положительным числом")
+    if args.repeat < 1:
+        parser.error("--repeat должен быть положительным числом")
+    for name in ("collision_rate", "renamed_ratio"):
+        if not 0 <= getattr(args, name) <= 1:
+            parser.error(f"--{name.replace('_', '-')} должен быть от 0 до 1")
+
+    baseline = None
+    if args.compare:
+        try:
+            baseline = load_results(args.compare)
+        except (OSError, ValueError) as e:
+            console.print(f"Ошибка чтения результатов: {e}", style="red")
+            sys.exit(1)
+
+    spec = TreeSpec(
+        depth=args.depth,
+        fanout=args.fanout,
+        files=args.files,
+        collision_rate=args.collision_rate,
+        renamed_ratio=args.renamed_ratio,
+        seed=args.seed,
+    )
+    with console.status("Выполняются замеры..."):
+        results = run_benchmark(spec, args.repeat, args.backend, args.tmp_dir)
+
+    _print_results(results)
+    if args.output:
+        save_results(args.output, results)
+        console.print(f"Результаты записаны в {args.output}", style="green")
+
+    if baseline is None:
+        return
+
+    if (
+        baseline.get("spec") != results["spec"]
+        or baseline.get("backend") != results["backend"]
+    ):
+        console.print(
+            "Параметры дерева отличаются от базового запуска, сравнение "
+            "может быть некорректным.",
+            style="yellow"
+        )
+
+    comparisons = compare_results(baseline, results, args.threshold)
+    table = Table(title="Сравнение с базовым запуском", show_lines=True)
+    table.add_column("Замер", style="bold cyan")
+    table.add_column("Было")
+    table.add_column("Стало")
+    table.add_column("Изменение", style="bold white")
+    for item in comparisons:
+        style = "red" if item.regression else "green"
+        table.add_row(
+            item.name,
+            f"{item.baseline:.4g}",
+            f"{item.current:.4g}",
+            f"[{style}]{(item.ratio - 1) * 100:+.1f} %[/{style}]",
+        )
+    console.print(table)
+
+    if any(item.regression for item in comparisons):
+        console.print("Обнаружена регрессия производительности.", style="red")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
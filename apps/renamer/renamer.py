@@ -8,8 +8,31 @@ import sys
 
 from rich.console import Console
 
-from .src.core import rename_files
+try:
+    from apps.shared import profiling
+except ImportError:  # Автономный запуск из директории `apps`
+    from shared import profiling
 
+from .src.core import (
+    apply_dedupe_plan,
+    dedupe_files,
+    rename_files,
+    rename_many,
+    resume_renames,
+    undo_renames,
+    watch_files,
+)
+from .src.dedupe import DEDUPE_ACTIONS, find_latest_dedupe_plan
+from .src.gitindex import DEFAULT_SCAN_BACKEND, SCAN_BACKENDS
+from .src.journal import find_latest_journal
+from .src.metadata import TIMESTAMP_SOURCES
+from .src.watch import (
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_SETTLE_SECONDS,
+    WATCH_BACKENDS,
+)
+
+LATEST_JOURNAL: str = "last"
 console = Console()
 
 
@@ -18,15 +41,42 @@ def main():
     Точка входа CLI-приложения.
 
     Обрабатывает аргументы командной строки и запускает процесс переименования:
-      - Проверяет существование указанной директории.
-      - Выполняет переименование с учётом флага `--dry-run`.
+      - Проверяет существование указанных директорий.
+      - Несколько директорий обрабатываются одновременно (`rename_many()`).
+      - Выполняет переименование с учётом флагов `--dry-run`, `--fast`
+        и `--log`.
+      - Выполняет или отменяет план из журнала (`--resume`, `--undo`).
 
     Пример использования:
         python -m apps.renamer.renamer ./images --dry-run
+        python -m apps.renamer.renamer /mnt/hdd/photos /mnt/ssd/walls
 
     Аргументы CLI:
-        DIRECTORY — путь к директории с изображениями.
+        DIRECTORY... — пути к директориям с изображениями.
         --dry-run — симуляция без переименования.
+        --fast — быстрый режим без задержек и построчного вывода.
+        --log FILE — запись полного списка переименований в файл.
+        --full — полное сканирование без использования манифеста.
+        --stream — потоковый режим с постоянным расходом памяти.
+        --timestamp-source {mtime,exif} — источник временной метки.
+        --backend {auto,fs,git} — способ перечисления файлов (по умолчанию
+            fs).
+        --per-device N — число одновременно обрабатываемых директорий
+            на одном устройстве.
+        --dedupe [ACTION] — поиск дубликатов (report, delete, hardlink).
+        --watch [BACKEND] — наблюдение за новыми файлами (auto, inotify,
+            poll).
+        --settle SECONDS — время готовности нового файла.
+        --poll-interval SECONDS — интервал опроса директорий.
+        --journal FILE — путь к журналу для нового запуска.
+        --resume [FILE] — выполнение плана из журнала (по умолчанию —
+            последнего).
+        --undo [FILE] — отмена переименований из журнала (по умолчанию —
+            последнего).
+        --apply-dedupe [FILE] — выполнение плана обработки дубликатов
+            (по умолчанию — последнего).
+        --profile [FILE] — замер этапов с записью трассы в JSON
+            (также `REPO_TOOLS_PROFILE`).
     """
     parser = argparse.ArgumentParser(
         description=(
@@ -34,26 +84,292 @@ def main():
         )
     )
     parser.add_argument(
-        "directory",
+        "directories",
         metavar="DIRECTORY",
         type=str,
-        help="Путь к директории, которую нужно обработать."
+        nargs="*",
+        help=(
+            "Путь к директории, которую нужно обработать. Можно указать "
+            "несколько директорий: они обрабатываются одновременно."
+        )
     )
     parser.add_argument(
         "--dry-run",
         action="store_true",
         help="Показывает, что будет сделано, без фактического переименования."
     )
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help=(
+            "Быстрый режим: без задержек и построчного вывода, "
+            "только общий прогресс."
+        )
+    )
+    parser.add_argument(
+        "--log",
+        metavar="FILE",
+        type=str,
+        default=None,
+        help="Записывает полный список переименований в указанный файл."
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help=(
+            "Полное сканирование: не пропускать директории, не изменившиеся "
+            "с прошлого запуска."
+        )
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help=(
+            "Потоковый режим: сканирование, планирование и переименование "
+            "выполняются одновременно, без сбора полного списка файлов."
+        )
+    )
+    parser.add_argument(
+        "--journal",
+        metavar="FILE",
+        type=str,
+        default=None,
+        help=(
+            "Путь к журналу нового запуска. По умолчанию журнал создаётся "
+            "в кэше Repo-Tools."
+        )
+    )
+    parser.add_argument(
+        "--timestamp-source",
+        choices=TIMESTAMP_SOURCES,
+        default="mtime",
+        help=(
+            "Источник временной метки: mtime (по умолчанию) — время "
+            "модификации, exif — дата съёмки из EXIF (если её нет, "
+            "используется время модификации)."
+        )
+    )
+    parser.add_argument(
+        "--backend",
+        choices=SCAN_BACKENDS,
+        default=DEFAULT_SCAN_BACKEND,
+        help=(
+            "Способ перечисления файлов: fs (по умолчанию) — обход "
+            "файловой системы с манифестом; git — индекс Git (файлы, "
+            "исключённые через .gitignore, не переименовываются, манифест "
+            "не используется); auto — индекс Git внутри рабочей копии, "
+            "иначе обход файловой системы."
+        )
+    )
+    parser.add_argument(
+        "--per-device",
+        metavar="N",
+        type=int,
+        default=None,
+        help=(
+            "Сколько директорий одного устройства обрабатывать одновременно "
+            "при нескольких DIRECTORY. По умолчанию: 1 для жёстких дисков, "
+            "4 для остальных устройств."
+        )
+    )
+    parser.add_argument(
+        "--dedupe",
+        metavar="ACTION",
+        nargs="?",
+        const="report",
+        default=None,
+        choices=DEDUPE_ACTIONS,
+        help=(
+            "Поиск побайтово одинаковых изображений вместо переименования "
+            "(во всех DIRECTORY вместе). ACTION: report (по умолчанию) — "
+            "только отчёт, delete — удалить копии, hardlink — заменить "
+            "копии жёсткими ссылками. С --dry-run план только "
+            "записывается (см. --apply-dedupe)."
+        )
+    )
+    parser.add_argument(
+        "--watch",
+        metavar="BACKEND",
+        nargs="?",
+        const="auto",
+        default=None,
+        choices=WATCH_BACKENDS,
+        help=(
+            "Режим наблюдения: переименовывает новые изображения по мере "
+            "появления, до нажатия Ctrl+C. BACKEND: auto (по умолчанию) — "
+            "inotify, если доступен, иначе опрос; inotify; poll."
+        )
+    )
+    parser.add_argument(
+        "--settle",
+        metavar="SECONDS",
+        type=float,
+        default=DEFAULT_SETTLE_SECONDS,
+        help=(
+            "Сколько секунд новый файл должен оставаться неизменным перед "
+            f"переименованием (по умолчанию {DEFAULT_SETTLE_SECONDS:g})."
+        )
+    )
+    parser.add_argument(
+        "--poll-interval",
+        metavar="SECONDS",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help=(
+            "Интервал опроса директорий в режиме poll "
+            f"(по умолчанию {DEFAULT_POLL_INTERVAL:g})."
+        )
+    )
+    journal_actions = parser.add_mutually_exclusive_group()
+    journal_actions.add_argument(
+        "--resume",
+        metavar="FILE",
+        nargs="?",
+        const=LATEST_JOURNAL,
+        default=None,
+        help=(
+            "Выполняет план из журнала без повторного сканирования "
+            "(или продолжает прерванный запуск). Без аргумента используется "
+            "последний журнал."
+        )
+    )
+    journal_actions.add_argument(
+        "--undo",
+        metavar="FILE",
+        nargs="?",
+        const=LATEST_JOURNAL,
+        default=None,
+        help=(
+            "Отменяет переименования из журнала. Без аргумента используется "
+            "последний журнал."
+        )
+    )
+    journal_actions.add_argument(
+        "--apply-dedupe",
+        metavar="FILE",
+        nargs="?",
+        const=LATEST_JOURNAL,
+        default=None,
+        help=(
+            "Выполняет план обработки дубликатов (например, после "
+            "--dedupe delete --dry-run). Файлы, изменившиеся после "
+            "поиска, не затрагиваются. Без аргумента используется "
+            "последний план."
+        )
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        nargs="?",
+        const="",
+        default=None,
+        help=(
+            "Замеряет этапы и вызовы Git, записывает трассу в JSON "
+            "(по умолчанию — в кэш Repo-Tools) и выводит сводку при "
+            "завершении. То же включает переменная "
+            f"{profiling.PROFILE_ENV_VAR}."
+        )
+    )
     args = parser.parse_args()
+    profiling.setup(args.profile)
+
+    if args.apply_dedupe:
+        plan_path = (
+            find_latest_dedupe_plan()
+            if args.apply_dedupe == LATEST_JOURNAL
+            else args.apply_dedupe
+        )
+        if plan_path is None or not os.path.isfile(plan_path):
+            console.print(
+                "[bold red]Ошибка:[/bold red]",
+                "План обработки дубликатов не найден."
+            )
+            sys.exit(1)
+        apply_dedupe_plan(plan_path)
+        return
 
-    if not os.path.isdir(args.directory):
-        console.print(
-            "[bold red]Ошибка:[/bold red]",
-            f"Директория '{args.directory}' не найдена."
+    journal_arg = args.resume or args.undo
+    if journal_arg:
+        journal_path = (
+            # Отменять имеет смысл только выполненный запуск, а не план
+            # сухого запуска
+            find_latest_journal(applied_only=bool(args.undo))
+            if journal_arg == LATEST_JOURNAL
+            else journal_arg
         )
-        sys.exit(1)
+        if journal_path is None or not os.path.isfile(journal_path):
+            console.print(
+                "[bold red]Ошибка:[/bold red]",
+                "Журнал переименований не найден."
+            )
+            sys.exit(1)
+
+        if args.resume:
+            resume_renames(journal_path, fast=args.fast, log_path=args.log)
+        else:
+            undo_renames(journal_path, fast=args.fast)
+        return
+
+    if not args.directories:
+        parser.error("необходимо указать DIRECTORY")
+    if args.journal and len(args.directories) > 1:
+        parser.error("--journal можно указать только для одной директории")
+    if args.per_device is not None and args.per_device < 1:
+        parser.error("--per-device должен быть положительным числом")
+
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            console.print(
+                "[bold red]Ошибка:[/bold red]",
+                f"Директория '{directory}' не найдена."
+            )
+            sys.exit(1)
 
-    rename_files(args.directory, args.dry_run)
+    if args.watch:
+        if len(args.directories) > 1:
+            parser.error("--watch можно указать только для одной директории")
+        if args.settle < 0 or args.poll_interval <= 0:
+            parser.error("--settle и --poll-interval должны быть положительны")
+        watch_files(
+            args.directories[0],
+            backend=args.watch,
+            settle=args.settle,
+            interval=args.poll_interval,
+            log_path=args.log,
+        )
+        return
+
+    if args.dedupe:
+        # Дубликаты ищутся во всех директориях вместе
+        dedupe_files(
+            args.directories, action=args.dedupe, dry_run=args.dry_run
+        )
+        return
+
+    if len(args.directories) > 1:
+        rename_many(
+            args.directories,
+            per_device=args.per_device,
+            dry_run=args.dry_run,
+            log_path=args.log,
+            full=args.full,
+            stream=args.stream,
+            timestamp_source=args.timestamp_source,
+            backend=args.backend,
+        )
+        return
+
+    rename_files(
+        args.directories[0],
+        dry_run=args.dry_run,
+        fast=args.fast,
+        log_path=args.log,
+        journal_path=args.journal,
+        full=args.full,
+        stream=args.stream,
+        timestamp_source=args.timestamp_source,
+        backend=args.backend,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,364 @@
+"""
+Замеры производительности Renamer на синтетических деревьях.
+
+Дерево изображений генерируется во временной директории по параметрам
+`TreeSpec`: глубина, ветвление, число файлов, доля совпадающих mtime и
+доля уже переименованных файлов. Файлы пустые, значение имеют только
+имена и время модификации, поэтому замеры не требуют сети и реальных
+изображений.
+
+Этапы сканирования, планирования и переименования замеряются отдельно,
+а функции `is_image()`, `is_already_renamed()` и
+`generate_new_filename()` — микробенчмарками. Результаты сохраняются в
+JSON и сравниваются между запусками для поиска регрессий.
+"""
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, NamedTuple
+
+from .gitindex import iter_git_directories, run_git
+from .journal import apply_journal, write_plan
+from .planner import plan_renames
+from .scanner import scan_directories
+from .utils import (
+    SUPPORTED_IMAGE_EXTENSIONS,
+    generate_new_filename,
+    is_already_renamed,
+    is_image,
+)
+
+BENCH_VERSION: int = 1
+BENCH_BACKENDS: tuple[str, ...] = ("fs", "git")
+BASE_TIMESTAMP: int = 1_600_000_000
+DEFAULT_REGRESSION_THRESHOLD: float = 0.10  # 10 %
+MICRO_ITERATIONS: int = 100_000
+# Доля файлов с расширением, которое Renamer не обрабатывает
+OTHER_FILES_RATIO: float = 0.05
+OTHER_EXTENSIONS: tuple[str, ...] = (".txt", ".json", ".mp4")
+
+
+class TreeSpec(NamedTuple):
+    """Параметры синтетического дерева."""
+    depth: int = 3
+    fanout: int = 4
+    files: int = 10_000
+    collision_rate: float = 0.1
+    renamed_ratio: float = 0.2
+    seed: int = 0
+
+
+class Comparison(NamedTuple):
+    """Сравнение одного замера с базовым запуском."""
+    name: str
+    baseline: float
+    current: float
+    ratio: float
+    regression: bool
+
+
+def _tree_directories(root: str, depth: int, fanout: int) -> list[str]:
+    """Возвращает пути всех директорий дерева, включая корень."""
+    directories = [root]
+    level = [root]
+    for _ in range(depth):
+        level = [
+            os.path.join(parent, f"dir{index:03d}")
+            for parent in level
+            for index in range(fanout)
+        ]
+        directories.extend(level)
+    return directories
+
+
+def generate_tree(root: str | Path, spec: TreeSpec) -> list[str]:
+    """
+    Создаёт синтетическое дерево изображений.
+
+    Файлы распределяются по всем директориям дерева поровну. Доля
+    `collision_rate` файлов получает mtime предыдущего файла той же
+    директории (коллизии временных меток), доля `renamed_ratio` — имя
+    в формате `<timestamp>.<ext>`.
+
+    Args:
+        root (str | Path): Пустая директория для дерева.
+        spec (TreeSpec): Параметры дерева.
+
+    Returns:
+        list[str]: Имена созданных файлов (для микробенчмарков).
+    """
+    rng = random.Random(spec.seed)
+    extensions = sorted(SUPPORTED_IMAGE_EXTENSIONS)
+    directories = _tree_directories(os.fspath(root), spec.depth, spec.fanout)
+    names: list[str] = []
+    # Уже переименованные файлы получают метки, не пересекающиеся с mtime
+    renamed_timestamp = BASE_TIMESTAMP + spec.files * 2
+
+    for index, directory in enumerate(directories):
+        os.makedirs(directory, exist_ok=True)
+        count = spec.files // len(directories)
+        if index < spec.files % len(directories):
+            count += 1
+
+        mtime = BASE_TIMESTAMP + rng.randrange(spec.files)
+        for number in range(count):
+            if number and rng.random() >= spec.collision_rate:
+                mtime = BASE_TIMESTAMP + rng.randrange(spec.files)
+
+            roll = rng.random()
+            if roll < OTHER_FILES_RATIO:
+                name = f"note_{number}{rng.choice(OTHER_EXTENSIONS)}"
+            elif roll < OTHER_FILES_RATIO + spec.renamed_ratio:
+                renamed_timestamp += 1
+                name = f"{renamed_timestamp}{rng.choice(extensions)}"
+            else:
+                name = f"IMG_{number:05d}{rng.choice(extensions)}"
+
+            path = os.path.join(directory, name)
+            with open(path, "wb"):
+                pass
+            os.utime(path, (mtime, mtime))
+            names.append(name)
+
+    return names
+
+
+def _index_tree(root: str) -> None:
+    """Добавляет дерево в индекс нового репозитория Git."""
+    for args in (["init", "-q"], ["add", "-A"]):
+        if not run_git(args, repo_root_path=Path(root), silent=True):
+            raise RuntimeError(f"git {' '.join(args)} завершился ошибкой")
+
+
+def _micro(function: Callable, arguments: list[tuple]) -> float:
+    """Замеряет среднее время вызова функции в наносекундах."""
+    count = len(arguments)
+    calls = [arguments[index % count] for index in range(MICRO_ITERATIONS)]
+    started = perf_counter()
+    for args in calls:
+        function(*args)
+    return (perf_counter() - started) / MICRO_ITERATIONS * 1e9
+
+
+def run_micro(names: list[str]) -> dict[str, float]:
+    """
+    Замеряет функции проверки и формирования имён.
+
+    Args:
+        names (list[str]): Имена файлов для замера.
+
+    Returns:
+        dict[str, float]: Среднее время вызова в наносекундах по
+            названиям функций.
+    """
+    return {
+        "is_image": _micro(is_image, [(name,) for name in names]),
+        "is_already_renamed": _micro(
+            is_already_renamed, [(name,) for name in names]
+        ),
+        "generate_new_filename": _micro(
+            generate_new_filename,
+            [(name, BASE_TIMESTAMP) for name in names],
+        ),
+    }
+
+
+def run_phases(
+    spec: TreeSpec,
+    backend: str = "fs",
+    tmp_dir: str | Path | None = None,
+) -> tuple[dict[str, float], dict[str, int], list[str]]:
+    """
+    Генерирует дерево и замеряет этапы переименования.
+
+    Журнал пишется во временную директорию, манифест не используется,
+    поэтому кэш Repo-Tools не затрагивается.
+
+    Args:
+        spec (TreeSpec): Параметры дерева.
+        backend (str): Способ перечисления файлов: `fs` или `git`.
+        tmp_dir (str | Path | None): Где создавать временную директорию
+            (например, на проверяемом диске). По умолчанию — системная.
+
+    Returns:
+        tuple[dict[str, float], dict[str, int], list[str]]: Время этапов
+            в секундах, счётчики файлов и имена созданных файлов.
+    """
+    with tempfile.TemporaryDirectory(
+        prefix="renamer-bench-", dir=tmp_dir
+    ) as tmp:
+        root = os.path.join(tmp, "tree")
+        timings: dict[str, float] = {}
+
+        started = perf_counter()
+        names = generate_tree(root, spec)
+        if backend == "git":
+            _index_tree(root)
+        timings["generate"] = perf_counter() - started
+
+        started = perf_counter()
+        if backend == "git":
+            scans = sorted(
+                iter_git_directories(root) or [],
+                key=lambda scan: scan.root,
+            )
+        else:
+            scans = scan_directories(root)
+        timings["scan"] = perf_counter() - started
+
+        started = perf_counter()
+        operations, skipped = plan_renames(scans)
+        timings["plan"] = perf_counter() - started
+
+        started = perf_counter()
+        journal_path = os.path.join(tmp, "journal.jsonl")
+        write_plan(journal_path, root, operations)
+        with closing(apply_journal(journal_path)) as results:
+            errors = sum(error is not None for _, error in results)
+        timings["rename"] = perf_counter() - started
+
+    counts = {
+        "files": len(names),
+        "directories": len(scans),
+        "images": sum(len(scan.images) for scan in scans),
+        "renamed": len(operations) - errors,
+        "skipped": skipped,
+        "errors": errors,
+    }
+    return timings, counts, names
+
+
+def _summarize(values: list[float]) -> dict:
+    """Сводит повторные замеры: лучший, медиана и все значения."""
+    return {
+        "best": min(values),
+        "median": statistics.median(values),
+        "runs": values,
+    }
+
+
+def run_benchmark(
+    spec: TreeSpec,
+    repeat: int = 3,
+    backend: str = "fs",
+    tmp_dir: str | Path | None = None,
+) -> dict:
+    """
+    Выполняет полный набор замеров.
+
+    Переименование изменяет дерево, поэтому для каждого повтора оно
+    генерируется заново.
+
+    Args:
+        spec (TreeSpec): Параметры дерева.
+        repeat (int): Количество повторов.
+        backend (str): Способ перечисления файлов: `fs` или `git`.
+        tmp_dir (str | Path | None): Где создавать временные директории.
+
+    Returns:
+        dict: Результаты в формате, пригодном для записи в JSON.
+    """
+    phases: dict[str, list[float]] = {}
+    micro: dict[str, list[float]] = {}
+    counts: dict[str, int] = {}
+
+    for _ in range(repeat):
+        timings, counts, names = run_phases(spec, backend, tmp_dir)
+        for name, value in timings.items():
+            phases.setdefault(name, []).append(value)
+        for name, value in run_micro(names).items():
+            micro.setdefault(name, []).append(value)
+
+    return {
+        "version": BENCH_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": backend,
+        "repeat": repeat,
+        "spec": spec._asdict(),
+        "counts": counts,
+        "phases": {
+            name: _summarize(values) for name, values in phases.items()
+        },
+        "micro_ns": {
+            name: _summarize(values) for name, values in micro.items()
+        },
+    }
+
+
+def save_results(path: str | Path, results: dict) -> None:
+    """
+    Сохраняет результаты замеров в JSON.
+
+    Args:
+        path (str | Path): Путь к файлу результатов.
+        results (dict): Результаты `run_benchmark()`.
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+        file.write("\n")
+
+
+def load_results(path: str | Path) -> dict:
+    """
+    Загружает результаты замеров из JSON.
+
+    Args:
+        path (str | Path): Путь к файлу результатов.
+
+    Returns:
+        dict: Результаты `run_benchmark()`.
+
+    Raises:
+        ValueError: Если файл не является результатами замеров Renamer.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        results = json.load(file)
+    if not isinstance(results, dict) or "phases" not in results:
+        raise ValueError(f"'{path}' не содержит результатов замеров.")
+    return results
+
+
+def compare_results(
+    baseline: dict,
+    current: dict,
+    threshold: float = DEFAULT_REGRESSION_THRESHOLD,
+) -> list[Comparison]:
+    """
+    Сравнивает результаты с базовым запуском.
+
+    Сравниваются лучшие значения: они меньше всего зависят от фоновой
+    нагрузки. Этап генерации дерева не учитывается.
+
+    Args:
+        baseline (dict): Результаты базового запуска.
+        current (dict): Результаты текущего запуска.
+        threshold (float): Допустимое относительное замедление.
+
+    Returns:
+        list[Comparison]: Сравнения по замерам, присутствующим в обоих
+            запусках.
+    """
+    comparisons: list[Comparison] = []
+    for section in ("phases", "micro_ns"):
+        for name, values in current.get(section, {}).items():
+            base = baseline.get(section, {}).get(name)
+            if base is None or name == "generate":
+                continue
+            ratio = values["best"] / base["best"] if base["best"] else 1.0
+            comparisons.append(Comparison(
+                f"{section}.{name}",
+                base["best"],
+                values["best"],
+                ratio,
+                ratio > 1 + threshold,
+            ))
+    return comparisons
@@ -1,117 +1,1211 @@
 import os
-import shutil
-from time import sleep
+import sqlite3
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    wait,
+)
+from contextlib import closing, nullcontext
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter, sleep
+from typing import Callable, Iterable, Iterator, NamedTuple
 
 from rich.console import Console
-from rich.progress import Progress
+from rich.progress import MofNCompleteColumn, Progress
 from rich.table import Table
 
-from .utils import (
-    generate_new_filename,
-    is_already_renamed,
-    is_image,
+try:
+    from apps.shared import profiling
+    from apps.shared.formatting import format_size
+except ImportError:  # Автономный запуск из директории `apps`
+    from shared import profiling
+    from shared.formatting import format_size
+
+from .dedupe import (
+    DedupeOp,
+    HashCache,
+    apply_dedupe,
+    find_duplicates,
+    new_dedupe_plan_path,
+    plan_dedupe,
+    read_dedupe_plan,
+    write_dedupe_plan,
+)
+from .devices import device_limit, group_by_device
+from .gitindex import (
+    DEFAULT_SCAN_BACKEND,
+    iter_git_directories,
+    resolve_backend,
+)
+from .ignore import IgnoreMatcher, load_ignore
+from .journal import (
+    apply_journal,
+    new_journal_path,
+    read_journal,
+    stream_journal,
+    undo_journal,
+    write_plan,
 )
+from .manifest import Manifest, get_directory_stamp
+from .metadata import resolve_timestamps
+from .planner import RenameOp, iter_plans, plan_renames
+from .scanner import (
+    DirectoryScan,
+    ImageRecord,
+    iter_directories,
+    scan_images,
+)
+from .watch import DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE_SECONDS, open_watcher
 
 SLEEP_TIME: int | float = 0.01  # Задержка на 10 мс
+FAST_REFRESH_PER_SECOND: int | float = 2  # Частота отрисовки в быстром режиме
+FAST_PROGRESS_STEP: int = 500  # Шаг обновления прогресса в быстром режиме
+DEDUPE_REPORT_LIMIT: int = 20  # Сколько групп дубликатов показывать в отчёте
 console = Console()
 
 
-def rename_files(directory: str, dry_run: bool = False) -> None:
+class RenameStats(NamedTuple):
+    """Итоги запуска Renamer для одной директории."""
+    directory: str
+    renamed: int
+    skipped: int
+    cached: int
+    errors: int
+    total_files: int
+    elapsed: float
+    journal_path: str | None = None
+
+
+def _process_operations(
+    results: Iterable[tuple[RenameOp, Exception | None]],
+    total: int | Callable[[], int],
+    fast: bool = False,
+    log_path: str | Path | None = None,
+    delay: bool = True,
+) -> tuple[int, int]:
+    """
+    Отображает ход выполнения операций переименования.
+
+    Args:
+        results (Iterable[tuple[RenameOp, Exception | None]]): Операции и
+            ошибки их выполнения (None — операция выполнена успешно).
+        total (int | Callable[[], int]): Общее количество операций для
+            индикатора прогресса. В потоковом режиме передаётся функция,
+            возвращающая текущую (растущую) оценку.
+        fast (bool): Если True — без задержек и построчного вывода.
+        log_path (str | Path | None): Файл для записи полного
+            соответствия `старое имя → новое имя`.
+        delay (bool): Если True — в обычном режиме между операциями
+            выдерживается пауза `SLEEP_TIME`.
+
+    Returns:
+        tuple[int, int]: Количество успешных операций и ошибок.
+    """
+    done_count: int = 0
+    errors: int = 0
+
+    progress = Progress(
+        *Progress.get_default_columns(),
+        MofNCompleteColumn(),
+        console=console,
+        refresh_per_second=FAST_REFRESH_PER_SECOND if fast else 10,
+    )
+    log_file = (
+        open(log_path, "w", encoding="utf-8") if log_path else nullcontext()
+    )
+
+    get_total = total if callable(total) else None
+
+    with progress, log_file:
+        task = progress.add_task(
+            "Обработка файлов...", total=None if get_total else total
+        )
+
+        for index, (op, error) in enumerate(results, 1):
+            if fast and index % FAST_PROGRESS_STEP == 0:
+                progress.update(
+                    task,
+                    completed=index,
+                    total=get_total() if get_total else total,
+                )
+            elif not fast:
+                if get_total:
+                    progress.update(task, total=get_total())
+                progress.advance(task)
+
+            full_path = os.path.join(op.root, op.filename)
+            new_full_path = os.path.join(op.root, op.new_filename)
+
+            if error is not None:
+                errors += 1
+                progress.console.print(
+                    f"Ошибка при обработке {full_path}: {error}", style="red"
+                )
+                continue
+
+            done_count += 1
+            if log_path:
+                log_file.write(f"{full_path}\t{new_full_path}\n")
+            if not fast:
+                progress.console.print(
+                    f"[cyan]{op.filename}[/cyan] → "
+                    f"[green]{op.new_filename}[/green]"
+                )
+                if delay:
+                    sleep(SLEEP_TIME)
+
+        final_total = get_total() if get_total else total
+        progress.update(task, total=final_total, completed=final_total)
+
+    return done_count, errors
+
+
+def _print_summary(
+    title: str,
+    rows: list[tuple[str, str]],
+    total_files: int,
+    elapsed: float,
+    journal_path: Path | None = None,
+) -> None:
+    """
+    Выводит итоговую таблицу со скоростью обработки.
+
+    Args:
+        title (str): Заголовок таблицы.
+        rows (list[tuple[str, str]]): Строки `показатель — значение`.
+        total_files (int): Количество обработанных файлов для расчёта
+            скорости.
+        elapsed (float): Время обработки в секундах.
+        journal_path (Path | None): Путь к журналу, если он использовался.
+    """
+    rate = total_files / elapsed if elapsed > 0 else float(total_files)
+
+    table = Table(title=title, show_lines=True)
+    table.add_column("Показатель", style="bold cyan")
+    table.add_column("Значение", style="bold white")
+
+    for name, value in rows:
+        table.add_row(name, value)
+    table.add_row("Время обработки", f"{elapsed:.2f} с")
+    table.add_row("Скорость (файлов/с)", f"{rate:.0f}")
+    if journal_path:
+        table.add_row("Журнал", str(journal_path))
+    with profiling.phase("renamer.render"):
+        console.print()
+        console.print(table)
+
+
+def _open_manifest(
+    root: str,
+    full: bool,
+    ignore: IgnoreMatcher,
+) -> Manifest | None:
+    """
+    Открывает манифест директорий для инкрементального запуска.
+
+    Args:
+        root (str): Абсолютный путь к корневой директории.
+        full (bool): Если True — сохранённые записи не используются.
+        ignore (IgnoreMatcher): Правила исключения обхода.
+
+    Returns:
+        Manifest | None: Манифест или None, если его не удалось открыть
+            (в этом случае выполняется полное сканирование).
+    """
+    try:
+        return Manifest(
+            root, refresh=full, ignore_patterns=ignore.patterns
+        )
+    except (OSError, sqlite3.Error) as e:
+        console.print(
+            f"Не удалось открыть манифест, полное сканирование: {e}",
+            style="yellow"
+        )
+        return None
+
+
+def _update_manifest(
+    manifest: Manifest,
+    scans: Iterable[DirectoryScan],
+    planned_roots: set[str],
+    failed_roots: set[str] | None = None,
+) -> None:
+    """
+    Запоминает в манифесте директории, не требующие обработки.
+
+    Директория записывается, если в ней не было запланированных
+    переименований или все они выполнены успешно. Отпечаток директорий
+    с переименованиями снимается заново, так как переименование меняет
+    их mtime.
+
+    Args:
+        manifest (Manifest): Манифест директорий.
+        scans (Iterable[DirectoryScan]): Результаты сканирования.
+        planned_roots (set[str]): Директории с запланированными
+            переименованиями.
+        failed_roots (set[str] | None): Директории с ошибками. None
+            означает, что план не выполнялся (сухой запуск).
+    """
+    for scan in scans:
+        if scan.cached or scan.stamp is None:
+            continue
+
+        stamp = scan.stamp
+        if scan.root in planned_roots:
+            if failed_roots is None or scan.root in failed_roots:
+                continue
+            try:
+                stamp = get_directory_stamp(scan.root)
+            except OSError:
+                continue
+
+        manifest.record(scan.root, stamp, scan.subdirs)
+
+    manifest.save()
+
+
+def _track_failures(
+    results: Iterable[tuple[RenameOp, Exception | None]],
+    failed_roots: set[str],
+) -> Iterator[tuple[RenameOp, Exception | None]]:
+    """Пропускает результаты дальше, запоминая директории с ошибками."""
+    for op, error in results:
+        if error is not None:
+            failed_roots.add(op.root)
+        yield op, error
+
+
+def _rename_streaming(
+    root: str,
+    source: Iterable[DirectoryScan],
+    manifest: Manifest | None,
+    dry_run: bool,
+    fast: bool,
+    log_path: str | Path | None,
+    journal_path: str | Path | None,
+    started: float,
+    timestamp_source: str = "mtime",
+) -> RenameStats:
+    """
+    Выполняет переименование цепочкой потоковых этапов.
+
+    Сканирование (`iter_directories()` или `iter_git_directories()`),
+    отбор и планирование
+    (`iter_plans()`), запись журнала и переименование (`stream_journal()`)
+    связаны генераторами с ограниченной буферизацией, поэтому расход
+    памяти не зависит от числа файлов, а первые переименования начинаются
+    до окончания сканирования. Общее количество файлов растёт по мере
+    сканирования и передаётся индикатору прогресса.
+
+    Args:
+        root (str): Абсолютный путь к корневой директории.
+        source (Iterable[DirectoryScan]): Поток результатов сканирования.
+        manifest (Manifest | None): Манифест директорий.
+        dry_run (bool): Если True — операции только записываются в журнал.
+        fast (bool): Если True — включается быстрый режим.
+        log_path (str | Path | None): Файл для полного списка
+            переименований.
+        journal_path (str | Path | None): Путь к файлу журнала.
+        started (float): Момент начала работы (`perf_counter()`).
+        timestamp_source (str): Источник временной метки.
+
+    Returns:
+        RenameStats: Итоги запуска.
+    """
+    counters = {"images": 0, "skipped": 0, "cached": 0}
+    # Для манифеста хранятся только отпечатки директорий, без списков файлов
+    directories: list[DirectoryScan] = []
+    planned_roots: set[str] = set()
+    failed_roots: set[str] = set()
+
+    def planned_operations() -> Iterator[RenameOp]:
+        scans = resolve_timestamps(source, timestamp_source)
+        for scan, operations, skipped in iter_plans(scans):
+            counters["images"] += len(scan.images)
+            counters["skipped"] += skipped
+            counters["cached"] += scan.cached
+            if manifest is not None:
+                directories.append(scan._replace(images=[], names=set()))
+            if operations:
+                planned_roots.add(scan.root)
+            yield from operations
+
+    journal_path = Path(journal_path) if journal_path else new_journal_path()
+    results = stream_journal(
+        journal_path, root, planned_operations(), dry_run=dry_run
+    )
+    # Этапы конвейера чередуются, поэтому замеряются только целиком
+    with profiling.phase("renamer.pipeline", root=root), closing(results):
+        done_count, errors = _process_operations(
+            _track_failures(results, failed_roots),
+            total=lambda: counters["images"] - counters["skipped"],
+            fast=fast,
+            log_path=log_path,
+            delay=not dry_run,
+        )
+
+    if manifest is not None:
+        with profiling.phase("renamer.manifest"):
+            _update_manifest(
+                manifest,
+                directories,
+                planned_roots,
+                None if dry_run else failed_roots,
+            )
+    if not planned_roots:
+        journal_path.unlink(missing_ok=True)
+        journal_path = None
+
+    stats = RenameStats(
+        root,
+        done_count,
+        counters["skipped"],
+        counters["cached"],
+        errors,
+        counters["images"],
+        perf_counter() - started,
+        str(journal_path) if journal_path else None,
+    )
+    _print_summary(
+        "Результаты сухого запуска" if dry_run
+        else "Результаты переименования",
+        [
+            (
+                "Запланировано переименований" if dry_run
+                else "Переименовано файлов",
+                str(done_count),
+            ),
+            ("Пропущено (уже переименованы)", str(stats.skipped)),
+            ("Директорий без изменений", str(stats.cached)),
+            ("Ошибок", str(stats.errors)),
+        ],
+        stats.total_files,
+        stats.elapsed,
+        journal_path,
+    )
+    return stats
+
+
+def rename_files(
+    directory: str | Path,
+    dry_run: bool = False,
+    fast: bool = False,
+    log_path: str | Path | None = None,
+    journal_path: str | Path | None = None,
+    full: bool = False,
+    stream: bool = False,
+    timestamp_source: str = "mtime",
+    backend: str = DEFAULT_SCAN_BACKEND,
+) -> RenameStats | None:
     """
     Переименовывает изображения в указанной директории по времени их
     модификации.
 
     Алгоритм:
-      1. Рекурсивно проходит по всем поддиректориям.
-      2. Отбирает файлы, поддерживаемые `is_image()`.
-      3. Для каждого файла получает время модификации (Unix time).
-      4. Формирует новое имя с помощью `generate_new_filename()`.
-      5. Избегает коллизий временных меток, увеличивая значение timestamp.
-      6. При `dry_run=True` только отображает, что будет сделано.
-      7. По завершении выводит таблицу с результатами.
+      1. Рекурсивно сканирует поддиректории через `iter_directories()`,
+         отбирая файлы, поддерживаемые `is_image()`. Директории, не
+         изменившиеся с прошлого запуска (по манифесту) или исключённые
+         правилами (`load_ignore()`: `.git`, окружения, кэши и шаблоны
+         из `.renamerignore`), не читаются. С `backend="git"` (или
+         `auto` внутри рабочей копии) список файлов вместо этого берётся
+         из индекса одним вызовом `git ls-files`
+         (`iter_git_directories()`): без манифеста и без изображений,
+         исключённых через `.gitignore`.
+      2. Строит план через `plan_renames()`: новое имя формируется
+         `generate_new_filename()` по времени модификации из данных
+         сканирования (или по дате съёмки из EXIF, если выбран источник
+         `exif`, см. `resolve_timestamps()`), а коллизии временных меток
+         разрешаются по индексу занятых имён в памяти, без обращений к
+         файловой системе.
+      3. Записывает полный план в журнал (`write_plan()`).
+      4. При `dry_run=True` на этом останавливается: план можно изучить
+         и затем выполнить через `resume_renames()`.
+      5. Иначе выполняет план пакетами через `apply_journal()`, фиксируя
+         прогресс в журнале, что позволяет продолжить прерванный запуск
+         и отменить завершённый (`undo_renames()`).
+      6. Запоминает в манифесте директории, не требующие обработки.
+      7. По завершении выводит таблицу с результатами и скоростью
+         обработки (файлов в секунду).
+
+    В быстром режиме (`fast=True`) отключаются задержка `SLEEP_TIME` и
+    построчный вывод переименований: остаётся только общий индикатор
+    прогресса, который перерисовывается не чаще `FAST_REFRESH_PER_SECOND`
+    раз в секунду.
+
+    В потоковом режиме (`stream=True`) этапы выполняются не по очереди,
+    а одновременно, через `_rename_streaming()`: полный список файлов не
+    собирается, и расход памяти не зависит от размера дерева.
 
     Args:
-        directory (str): Путь к директории, в которой выполняется
+        directory (str | Path): Путь к директории, в которой выполняется
             переименование.
         dry_run (bool): Если True — выполняется только симуляция без изменений.
+        fast (bool): Если True — включается быстрый режим без задержек
+            и построчного вывода.
+        log_path (str | Path | None): Путь к файлу, в который записывается
+            полное соответствие `старое имя → новое имя`.
+        journal_path (str | Path | None): Путь к файлу журнала. По умолчанию
+            журнал создаётся в кэше Repo-Tools.
+        full (bool): Если True — манифест не используется и сканируются
+            все директории.
+        stream (bool): Если True — включается потоковый режим.
+        timestamp_source (str): Источник временной метки: `mtime` — время
+            модификации, `exif` — дата съёмки из EXIF (при её отсутствии
+            используется время модификации).
+        backend (str): Способ перечисления файлов: `fs` (по умолчанию)
+            — обход файловой системы, `git` — индекс Git, `auto` — индекс
+            Git, если директория находится внутри рабочей копии.
 
     Returns:
-        None
+        RenameStats | None: Итоги запуска (при сухом запуске в поле
+            `renamed` — количество запланированных переименований) или
+            None, если директория не существует.
     """
     if not os.path.isdir(directory):
         console.print(
             f"Ошибка: директория '{directory}' не существует.", style="red"
         )
-        return
-
-    renamed_count: int = 0
-    skipped_count: int = 0
-    errors: int = 0
+        return None
 
     console.print(
         f"[bold cyan]Сканирование директории:[/bold cyan] {directory}"
     )
     if dry_run:
         console.print("Включен режим 'сухого запуска'.", style="yellow")
+    if fast:
+        console.print("Включен быстрый режим.", style="yellow")
+    if full:
+        console.print("Включено полное сканирование.", style="yellow")
+    if stream:
+        console.print("Включен потоковый режим.", style="yellow")
+    if timestamp_source != "mtime":
+        console.print(
+            f"Источник временной метки: {timestamp_source}.", style="yellow"
+        )
 
-    # Собираем список файлов заранее, чтобы отображать прогресс
-    all_files: list(tuple(str, str)) = []
-    for root, _, files in os.walk(directory):
-        for filename in files:
-            full_path = os.path.join(root, filename)
-            if is_image(full_path):
-                all_files.append((root, filename))
+    started = perf_counter()
+    # Абсолютные пути позволяют выполнить журнал из любой директории
+    root = os.path.abspath(directory)
+    with profiling.phase("renamer.load_ignore"):
+        ignore = load_ignore(root)
+    manifest: Manifest | None = None
+    source = None
+    if resolve_backend(root, backend) == "git":
+        with profiling.phase("renamer.git_index"):
+            source = iter_git_directories(root, ignore=ignore)
+        if source is None:
+            console.print(
+                "Индекс Git недоступен, выполняется обход файловой системы.",
+                style="yellow"
+            )
+        else:
+            console.print(
+                "Включено перечисление файлов по индексу Git.",
+                style="yellow"
+            )
+    if source is None:
+        manifest = _open_manifest(root, full, ignore)
+        source = iter_directories(root, manifest=manifest, ignore=ignore)
 
-    if not all_files:
-        console.print("Нет файлов для обработки.", style="yellow")
-        return
+    try:
+        if stream:
+            return _rename_streaming(
+                root,
+                source,
+                manifest,
+                dry_run,
+                fast,
+                log_path,
+                journal_path,
+                started,
+                timestamp_source,
+            )
+
+        # Планируем все переименования заранее, чтобы отображать прогресс
+        with profiling.phase("renamer.scan", root=root):
+            scans = sorted(
+                resolve_timestamps(source, timestamp_source),
+                key=lambda scan: scan.root,
+            )
+        with profiling.phase("renamer.plan"):
+            operations, skipped_count = plan_renames(scans)
+        total_files = len(operations) + skipped_count
+        cached_count = sum(scan.cached for scan in scans)
+
+        if not operations:
+            if manifest is not None:
+                _update_manifest(manifest, scans, set())
+            if cached_count:
+                console.print(
+                    "Изменений с прошлого запуска не обнаружено "
+                    f"(директорий без изменений: {cached_count}).",
+                    style="green"
+                )
+            elif not total_files:
+                console.print("Нет файлов для обработки.", style="yellow")
+            else:
+                console.print(
+                    f"Все файлы уже переименованы ({skipped_count}).",
+                    style="green"
+                )
+            return RenameStats(
+                root,
+                0,
+                skipped_count,
+                cached_count,
+                0,
+                total_files,
+                perf_counter() - started,
+            )
 
-    progress = Progress()
+        planned_roots = {op.root for op in operations}
+        journal_path = (
+            Path(journal_path) if journal_path else new_journal_path()
+        )
+        with profiling.phase("renamer.write_plan"):
+            write_plan(journal_path, root, operations)
+
+        if dry_run:
+            with profiling.phase("renamer.report"):
+                planned_count, _ = _process_operations(
+                    ((op, None) for op in operations),
+                    total=len(operations),
+                    fast=fast,
+                    log_path=log_path,
+                    delay=False,
+                )
+            if manifest is not None:
+                with profiling.phase("renamer.manifest"):
+                    _update_manifest(manifest, scans, planned_roots)
+            stats = RenameStats(
+                root,
+                planned_count,
+                skipped_count,
+                cached_count,
+                0,
+                total_files,
+                perf_counter() - started,
+                str(journal_path),
+            )
+            _print_summary(
+                "Результаты сухого запуска",
+                [
+                    ("Запланировано переименований", str(planned_count)),
+                    ("Пропущено (уже переименованы)", str(skipped_count)),
+                    ("Директорий без изменений", str(cached_count)),
+                ],
+                total_files,
+                stats.elapsed,
+                journal_path,
+            )
+            return stats
 
-    with progress:
-        for root, filename in progress.track(
-            all_files,
-            description="Обработка файлов...",
+        failed_roots: set[str] = set()
+        with (
+            profiling.phase("renamer.rename", operations=len(operations)),
+            closing(apply_journal(journal_path)) as results,
         ):
-            full_path = os.path.join(root, filename)
+            renamed_count, errors = _process_operations(
+                _track_failures(results, failed_roots),
+                total=len(operations),
+                fast=fast,
+                log_path=log_path,
+            )
+        if manifest is not None:
+            with profiling.phase("renamer.manifest"):
+                _update_manifest(
+                    manifest, scans, planned_roots, failed_roots
+                )
+        stats = RenameStats(
+            root,
+            renamed_count,
+            skipped_count,
+            cached_count,
+            errors,
+            total_files,
+            perf_counter() - started,
+            str(journal_path),
+        )
+        _print_summary(
+            "Результаты переименования",
+            [
+                ("Переименовано файлов", str(renamed_count)),
+                ("Пропущено (уже переименованы)", str(skipped_count)),
+                ("Директорий без изменений", str(cached_count)),
+                ("Ошибок", str(errors)),
+            ],
+            total_files,
+            stats.elapsed,
+            journal_path,
+        )
+        return stats
+    finally:
+        if manifest is not None:
+            manifest.close()
 
-            try:
-                if is_already_renamed(filename):
-                    skipped_count += 1
-                    continue
 
-                timestamp = int(os.path.getmtime(full_path))
-                new_filename = generate_new_filename(filename, timestamp)
-                new_full_path = os.path.join(root, new_filename)
+def _quiet_worker() -> None:
+    """Отключает вывод в консоль в процессах пула `rename_many()`."""
+    console.quiet = True
+
+
+def _numbered_path(path: str | Path, index: int) -> Path:
+    """Добавляет к имени файла номер: `renamer.log` → `renamer-1.log`."""
+    path = Path(path)
+    return path.with_name(f"{path.stem}-{index}{path.suffix}")
+
+
+def _print_many_summary(
+    results: list[RenameStats],
+    dry_run: bool,
+    elapsed: float,
+) -> None:
+    """
+    Выводит общую таблицу по нескольким директориям.
+
+    Args:
+        results (list[RenameStats]): Итоги по директориям.
+        dry_run (bool): Был ли запуск сухим.
+        elapsed (float): Общее время работы в секундах.
+    """
+    table = Table(
+        title="Результаты сухого запуска" if dry_run
+        else "Результаты переименования",
+        show_lines=True,
+    )
+    table.add_column("Директория", style="bold cyan")
+    table.add_column("Запланировано" if dry_run else "Переименовано")
+    table.add_column("Пропущено")
+    table.add_column("Ошибок")
+    table.add_column("Время, с")
+    table.add_column("Файлов/с")
+
+    def add_row(
+        name: str, stats: list[RenameStats], seconds: float
+    ) -> None:
+        total_files = sum(item.total_files for item in stats)
+        rate = total_files / seconds if seconds > 0 else float(total_files)
+        table.add_row(
+            name,
+            str(sum(item.renamed for item in stats)),
+            str(sum(item.skipped for item in stats)),
+            str(sum(item.errors for item in stats)),
+            f"{seconds:.2f}",
+            f"{rate:.0f}",
+        )
+
+    for stats in sorted(results, key=lambda item: item.directory):
+        add_row(stats.directory, [stats], stats.elapsed)
+    add_row("[bold]Итого[/bold]", results, elapsed)
+
+    console.print()
+    console.print(table)
+    for stats in results:
+        if stats.journal_path:
+            console.print(
+                f"Журнал {stats.directory}: {stats.journal_path}",
+                style="dim"
+            )
+
+
+def rename_many(
+    directories: Iterable[str | Path],
+    per_device: int | None = None,
+    dry_run: bool = False,
+    log_path: str | Path | None = None,
+    full: bool = False,
+    stream: bool = False,
+    timestamp_source: str = "mtime",
+    backend: str = DEFAULT_SCAN_BACKEND,
+) -> list[RenameStats]:
+    """
+    Переименовывает изображения в нескольких директориях одновременно.
+
+    Каждая директория обрабатывается `rename_files()` в отдельном процессе
+    пула. Директории группируются по устройствам (`group_by_device()`), и
+    на каждом устройстве одновременно обрабатывается не более
+    `device_limit()` директорий: жёсткий диск получает одну задачу, SSD —
+    несколько. Построчный вывод в процессах отключён; вместо него
+    отображается прогресс по директориям и общая таблица со временем
+    обработки каждой из них.
+
+    Для каждой директории ведётся отдельный журнал, а файл `log_path`
+    получает номер директории (`renamer.log` → `renamer-1.log`).
 
-                # Разрешаем коллизии временных меток
-                while os.path.exists(new_full_path):
-                    timestamp += 1
-                    new_filename = generate_new_filename(filename, timestamp)
-                    new_full_path = os.path.join(root, new_filename)
+    Args:
+        directories (Iterable[str | Path]): Директории для обработки.
+        per_device (int | None): Число одновременных задач на устройство.
+            По умолчанию определяется по типу устройства.
+        dry_run (bool): Если True — выполняется только симуляция.
+        log_path (str | Path | None): Базовый путь к файлам со списком
+            переименований.
+        full (bool): Если True — манифест не используется.
+        stream (bool): Если True — включается потоковый режим.
+        timestamp_source (str): Источник временной метки.
+        backend (str): Способ перечисления файлов.
+
+    Returns:
+        list[RenameStats]: Итоги по успешно обработанным директориям.
+    """
+    roots = list(dict.fromkeys(
+        os.path.abspath(directory) for directory in directories
+    ))
+    for root in roots:
+        if not os.path.isdir(root):
+            console.print(
+                f"Ошибка: директория '{root}' не существует.", style="red"
+            )
+
+    groups = group_by_device(root for root in roots if os.path.isdir(root))
+    if not groups:
+        return []
+
+    numbers = {root: index for index, root in enumerate(roots, 1)}
+    # Очереди в обратном порядке: директории извлекаются с конца
+    queues = {device: paths[::-1] for device, paths in groups.items()}
+    limits = {
+        device: min(device_limit(device, per_device), len(paths))
+        for device, paths in groups.items()
+    }
+    running: dict[int, int] = dict.fromkeys(groups, 0)
+    pending: dict[Future, tuple[int, str]] = {}
+    results: list[RenameStats] = []
+
+    console.print(
+        f"[bold cyan]Директорий:[/bold cyan] {len(numbers)}, "
+        f"[bold cyan]устройств:[/bold cyan] {len(groups)}"
+    )
+    if dry_run:
+        console.print("Включен режим 'сухого запуска'.", style="yellow")
+
+    started = perf_counter()
+    progress = Progress(
+        *Progress.get_default_columns(),
+        MofNCompleteColumn(),
+        console=console,
+    )
+    executor = ProcessPoolExecutor(
+        max_workers=sum(limits.values()), initializer=_quiet_worker
+    )
+    # Дочерние процессы не профилируются: замеряется только общий этап
+    with (
+        profiling.phase("renamer.rename_many", roots=len(numbers)),
+        progress,
+        executor,
+    ):
+        task = progress.add_task(
+            "Обработка директорий...",
+            total=sum(len(paths) for paths in groups.values()),
+        )
+        while True:
+            for device, queue in queues.items():
+                while queue and running[device] < limits[device]:
+                    root = queue.pop()
+                    future = executor.submit(
+                        rename_files,
+                        root,
+                        dry_run=dry_run,
+                        fast=True,
+                        log_path=(
+                            _numbered_path(log_path, numbers[root])
+                            if log_path else None
+                        ),
+                        full=full,
+                        stream=stream,
+                        timestamp_source=timestamp_source,
+                        backend=backend,
+                    )
+                    pending[future] = (device, root)
+                    running[device] += 1
+            if not pending:
+                break
 
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                device, root = pending.pop(future)
+                running[device] -= 1
+                progress.advance(task)
+                try:
+                    stats = future.result()
+                except Exception as e:
+                    progress.console.print(
+                        f"Ошибка при обработке {root}: {e}", style="red"
+                    )
+                    continue
+                if stats is None:
+                    continue
+                results.append(stats)
                 progress.console.print(
-                    f"[cyan]{filename}[/cyan] → [green]{new_filename}[/green]"
+                    f"[green]{root}[/green]: {stats.renamed} из "
+                    f"{stats.total_files} за {stats.elapsed:.2f} с"
                 )
 
-                if not dry_run:
-                    shutil.move(full_path, new_full_path)
-                    renamed_count += 1
-            except Exception as e:
-                errors += 1
+    _print_many_summary(results, dry_run, perf_counter() - started)
+    return results
+
+
+def watch_files(
+    directory: str | Path,
+    backend: str = "auto",
+    settle: float = DEFAULT_SETTLE_SECONDS,
+    interval: float = DEFAULT_POLL_INTERVAL,
+    log_path: str | Path | None = None,
+) -> None:
+    """
+    Наблюдает за директорией и переименовывает новые изображения.
+
+    Работает до нажатия Ctrl+C. Уже существующие файлы не
+    обрабатываются (для них предназначен `rename_files()`): каждый новый
+    файл переименовывается по `generate_new_filename()`, как только его
+    размер и mtime перестают меняться в течение `settle` секунд.
+
+    Все переименования сеанса записываются в один журнал через
+    `stream_journal()` по одной операции, поэтому сеанс можно отменить
+    через `undo_renames()`.
+
+    Args:
+        directory (str | Path): Наблюдаемая директория.
+        backend (str): `inotify`, `poll` или `auto` (`WATCH_BACKENDS`).
+        settle (float): Время готовности файла в секундах.
+        interval (float): Интервал опроса в секундах (для `poll`).
+        log_path (str | Path | None): Путь к файлу, в который дописывается
+            соответствие `старое имя → новое имя`.
+    """
+    if not os.path.isdir(directory):
+        console.print(
+            f"Ошибка: директория '{directory}' не существует.", style="red"
+        )
+        return
+
+    root = os.path.abspath(directory)
+    try:
+        watcher = open_watcher(
+            root, backend, settle, interval, load_ignore(root)
+        )
+    except OSError as e:
+        console.print(f"Не удалось запустить наблюдение: {e}", style="red")
+        return
+
+    console.print(
+        f"[bold cyan]Наблюдение за директорией:[/bold cyan] {root} "
+        f"({watcher.name}). Для выхода нажмите Ctrl+C."
+    )
+
+    started = perf_counter()
+    renamed_count: int = 0
+    errors: int = 0
+    journal_path = new_journal_path()
+    log_file = (
+        open(log_path, "a", encoding="utf-8") if log_path else nullcontext()
+    )
+    results = stream_journal(
+        journal_path, root, watcher.operations(), batch_size=1
+    )
+    with watcher, log_file, closing(results):
+        try:
+            for op, error in results:
+                full_path = os.path.join(op.root, op.filename)
+                new_full_path = os.path.join(op.root, op.new_filename)
+                if error is not None:
+                    errors += 1
+                    console.print(
+                        f"Ошибка при обработке {full_path}: {error}",
+                        style="red"
+                    )
+                    continue
+
+                renamed_count += 1
+                if log_path:
+                    log_file.write(f"{full_path}\t{new_full_path}\n")
+                    log_file.flush()
                 console.print(
-                    f"Ошибка при обработке {full_path}: {e}", style="red"
+                    f"[dim]{datetime.now():%H:%M:%S}[/dim] "
+                    f"[cyan]{os.path.relpath(full_path, root)}[/cyan] → "
+                    f"[green]{op.new_filename}[/green]"
                 )
+        except KeyboardInterrupt:
+            console.print("Наблюдение остановлено.", style="yellow")
 
-            sleep(SLEEP_TIME)
+    if not renamed_count and not errors:
+        journal_path.unlink(missing_ok=True)
+        journal_path = None
 
-    # Выводим сводку
-    table = Table(title="Результаты переименования", show_lines=True)
-    table.add_column("Показатель", style="bold cyan")
-    table.add_column("Значение", style="bold white")
+    _print_summary(
+        "Результаты наблюдения",
+        [
+            ("Переименовано файлов", str(renamed_count)),
+            ("Ошибок", str(errors)),
+        ],
+        renamed_count,
+        perf_counter() - started,
+        journal_path,
+    )
 
-    table.add_row("Переименовано файлов", str(renamed_count))
-    table.add_row("Пропущено (уже переименованы)", str(skipped_count))
-    table.add_row("Ошибок", str(errors))
-    console.print()
+
+def resume_renames(
+    journal_path: str | Path,
+    fast: bool = False,
+    log_path: str | Path | None = None,
+) -> None:
+    """
+    Выполняет план из журнала без повторного сканирования.
+
+    Подходит как для плана, записанного сухим запуском, так и для
+    продолжения запуска, прерванного сбоем: выполнение начинается с
+    последней контрольной точки журнала.
+
+    Args:
+        journal_path (str | Path): Путь к файлу журнала.
+        fast (bool): Если True — включается быстрый режим.
+        log_path (str | Path | None): Путь к файлу для полного списка
+            переименований.
+    """
+    try:
+        state = read_journal(journal_path)
+    except (OSError, ValueError) as e:
+        console.print(f"Ошибка чтения журнала: {e}", style="red")
+        return
+
+    remaining = len(state.operations) - state.applied
+    console.print(
+        f"[bold cyan]Выполнение плана:[/bold cyan] {state.directory}"
+    )
+    if remaining == 0:
+        console.print("План уже выполнен полностью.", style="yellow")
+        return
+
+    started = perf_counter()
+    with closing(apply_journal(journal_path)) as results:
+        renamed_count, errors = _process_operations(
+            results,
+            total=remaining,
+            fast=fast,
+            log_path=log_path,
+        )
+    _print_summary(
+        "Результаты переименования",
+        [
+            ("Переименовано файлов", str(renamed_count)),
+            ("Выполнено ранее", str(state.applied)),
+            ("Ошибок", str(errors)),
+        ],
+        remaining,
+        perf_counter() - started,
+        Path(journal_path),
+    )
+
+
+def undo_renames(journal_path: str | Path, fast: bool = False) -> None:
+    """
+    Отменяет переименования, записанные в журнале.
+
+    Args:
+        journal_path (str | Path): Путь к файлу журнала.
+        fast (bool): Если True — включается быстрый режим.
+    """
+    try:
+        state = read_journal(journal_path)
+    except (OSError, ValueError) as e:
+        console.print(f"Ошибка чтения журнала: {e}", style="red")
+        return
+
+    remaining = state.applied - state.undone
+    console.print(
+        f"[bold cyan]Отмена переименований:[/bold cyan] {state.directory}"
+    )
+    if remaining == 0:
+        console.print("Нет переименований для отмены.", style="yellow")
+        return
+
+    started = perf_counter()
+    with closing(undo_journal(journal_path)) as results:
+        restored_count, errors = _process_operations(
+            results,
+            total=remaining,
+            fast=fast,
+        )
+    _print_summary(
+        "Результаты отмены",
+        [
+            ("Восстановлено имён", str(restored_count)),
+            ("Ошибок", str(errors)),
+        ],
+        remaining,
+        perf_counter() - started,
+        Path(journal_path),
+    )
+
+
+def dedupe_files(
+    directories: str | Path | Iterable[str | Path],
+    action: str = "report",
+    dry_run: bool = False,
+) -> None:
+    """
+    Находит побайтово одинаковые изображения и обрабатывает дубликаты.
+
+    Алгоритм:
+      1. Сканирует все директории через `scan_images()`: дубликаты
+         ищутся по всем директориям вместе, в том числе между ними.
+      2. Находит группы дубликатов через `find_duplicates()`: по размеру,
+         затем по хэшу начала файла, затем по полному хэшу. Хэши
+         кэшируются, поэтому повторные запуски хэшируют только новые
+         файлы.
+      3. Выводит отчёт о найденных группах и занимаемом лишнем месте.
+      4. Для `action` `delete` или `hardlink` записывает план в кэш
+         Repo-Tools и, если это не сухой запуск, выполняет его
+         (`apply_dedupe()` сверяет размер и mtime файлов перед каждым
+         действием). План сухого запуска можно просмотреть и выполнить
+         позже через `apply_dedupe_plan()`.
+
+    Args:
+        directories (str | Path | Iterable[str | Path]): Директория или
+            директории с изображениями.
+        action (str): `report` — только отчёт, `delete` — удалить копии,
+            `hardlink` — заменить копии жёсткими ссылками.
+        dry_run (bool): Если True — план только записывается.
+    """
+    if isinstance(directories, (str, Path)):
+        directories = [directories]
+    roots = list(dict.fromkeys(
+        os.path.abspath(directory) for directory in directories
+    ))
+    for root in roots:
+        if not os.path.isdir(root):
+            console.print(
+                f"Ошибка: директория '{root}' не существует.", style="red"
+            )
+            return
+
+    console.print(
+        "[bold cyan]Поиск дубликатов в директориях:[/bold cyan] "
+        + ", ".join(roots)
+    )
+    started = perf_counter()
+    records: list[ImageRecord] = []
+    for root in roots:
+        with profiling.phase("renamer.scan", root=root):
+            records.extend(scan_images(root, ignore=load_ignore(root)))
+
+    try:
+        with profiling.phase("renamer.hash"), HashCache() as cache:
+            groups = find_duplicates(records, cache)
+    except sqlite3.Error as e:
+        console.print(
+            f"Не удалось открыть кэш хэшей, хэширование без кэша: {e}",
+            style="yellow"
+        )
+        with profiling.phase("renamer.hash"):
+            groups = find_duplicates(records)
+
+    if not groups:
+        console.print(" ✔ Дубликаты не найдены", style="green")
+        return
+
+    wasted = sum(group.size * (len(group.paths) - 1) for group in groups)
+
+    table = Table(title="Найденные дубликаты", show_lines=True)
+    table.add_column("Размер", style="bold cyan")
+    table.add_column("Файлы", style="white")
+    for group in groups[:DEDUPE_REPORT_LIMIT]:
+        table.add_row(format_size(group.size), "\n".join(group.paths))
     console.print(table)
+    if len(groups) > DEDUPE_REPORT_LIMIT:
+        console.print(
+            f"... и ещё {len(groups) - DEDUPE_REPORT_LIMIT} групп",
+            style="dim"
+        )
+
+    rows = [
+        ("Групп дубликатов", str(len(groups))),
+        ("Лишних копий", str(sum(len(group.paths) - 1 for group in groups))),
+        ("Занимают лишнего места", format_size(wasted)),
+    ]
+
+    if action == "report":
+        _print_summary(
+            "Результаты поиска дубликатов",
+            rows,
+            len(records),
+            perf_counter() - started,
+        )
+        return
+
+    operations = plan_dedupe(groups, action)
+    plan_path = new_dedupe_plan_path()
+    write_dedupe_plan(plan_path, roots, operations)
+
+    if dry_run:
+        console.print("Включен режим 'сухого запуска'.", style="yellow")
+        rows.append(("Запланировано действий", str(len(operations))))
+    else:
+        rows.extend(_apply_dedupe_operations(operations))
+
+    rows.append(("План", str(plan_path)))
+    _print_summary(
+        "Результаты обработки дубликатов",
+        rows,
+        len(records),
+        perf_counter() - started,
+    )
+
+
+def _apply_dedupe_operations(
+    operations: list[DedupeOp],
+) -> list[tuple[str, str]]:
+    """
+    Выполняет план обработки дубликатов с выводом ошибок.
+
+    Args:
+        operations (list[DedupeOp]): План обработки.
+
+    Returns:
+        list[tuple[str, str]]: Строки итоговой таблицы.
+    """
+    processed = 0
+    errors = 0
+    for op, error in apply_dedupe(operations):
+        if error is not None:
+            errors += 1
+            console.print(
+                f"Ошибка при обработке {op.path}: {error}", style="red"
+            )
+        else:
+            processed += 1
+    return [("Обработано копий", str(processed)), ("Ошибок", str(errors))]
+
+
+def apply_dedupe_plan(plan_path: str | Path) -> None:
+    """
+    Выполняет сохранённый план обработки дубликатов (например, план
+    сухого запуска после просмотра).
+
+    Повторного поиска не выполняется: действия над файлами, которые
+    изменились после построения плана, пропускаются с ошибкой.
+
+    Args:
+        plan_path (str | Path): Путь к файлу плана.
+    """
+    try:
+        operations = read_dedupe_plan(plan_path)
+    except (OSError, ValueError) as e:
+        console.print(
+            f"Ошибка: не удалось прочитать план: {e}", style="red"
+        )
+        return
+
+    console.print(
+        f"[bold cyan]Выполнение плана:[/bold cyan] {plan_path}"
+    )
+    started = perf_counter()
+    rows = [("Действий в плане", str(len(operations)))]
+    rows.extend(_apply_dedupe_operations(operations))
+    rows.append(("План", str(plan_path)))
+    _print_summary(
+        "Результаты обработки дубликатов",
+        rows,
+        len(operations),
+        perf_counter() - started,
+    )
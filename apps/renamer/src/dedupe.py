@@ -0,0 +1,525 @@
+"""
+Поиск побайтово одинаковых изображений.
+
+Кандидаты отбираются в несколько ступеней, каждая из которых дороже
+предыдущей, но применяется к меньшему числу файлов:
+  1. группировка по размеру (данные уже есть после сканирования);
+  2. хэш первых `PARTIAL_HASH_SIZE` байт (пул потоков);
+  3. полный хэш через `mmap` или чтение блоками (пул процессов).
+
+Хэши кэшируются в SQLite по ключу `(device, inode, mtime_ns, size)`,
+поэтому при повторных запусках хэшируются только новые файлы.
+
+План обработки дубликатов записывается в JSONL-файл (`write_dedupe_plan()`)
+и может быть выполнен позже (`read_dedupe_plan()`). Вместе с каждым
+действием хранятся размер и mtime обоих файлов: если после поиска файл
+изменился, действие не выполняется.
+"""
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+from .scanner import DEFAULT_SCAN_WORKERS, ImageRecord
+from .utils import get_cache_dir
+
+HASH_CACHE_FILE_NAME: str = "renamer-hashes.sqlite3"
+DEDUPE_PLANS_DIR_NAME: str = "dedupe"
+PARTIAL_HASH_SIZE: int = 64 * 1024  # 64 КиБ
+HASH_CHUNK_SIZE: int = 1024 * 1024  # 1 МиБ
+DEFAULT_HASH_WORKERS: int = os.cpu_count() or 1
+DEDUPE_ACTIONS: tuple[str, ...] = ("report", "delete", "hardlink")
+DEDUPE_PLAN_VERSION: int = 1
+
+FileKey = tuple[int, int, int, int]
+
+
+class DuplicateGroup(NamedTuple):
+    """Группа файлов с одинаковым содержимым."""
+    size: int
+    digest: str
+    paths: list[str]
+    # Время модификации файлов `paths` в наносекундах на момент хэширования
+    mtimes: list[int]
+
+
+class DedupeOp(NamedTuple):
+    """Действие над дубликатом: удалить или заменить жёсткой ссылкой."""
+    action: str
+    path: str
+    keep: str
+    # Размер и время модификации обоих файлов при поиске дубликатов
+    size: int
+    mtime_ns: int
+    keep_mtime_ns: int
+
+
+class StaleDedupeError(OSError):
+    """Файл изменился после поиска дубликатов."""
+
+
+def _new_hash():
+    """Создаёт объект хэш-функции."""
+    return hashlib.blake2b(digest_size=20)
+
+
+def partial_hash(path: str) -> str:
+    """
+    Хэширует первые `PARTIAL_HASH_SIZE` байт файла.
+
+    Args:
+        path (str): Путь к файлу.
+
+    Returns:
+        str: Шестнадцатеричный хэш.
+    """
+    digest = _new_hash()
+    with open(path, "rb") as file:
+        digest.update(file.read(PARTIAL_HASH_SIZE))
+    return digest.hexdigest()
+
+
+def full_hash(path: str) -> str:
+    """
+    Хэширует файл целиком.
+
+    Файл отображается в память через `mmap`; если это невозможно
+    (например, на некоторых сетевых файловых системах), он читается
+    блоками по `HASH_CHUNK_SIZE` байт.
+
+    Args:
+        path (str): Путь к файлу.
+
+    Returns:
+        str: Шестнадцатеричный хэш.
+    """
+    digest = _new_hash()
+    with open(path, "rb") as file:
+        try:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                digest.update(data)
+        except (OSError, ValueError):
+            file.seek(0)
+            while chunk := file.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _safe_hash(path: str) -> str | None:
+    """`partial_hash()`, возвращающий None при ошибке чтения."""
+    try:
+        return partial_hash(path)
+    except OSError:
+        return None
+
+
+def _safe_full_hash(path: str) -> str | None:
+    """`full_hash()`, возвращающий None при ошибке чтения."""
+    try:
+        return full_hash(path)
+    except OSError:
+        return None
+
+
+class HashCache:
+    """Кэш хэшей содержимого файлов."""
+
+    def __init__(self, db_path: str | Path | None = None):
+        """
+        Открывает (и при необходимости создаёт) базу кэша.
+
+        Args:
+            db_path (str | Path | None): Путь к базе. По умолчанию —
+                файл `HASH_CACHE_FILE_NAME` в кэше Repo-Tools.
+        """
+        self.db_path = Path(db_path or get_cache_dir() / HASH_CACHE_FILE_NAME)
+        self._connection = sqlite3.connect(self.db_path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " device INTEGER NOT NULL,"
+            " inode INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " partial TEXT,"
+            " full TEXT,"
+            " PRIMARY KEY (device, inode))"
+        )
+
+    def get(self, key: FileKey) -> tuple[str | None, str | None]:
+        """
+        Возвращает сохранённые хэши файла.
+
+        Args:
+            key (FileKey): Ключ `(device, inode, mtime_ns, size)`.
+
+        Returns:
+            tuple[str | None, str | None]: Частичный и полный хэши, если
+                файл не изменился с момента их вычисления.
+        """
+        row = self._connection.execute(
+            "SELECT partial, full FROM hashes"
+            " WHERE device = ? AND inode = ? AND mtime_ns = ? AND size = ?",
+            key,
+        ).fetchone()
+        return row if row else (None, None)
+
+    def put(
+        self,
+        key: FileKey,
+        partial: str | None,
+        full: str | None,
+    ) -> None:
+        """
+        Сохраняет хэши файла (изменения фиксируются в `save()`).
+
+        Args:
+            key (FileKey): Ключ `(device, inode, mtime_ns, size)`.
+            partial (str | None): Частичный хэш.
+            full (str | None): Полный хэш.
+        """
+        self._connection.execute(
+            "INSERT OR REPLACE INTO hashes"
+            " (device, inode, mtime_ns, size, partial, full)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (*key, partial, full),
+        )
+
+    def save(self) -> None:
+        """Фиксирует изменения в базе."""
+        self._connection.commit()
+
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        self._connection.close()
+
+    def __enter__(self) -> "HashCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _file_key(path: str) -> FileKey | None:
+    """Возвращает ключ кэша для файла или None, если файл недоступен."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _group(
+    items: Iterable[tuple[tuple, str]],
+) -> list[list[str]]:
+    """Группирует пути по ключу, оставляя только группы из 2+ файлов."""
+    groups: dict[tuple, list[str]] = defaultdict(list)
+    for key, path in items:
+        groups[key].append(path)
+    return [paths for paths in groups.values() if len(paths) > 1]
+
+
+def find_duplicates(
+    records: Iterable[ImageRecord],
+    cache: HashCache | None = None,
+    max_workers: int = DEFAULT_HASH_WORKERS,
+) -> list[DuplicateGroup]:
+    """
+    Находит группы файлов с одинаковым содержимым.
+
+    Пустые файлы не учитываются. Жёсткие ссылки на один и тот же inode
+    считаются одним файлом, так как места на диске не занимают.
+
+    Args:
+        records (Iterable[ImageRecord]): Записи сканирования.
+        cache (HashCache | None): Кэш хэшей.
+        max_workers (int): Число процессов для полного хэширования.
+
+    Returns:
+        list[DuplicateGroup]: Группы дубликатов, отсортированные по
+            убыванию занимаемого лишнего места.
+    """
+    # 1. Группировка по размеру
+    size_groups = _group(
+        ((record.size,), os.path.join(record.root, record.filename))
+        for record in records
+        if record.size > 0
+    )
+
+    keys: dict[str, FileKey] = {}
+    seen_inodes: set[tuple[int, int]] = set()
+    for path in sorted(path for paths in size_groups for path in paths):
+        key = _file_key(path)
+        if key is None or key[:2] in seen_inodes:
+            continue
+        seen_inodes.add(key[:2])
+        keys[path] = key
+
+    cached = {
+        path: cache.get(key) if cache else (None, None)
+        for path, key in keys.items()
+    }
+
+    # 2. Хэш начала файла
+    missing = [path for path, (partial, _) in cached.items() if not partial]
+    with ThreadPoolExecutor(max_workers=DEFAULT_SCAN_WORKERS) as executor:
+        partials = dict(zip(missing, executor.map(_safe_hash, missing)))
+    for path, (partial, _) in cached.items():
+        partials.setdefault(path, partial)
+
+    partial_groups = _group(
+        ((keys[path][3], partials[path]), path)
+        for path in keys
+        if partials[path]
+    )
+
+    # 3. Полный хэш (для небольших файлов частичный хэш уже полный)
+    fulls: dict[str, str | None] = {}
+    to_hash: list[str] = []
+    for path in (path for paths in partial_groups for path in paths):
+        if keys[path][3] <= PARTIAL_HASH_SIZE:
+            fulls[path] = partials[path]
+        elif cached[path][1]:
+            fulls[path] = cached[path][1]
+        else:
+            to_hash.append(path)
+
+    if to_hash:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            fulls.update(zip(
+                to_hash,
+                executor.map(_safe_full_hash, to_hash, chunksize=16),
+            ))
+
+    if cache:
+        for path, key in keys.items():
+            entry = (partials[path], fulls.get(path) or cached[path][1])
+            if entry != tuple(cached[path]):
+                cache.put(key, *entry)
+        cache.save()
+
+    groups = [
+        DuplicateGroup(
+            keys[paths[0]][3],
+            fulls[paths[0]],
+            sorted(paths),
+            [keys[path][2] for path in sorted(paths)],
+        )
+        for paths in _group(
+            ((keys[path][3], fulls[path]), path)
+            for path in fulls
+            if fulls[path]
+        )
+    ]
+    groups.sort(
+        key=lambda group: group.size * (len(group.paths) - 1), reverse=True
+    )
+    return groups
+
+
+def plan_dedupe(
+    groups: Iterable[DuplicateGroup],
+    action: str,
+) -> list[DedupeOp]:
+    """
+    Строит план обработки дубликатов.
+
+    В каждой группе сохраняется первый по имени файл: после
+    переименования Renamer это самая ранняя временная метка.
+
+    Args:
+        groups (Iterable[DuplicateGroup]): Группы дубликатов.
+        action (str): `delete` или `hardlink`.
+
+    Returns:
+        list[DedupeOp]: Действия над лишними копиями.
+    """
+    operations: list[DedupeOp] = []
+    for group in groups:
+        mtimes = dict(zip(group.paths, group.mtimes))
+        keep, *duplicates = sorted(
+            group.paths, key=lambda path: (os.path.basename(path), path)
+        )
+        operations.extend(
+            DedupeOp(
+                action, path, keep, group.size, mtimes[path], mtimes[keep]
+            )
+            for path in duplicates
+        )
+    return operations
+
+
+def get_dedupe_plans_dir() -> Path:
+    """
+    Возвращает директорию планов обработки дубликатов, создавая её при
+    необходимости.
+
+    Returns:
+        Path: Путь к директории планов в кэше Repo-Tools.
+    """
+    path = get_cache_dir() / DEDUPE_PLANS_DIR_NAME
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def new_dedupe_plan_path() -> Path:
+    """
+    Формирует путь для нового плана обработки дубликатов.
+
+    Returns:
+        Path: Путь к файлу плана в кэше Repo-Tools (файл не создаётся).
+    """
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return get_dedupe_plans_dir() / f"{stamp}.jsonl"
+
+
+def find_latest_dedupe_plan() -> Path | None:
+    """
+    Находит самый свежий план обработки дубликатов.
+
+    Returns:
+        Path | None: Путь к плану или None, если планов нет.
+    """
+    plans = sorted(get_dedupe_plans_dir().glob("*.jsonl"))
+    return plans[-1] if plans else None
+
+
+def write_dedupe_plan(
+    path: str | Path,
+    directories: list[str],
+    operations: list[DedupeOp],
+) -> None:
+    """
+    Записывает план обработки дубликатов в JSONL-файл.
+
+    Первая строка — заголовок с директориями поиска, далее по строке
+    на действие. План можно просмотреть, отредактировать (например,
+    удалить строки) и выполнить через `read_dedupe_plan()`.
+
+    Args:
+        path (str | Path): Путь к файлу плана.
+        directories (list[str]): Директории, в которых искались дубликаты.
+        operations (list[DedupeOp]): План обработки.
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        header = {
+            "type": "plan",
+            "version": DEDUPE_PLAN_VERSION,
+            "directories": directories,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "count": len(operations),
+        }
+        file.write(json.dumps(header, ensure_ascii=False) + "\n")
+        for op in operations:
+            record = {"type": "op", **op._asdict()}
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def read_dedupe_plan(path: str | Path) -> list[DedupeOp]:
+    """
+    Читает план обработки дубликатов.
+
+    Повреждённые строки и действия с неизвестным типом пропускаются.
+
+    Args:
+        path (str | Path): Путь к файлу плана.
+
+    Returns:
+        list[DedupeOp]: Действия плана.
+
+    Raises:
+        ValueError: Если файл не является планом обработки дубликатов.
+    """
+    header = False
+    operations: list[DedupeOp] = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            kind = record.pop("type", None)
+            if kind == "plan":
+                header = True
+            elif kind == "op" and record.get("action") in DEDUPE_ACTIONS:
+                try:
+                    operations.append(DedupeOp(**record))
+                except TypeError:
+                    continue
+
+    if not header:
+        raise ValueError(f"'{path}' не является планом обработки дубликатов.")
+    return operations
+
+
+def _check_unchanged(path: str, size: int, mtime_ns: int) -> None:
+    """
+    Проверяет, что файл не изменился после поиска дубликатов.
+
+    Raises:
+        StaleDedupeError: Если размер или время модификации изменились.
+        OSError: Если файл недоступен.
+    """
+    stat = os.stat(path)
+    if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+        raise StaleDedupeError(
+            f"Файл изменился после поиска дубликатов: '{path}'"
+        )
+
+
+def _apply_op(op: DedupeOp) -> None:
+    """
+    Выполняет одно действие плана.
+
+    Raises:
+        StaleDedupeError: Если файл изменился после поиска дубликатов.
+        OSError: Если действие не удалось выполнить.
+    """
+    # Файл, уже заменённый ссылкой (повторное выполнение плана), не
+    # трогается
+    if op.action == "hardlink" and os.path.samefile(op.path, op.keep):
+        return
+    _check_unchanged(op.path, op.size, op.mtime_ns)
+    _check_unchanged(op.keep, op.size, op.keep_mtime_ns)
+    if op.action == "delete":
+        os.remove(op.path)
+    elif op.action == "hardlink":
+        tmp_path = op.path + ".dedupe-tmp"
+        os.link(op.keep, tmp_path)
+        try:
+            os.replace(tmp_path, op.path)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+
+
+def apply_dedupe(
+    operations: Iterable[DedupeOp],
+) -> Iterator[tuple[DedupeOp, Exception | None]]:
+    """
+    Выполняет план обработки дубликатов.
+
+    Перед каждым действием размер и время модификации обоих файлов
+    сверяются с планом: изменившийся после поиска файл не удаляется.
+    Замена жёсткой ссылкой выполняется атомарно: ссылка создаётся под
+    временным именем и затем подменяет дубликат через `os.replace`.
+
+    Args:
+        operations (Iterable[DedupeOp]): План обработки.
+
+    Yields:
+        tuple[DedupeOp, Exception | None]: Действие и ошибка, если его не
+            удалось выполнить.
+    """
+    for op in operations:
+        error = None
+        try:
+            _apply_op(op)
+        except OSError as e:
+            error = e
+        yield op, error
@@ -0,0 +1,81 @@
+"""
+Группировка директорий по устройствам хранения.
+
+Одновременная обработка нескольких директорий ограничивается отдельно
+для каждого устройства (`st_dev`): на жёстком диске параллельные обходы
+только умножают перемещения головок, а SSD и сетевые хранилища выдают
+больше при нескольких одновременных запросах.
+"""
+import os
+from collections import defaultdict
+from typing import Iterable
+
+DEFAULT_DEVICE_WORKERS: int = 4
+ROTATIONAL_DEVICE_WORKERS: int = 1
+
+
+def is_rotational(device: int) -> bool | None:
+    """
+    Проверяет, является ли блочное устройство жёстким диском (Linux).
+
+    Для раздела признак берётся у родительского диска.
+
+    Args:
+        device (int): Номер устройства (`st_dev`).
+
+    Returns:
+        bool | None: True для жёсткого диска, False для SSD, None, если
+            тип устройства определить не удалось (другая ОС, сетевая или
+            виртуальная файловая система).
+    """
+    base = f"/sys/dev/block/{os.major(device)}:{os.minor(device)}"
+    for path in (
+        os.path.join(base, "queue", "rotational"),
+        os.path.join(base, "..", "queue", "rotational"),
+    ):
+        try:
+            with open(path, "r", encoding="ascii") as file:
+                return file.read().strip() == "1"
+        except OSError:
+            continue
+    return None
+
+
+def device_limit(device: int, per_device: int | None = None) -> int:
+    """
+    Возвращает число одновременных задач для устройства.
+
+    Args:
+        device (int): Номер устройства (`st_dev`).
+        per_device (int | None): Явное ограничение для всех устройств.
+            По умолчанию — `ROTATIONAL_DEVICE_WORKERS` для жёстких дисков
+            и `DEFAULT_DEVICE_WORKERS` для остальных.
+
+    Returns:
+        int: Максимальное число одновременных задач.
+    """
+    if per_device:
+        return per_device
+    if is_rotational(device):
+        return ROTATIONAL_DEVICE_WORKERS
+    return DEFAULT_DEVICE_WORKERS
+
+
+def group_by_device(paths: Iterable[str]) -> dict[int, list[str]]:
+    """
+    Группирует пути по устройствам, на которых они расположены.
+
+    Args:
+        paths (Iterable[str]): Пути к директориям.
+
+    Returns:
+        dict[int, list[str]]: Пути, сгруппированные по `st_dev`, в
+            исходном порядке. Недоступные пути не включаются.
+    """
+    groups: dict[int, list[str]] = defaultdict(list)
+    for path in paths:
+        try:
+            groups[os.stat(path).st_dev].append(path)
+        except OSError:
+            continue
+    return dict(groups)
@@ -0,0 +1,253 @@
+"""
+Перечисление файлов через индекс Git.
+
+Если целевая директория находится внутри рабочей копии репозитория,
+список файлов можно получить одним вызовом `git ls-files` вместо обхода
+файловой системы: Git читает свой индекс и не заходит в директории,
+исключённые через `.gitignore` (`.git`, окружения, артефакты сборки).
+Вызов `stat` выполняется только для изображений, а содержимое директории
+читается только там, где есть что переименовывать.
+
+Перечисление по индексу включается явно (`--backend git` или `auto`),
+так как отличается от обхода файловой системы: изображения, исключённые
+через `.gitignore`, не переименовываются, а манифест директорий
+(`Manifest`) не используется — каждый запуск читает индекс целиком.
+"""
+import os
+import stat
+import subprocess
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import perf_counter
+from typing import Iterator
+
+try:
+    from apps.gitops.src.utils import run_git
+    from apps.shared import profiling
+except ImportError:  # Автономный запуск из директории `apps`
+    from gitops.src.utils import run_git
+    from shared import profiling
+
+from .ignore import IgnoreMatcher
+from .scanner import DEFAULT_SCAN_WORKERS, DirectoryScan, ImageRecord
+from .utils import is_already_renamed, is_image
+
+SCAN_BACKENDS: tuple[str, ...] = ("auto", "fs", "git")
+# Обход файловой системы: одинаково обрабатывает игнорируемые Git файлы
+# и использует манифест директорий
+DEFAULT_SCAN_BACKEND: str = "fs"
+
+
+def find_work_tree(directory: str | Path) -> Path | None:
+    """
+    Определяет корень рабочей копии Git, содержащей директорию.
+
+    Args:
+        directory (str | Path): Путь к директории.
+
+    Returns:
+        Path | None: Корень рабочей копии или None, если директория не
+            принадлежит репозиторию (или Git не установлен).
+    """
+    try:
+        output = run_git(
+            ["rev-parse", "--show-toplevel"],
+            repo_root_path=Path(directory),
+            capture_output=True,
+            silent=True,
+        )
+    except OSError:
+        return None
+    return Path(output.strip()) if output else None
+
+
+def resolve_backend(
+    directory: str | Path,
+    backend: str = DEFAULT_SCAN_BACKEND,
+) -> str:
+    """
+    Выбирает способ перечисления файлов.
+
+    Args:
+        directory (str | Path): Целевая директория.
+        backend (str): `fs` — обход файловой системы, `git` — индекс Git,
+            `auto` — индекс Git, если директория внутри рабочей копии.
+
+    Returns:
+        str: `fs` или `git`.
+    """
+    if backend != "auto":
+        return backend
+    return "git" if find_work_tree(directory) else "fs"
+
+
+def list_git_files(directory: str | Path) -> list[str] | None:
+    """
+    Получает список файлов директории одним вызовом `git ls-files`.
+
+    В список входят отслеживаемые файлы и новые файлы, не исключённые
+    правилами `.gitignore`. Git выводит имена байтами как есть, поэтому
+    вывод декодируется `os.fsdecode()`: имена не в UTF-8 сохраняются
+    так же, как при обходе файловой системы (surrogateescape).
+
+    Args:
+        directory (str | Path): Директория внутри рабочей копии.
+
+    Returns:
+        list[str] | None: Пути относительно `directory` (с разделителем
+            `/`) или None, если команду выполнить не удалось.
+    """
+    args = [
+        "git", "ls-files", "-z", "--cached", "--others", "--exclude-standard",
+    ]
+    started = perf_counter()
+    try:
+        result = subprocess.run(args, cwd=directory, capture_output=True)
+    except OSError:
+        profiling.record_subprocess(
+            args, started, perf_counter() - started, None
+        )
+        return None
+    profiling.record_subprocess(
+        args,
+        started,
+        perf_counter() - started,
+        result.returncode,
+        result.stdout,
+    )
+    if result.returncode:
+        return None
+    # Файл в состоянии конфликта выводится по разу для каждой стадии
+    return list(dict.fromkeys(
+        os.fsdecode(path) for path in result.stdout.split(b"\0") if path
+    ))
+
+
+def _scan_git_directory(
+    root: str,
+    filenames: list[str],
+    subdirs: set[str],
+    excluded: set[str] | None = None,
+) -> DirectoryScan:
+    """
+    Собирает результат сканирования директории по списку из индекса.
+
+    Файлы, которых нет на диске (удалены, но ещё в индексе), пропускаются.
+    Если в директории есть изображения для переименования, её содержимое
+    дополнительно читается целиком: игнорируемые Git файлы тоже занимают
+    имена, и план не должен их перезаписать.
+
+    Args:
+        root (str): Абсолютный путь к директории.
+        filenames (list[str]): Имена файлов из индекса Git.
+        subdirs (set[str]): Имена вложенных директорий с файлами.
+        excluded (set[str] | None): Имена изображений, исключённых
+            правилами: они только занимают имена.
+
+    Returns:
+        DirectoryScan: Результат сканирования директории.
+    """
+    images: list[ImageRecord] = []
+    names: set[str] = set(filenames) | subdirs
+
+    for filename in filenames:
+        if not is_image(filename) or (excluded and filename in excluded):
+            continue
+        try:
+            file_stat = os.stat(os.path.join(root, filename))
+        except OSError:
+            continue
+        if not stat.S_ISREG(file_stat.st_mode):
+            continue
+        images.append(ImageRecord(
+            root, filename, file_stat.st_mtime, file_stat.st_size
+        ))
+
+    if any(not is_already_renamed(record.filename) for record in images):
+        try:
+            names.update(os.listdir(root))
+        except OSError:
+            pass
+
+    images.sort()
+    return DirectoryScan(root, images, names, sorted(subdirs))
+
+
+def iter_git_directories(
+    directory: str | Path,
+    max_workers: int = DEFAULT_SCAN_WORKERS,
+    ignore: IgnoreMatcher | None = None,
+) -> Iterator[DirectoryScan] | None:
+    """
+    Сканирует директорию внутри рабочей копии по индексу Git.
+
+    Список файлов получается целиком одним вызовом `list_git_files()`,
+    после чего директории обрабатываются в пуле потоков. Выдаются только
+    директории, в которых есть файлы. Изображения в директориях,
+    исключённых через `.gitignore`, не обрабатываются. Правила `ignore`
+    применяются поверх: файлы исключённых директорий отбрасываются, а
+    исключённые изображения только занимают имена.
+
+    Args:
+        directory (str | Path): Директория внутри рабочей копии.
+        max_workers (int): Максимальное число потоков.
+        ignore (IgnoreMatcher | None): Правила исключения.
+
+    Returns:
+        Iterator[DirectoryScan] | None: Результаты сканирования по
+            директориям или None, если индекс Git недоступен либо не
+            содержит файлов директории (например, она целиком исключена
+            через `.gitignore`) — тогда следует обойти файловую систему.
+    """
+    paths = list_git_files(directory)
+    if not paths:
+        return None
+    profiling.count("renamer.entries_scanned", len(paths))
+
+    root = os.fspath(directory)
+    files: dict[str, list[str]] = defaultdict(list)
+    subdirs: dict[str, set[str]] = defaultdict(set)
+    excluded: dict[str, set[str]] = defaultdict(set)
+    ignored_dirs: dict[str, bool] = {"": False}
+
+    def is_ignored_dir(path: str) -> bool:
+        if path not in ignored_dirs:
+            parent = path.rpartition("/")[0]
+            ignored_dirs[path] = is_ignored_dir(parent) or ignore.match(
+                path, is_dir=True
+            )
+        return ignored_dirs[path]
+
+    for path in paths:
+        parent, _, filename = path.rpartition("/")
+        if ignore:
+            if is_ignored_dir(parent):
+                continue
+            if is_image(filename) and ignore.match(path):
+                excluded[parent].add(filename)
+        files[parent].append(filename)
+        # Регистрируем директорию в родительской вплоть до корня
+        while parent:
+            parent, _, name = parent.rpartition("/")
+            if name in subdirs[parent]:
+                break
+            subdirs[parent].add(name)
+
+    def scan(parent: str) -> DirectoryScan:
+        path = os.path.join(root, *parent.split("/")) if parent else root
+        return _scan_git_directory(
+            path,
+            files[parent],
+            subdirs.get(parent, set()),
+            excluded.get(parent),
+        )
+
+    def generate() -> Iterator[DirectoryScan]:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for result in executor.map(scan, sorted(files)):
+                profiling.count("renamer.directories_scanned")
+                profiling.count("renamer.stat_calls", len(result.images))
+                yield result
+
+    return generate()
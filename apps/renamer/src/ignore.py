@@ -0,0 +1,229 @@
+"""
+Исключение директорий и файлов из обхода Renamer.
+
+Набор правил складывается из известных «тяжёлых» директорий
+(`DEFAULT_IGNORE_PATTERNS`: служебные данные VCS, виртуальные окружения,
+кэши, миниатюры NAS) и файла `.renamerignore` в корне обхода. Синтаксис
+файла повторяет `.gitignore`: `*`, `?`, `[...]`, `**`, `!` для
+исключения из исключений, `/` в начале или середине для привязки к
+корню и `/` в конце для директорий.
+
+Все правила компилируются один раз и раскладываются по индексам: имена
+без шаблонов (`node_modules/`) — в словарь по имени, шаблоны вида
+`*.ext` — в словарь по расширению. Проверка пути по ним стоит O(1) на
+каждую точку в имени, независимо от числа таких правил. Остальные
+шаблоны (`**`, `?`, `[...]`, пути с `/`) объединяются в одно регулярное
+выражение; его проверка линейна по числу и длине этих шаблонов, а `**`
+может давать откат. Исключённая директория не открывается вовсе,
+поэтому её поддерево не стоит ничего.
+"""
+import os
+import re
+from pathlib import Path
+
+IGNORE_FILE_NAME: str = ".renamerignore"
+DEFAULT_IGNORE_PATTERNS: tuple[str, ...] = (
+    # Системы контроля версий
+    ".git/",
+    ".hg/",
+    ".svn/",
+    # Окружения и кэши инструментов
+    ".venv/",
+    "venv/",
+    "node_modules/",
+    "__pycache__/",
+    ".mypy_cache/",
+    ".pytest_cache/",
+    ".tox/",
+    ".cache/",
+    # Миниатюры и служебные директории NAS и ОС
+    "@eaDir/",
+    ".thumbnails/",
+    ".Trash-*/",
+    "$RECYCLE.BIN/",
+    "System Volume Information/",
+    ".Spotlight-V100/",
+)
+
+
+def _translate(pattern: str) -> str:
+    """Преобразует шаблон `.gitignore` (без `!`) в регулярное выражение."""
+    directory_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+
+    parts: list[str] = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if pattern.startswith("**/", index):
+            parts.append("(?:.*/)?")
+            index += 3
+            continue
+        if pattern.startswith("**", index):
+            parts.append(".*")
+            index += 2
+            continue
+        if char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", index + 2)
+            if end == -1:
+                parts.append(re.escape(char))
+            else:
+                body = pattern[index + 1:end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append(f"[{body}]")
+                index = end
+        elif char == "\\" and index + 1 < len(pattern):
+            index += 1
+            parts.append(re.escape(pattern[index]))
+        else:
+            parts.append(re.escape(char))
+        index += 1
+
+    prefix = "" if anchored else "(?:.*/)?"
+    suffix = "/" if directory_only else "/?"
+    return prefix + "".join(parts) + suffix
+
+
+def _is_literal(pattern: str) -> bool:
+    """Проверяет, что шаблон — просто имя, без подстановок и `/`."""
+    return not any(char in pattern.rstrip("/") for char in "*?[\\/")
+
+
+def _extension(pattern: str) -> str | None:
+    """Возвращает `.ext` для шаблона вида `*.ext` или None."""
+    body = pattern.rstrip("/")
+    if body.startswith("*.") and _is_literal(body[1:]):
+        return body[1:]
+    return None
+
+
+class IgnoreMatcher:
+    """Скомпилированный набор правил исключения."""
+
+    def __init__(self, patterns: list[str]):
+        """
+        Компилирует правила.
+
+        Args:
+            patterns (list[str]): Строки в формате `.gitignore`. Как и в
+                Git, при совпадении нескольких правил действует последнее.
+        """
+        rules: list[tuple[bool, str]] = []
+        for line in patterns:
+            line = line.rstrip("\n")
+            if line.endswith(" ") and not line.endswith("\\ "):
+                line = line.rstrip(" ")
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated or line.startswith(("\\#", "\\!")):
+                line = line[1:]
+            if line.strip("/"):
+                rules.append((negated, line))
+
+        self.patterns = [
+            ("!" if negated else "") + line for negated, line in rules
+        ]
+        # Правило → его номер: при нескольких совпадениях действует
+        # правило с наибольшим номером.
+        self._names: dict[str, int] = {}
+        self._directory_names: dict[str, int] = {}
+        self._extensions: dict[str, int] = {}
+        self._directory_extensions: dict[str, int] = {}
+        self._negated: set[int] = set()
+        self._regex: re.Pattern | None = None
+
+        alternatives: list[str] = []
+        # Правила проверяются с конца: первое совпадение — последнее правило
+        for number, (negated, line) in reversed(list(enumerate(rules))):
+            if negated:
+                self._negated.add(number)
+            directory_only = line.endswith("/")
+            extension = _extension(line)
+            if extension is not None:
+                index = (
+                    self._directory_extensions if directory_only
+                    else self._extensions
+                )
+                index.setdefault(extension, number)
+                continue
+            if _is_literal(line):
+                index = (
+                    self._directory_names if directory_only
+                    else self._names
+                )
+                index.setdefault(line.rstrip("/"), number)
+                continue
+            alternatives.append(f"(?P<r{number}>{_translate(line)})")
+        if alternatives:
+            self._regex = re.compile("|".join(alternatives), re.DOTALL)
+
+    def _last_indexed(self, name: str, is_dir: bool) -> int:
+        """Номер последнего совпавшего правила из индексов или -1."""
+        found = [self._names.get(name, -1)]
+        if is_dir:
+            found.append(self._directory_names.get(name, -1))
+        if self._extensions or self._directory_extensions:
+            dot = name.find(".")
+            while dot != -1:
+                suffix = name[dot:]
+                found.append(self._extensions.get(suffix, -1))
+                if is_dir:
+                    found.append(self._directory_extensions.get(suffix, -1))
+                dot = name.find(".", dot + 1)
+        return max(found)
+
+    def match(self, path: str, is_dir: bool = False) -> bool:
+        """
+        Проверяет, исключён ли путь.
+
+        Args:
+            path (str): Путь относительно корня обхода, с разделителем `/`.
+            is_dir (bool): Является ли путь директорией.
+
+        Returns:
+            bool: True, если путь исключён.
+        """
+        number = self._last_indexed(path.rpartition("/")[2], is_dir)
+        if self._regex is not None:
+            found = self._regex.fullmatch(path + "/" if is_dir else path)
+            if found is not None:
+                number = max(number, int(found.lastgroup[1:]))
+        return number != -1 and number not in self._negated
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+
+def load_ignore(
+    root: str | Path,
+    use_defaults: bool = True,
+) -> IgnoreMatcher:
+    """
+    Собирает правила исключения для обхода директории.
+
+    Args:
+        root (str | Path): Корневая директория обхода.
+        use_defaults (bool): Добавлять ли `DEFAULT_IGNORE_PATTERNS`.
+            Правила из `.renamerignore` следуют за ними, поэтому могут
+            вернуть директорию в обход через `!`.
+
+    Returns:
+        IgnoreMatcher: Скомпилированные правила.
+    """
+    patterns = list(DEFAULT_IGNORE_PATTERNS) if use_defaults else []
+    try:
+        with open(
+            os.path.join(root, IGNORE_FILE_NAME), "r", encoding="utf-8"
+        ) as file:
+            patterns.extend(file)
+    except (OSError, UnicodeDecodeError):
+        pass
+    return IgnoreMatcher(patterns)
@@ -0,0 +1,422 @@
+"""
+Журнал переименований для Renamer.
+
+Журнал — это JSONL-файл, в который только дописываются записи:
+  - `plan` — заголовок с директорией и количеством операций;
+  - `op` — запланированное переименование;
+  - `applied` — контрольная точка: сколько операций с начала плана
+    выполнено (записывается пакетами, с `fsync`);
+  - `error` — операция, которую не удалось выполнить;
+  - `undone` — контрольная точка отмены: сколько операций с конца
+    выполненной части плана уже возвращено.
+
+Это позволяет продолжить прерванный запуск без повторного сканирования
+и отменить завершённый запуск, проиграв журнал в обратном порядке.
+
+В потоковом режиме (`stream_journal()`) план заранее неизвестен целиком,
+поэтому журнал ведётся как журнал упреждающей записи: пакет операций
+сначала записывается на диск и только затем выполняется.
+"""
+import json
+import os
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+from .planner import RenameOp
+from .utils import get_cache_dir
+
+JOURNAL_VERSION: int = 1
+JOURNALS_DIR_NAME: str = "journals"
+DEFAULT_BATCH_SIZE: int = 500
+
+
+class JournalState(NamedTuple):
+    """Состояние журнала, восстановленное из файла."""
+    directory: str
+    operations: list[RenameOp]
+    applied: int
+    undone: int
+    failed: set[int]
+
+
+def get_journals_dir() -> Path:
+    """
+    Возвращает директорию для хранения журналов, создавая её при
+    необходимости.
+
+    Returns:
+        Path: Путь к директории журналов в кэше Repo-Tools.
+    """
+    path = get_cache_dir() / JOURNALS_DIR_NAME
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def new_journal_path() -> Path:
+    """
+    Формирует путь для нового журнала по текущему времени.
+
+    Returns:
+        Path: Путь к файлу журнала (файл не создаётся).
+    """
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return get_journals_dir() / f"{stamp}.jsonl"
+
+
+def find_latest_journal(applied_only: bool = False) -> Path | None:
+    """
+    Находит самый свежий журнал в кэше Repo-Tools.
+
+    Args:
+        applied_only (bool): Если True — пропускает журналы, по которым
+            ещё ничего не переименовано (планы сухих запусков): для
+            отмены последнего запуска.
+
+    Returns:
+        Path | None: Путь к журналу или None, если журналов нет.
+    """
+    journals = sorted(get_journals_dir().glob("*.jsonl"), reverse=True)
+    if not applied_only:
+        return journals[0] if journals else None
+    for path in journals:
+        try:
+            if read_journal(path).applied:
+                return path
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def _sync(file) -> None:
+    """Сбрасывает буферы файла на диск."""
+    file.flush()
+    os.fsync(file.fileno())
+
+
+def _append(file, record: dict) -> None:
+    """Дописывает запись в журнал."""
+    file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def write_plan(
+    path: str | Path,
+    directory: str | Path,
+    operations: list[RenameOp],
+) -> None:
+    """
+    Записывает план переименований в новый журнал.
+
+    Файл сначала пишется во временный файл и затем атомарно
+    подменяется, поэтому журнал никогда не бывает записан наполовину.
+
+    Args:
+        path (str | Path): Путь к файлу журнала.
+        directory (str | Path): Обрабатываемая директория.
+        operations (list[RenameOp]): Запланированные переименования.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        _append(file, {
+            "type": "plan",
+            "version": JOURNAL_VERSION,
+            "directory": os.fspath(directory),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "count": len(operations),
+        })
+        for index, (root, filename, new_filename) in enumerate(operations):
+            _append(file, {
+                "type": "op",
+                "id": index,
+                "root": root,
+                "src": filename,
+                "dst": new_filename,
+            })
+        _sync(file)
+
+    os.replace(tmp_path, path)
+
+
+def read_journal(path: str | Path) -> JournalState:
+    """
+    Восстанавливает состояние журнала.
+
+    Повреждённая последняя строка (например, после аварийного завершения
+    во время записи) игнорируется.
+
+    Args:
+        path (str | Path): Путь к файлу журнала.
+
+    Returns:
+        JournalState: План и достигнутые контрольные точки.
+
+    Raises:
+        ValueError: Если файл не является журналом Renamer.
+    """
+    directory: str | None = None
+    operations: list[RenameOp] = []
+    applied: int = 0
+    undone: int = 0
+    failed: set[int] = set()
+
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+            kind = record.get("type")
+            if kind == "plan":
+                directory = record["directory"]
+            elif kind == "op":
+                operations.append(
+                    RenameOp(record["root"], record["src"], record["dst"])
+                )
+            elif kind == "applied":
+                applied = max(applied, record["count"])
+            elif kind == "undone":
+                undone = max(undone, record["count"])
+            elif kind == "error":
+                failed.add(record["id"])
+
+    if directory is None:
+        raise ValueError(f"'{path}' не является журналом Renamer.")
+
+    return JournalState(directory, operations, applied, undone, failed)
+
+
+def _move(src: str, dst: str) -> None:
+    """
+    Перемещает файл, никогда не перезаписывая существующий.
+
+    Файл сначала получает жёсткую ссылку с новым именем, и только затем
+    старое имя удаляется: `os.link` не заменяет существующий файл, а
+    завершается `FileExistsError`. Так файл, появившийся под целевым
+    именем между планированием и выполнением (сухой запуск сейчас,
+    `--resume` позже или режим наблюдения), не теряется.
+
+    Повторное выполнение после сбоя:
+      - исходного файла нет, а целевой есть — операция уже выполнена;
+      - оба имени указывают на один файл с двумя ссылками — сбой
+        произошёл между `link` и `unlink`, остаётся удалить старое имя.
+
+    Raises:
+        FileExistsError: Целевое имя занято другим файлом.
+        OSError: Другие ошибки файловой системы.
+    """
+    try:
+        os.link(src, dst, follow_symlinks=False)
+    except FileExistsError:
+        source, target = os.lstat(src), os.lstat(dst)
+        if (source.st_dev, source.st_ino) != (target.st_dev, target.st_ino):
+            raise
+        if source.st_nlink < 2:
+            # Одно имя без учёта регистра (например, `A.JPG` → `a.jpg`
+            # на нечувствительной к регистру файловой системе)
+            os.rename(src, dst)
+            return
+    except FileNotFoundError:
+        if os.path.lexists(src) or not os.path.lexists(dst):
+            raise
+        return
+    except OSError:
+        # Файловая система без жёстких ссылок (FAT, часть сетевых):
+        # проверка и переименование не атомарны, но не перезаписывают
+        # файл, уже существующий к моменту перемещения
+        if os.path.lexists(dst):
+            raise FileExistsError(
+                f"Файл уже существует: '{dst}'"
+            ) from None
+        os.rename(src, dst)
+        return
+    os.unlink(src)
+
+
+def apply_journal(
+    path: str | Path,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[tuple[RenameOp, Exception | None]]:
+    """
+    Выполняет (или продолжает выполнять) план из журнала.
+
+    Операции выполняются в порядке плана, начиная с последней контрольной
+    точки. Каждые `batch_size` операций в журнал дописывается контрольная
+    точка с `fsync`; последняя точка записывается и при досрочном
+    прерывании генератора.
+
+    Args:
+        path (str | Path): Путь к файлу журнала.
+        batch_size (int): Размер пакета между контрольными точками.
+
+    Yields:
+        tuple[RenameOp, Exception | None]: Выполненная операция и ошибка,
+            если её не удалось выполнить.
+    """
+    state = read_journal(path)
+    done = state.applied
+
+    with open(path, "a", encoding="utf-8") as file:
+        try:
+            for index in range(state.applied, len(state.operations)):
+                op = state.operations[index]
+                error = None
+                try:
+                    _move(
+                        os.path.join(op.root, op.filename),
+                        os.path.join(op.root, op.new_filename),
+                    )
+                except OSError as e:
+                    error = e
+                    _append(file, {
+                        "type": "error", "id": index, "error": str(e),
+                    })
+
+                done = index + 1
+                if done % batch_size == 0:
+                    _append(file, {"type": "applied", "count": done})
+                    _sync(file)
+
+                yield op, error
+        finally:
+            _append(file, {"type": "applied", "count": done})
+            _sync(file)
+
+
+def stream_journal(
+    path: str | Path,
+    directory: str | Path,
+    operations: Iterable[RenameOp],
+    dry_run: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[tuple[RenameOp, Exception | None]]:
+    """
+    Записывает и выполняет поток операций пакетами.
+
+    Из потока одновременно читается не более `batch_size` операций:
+    пакет записывается в журнал с `fsync`, выполняется, после чего
+    дописывается контрольная точка. При `dry_run=True` операции только
+    записываются, и журнал можно выполнить позже через `apply_journal()`.
+
+    Args:
+        path (str | Path): Путь к новому файлу журнала.
+        directory (str | Path): Обрабатываемая директория.
+        operations (Iterable[RenameOp]): Поток запланированных операций.
+        dry_run (bool): Если True — операции не выполняются.
+        batch_size (int): Размер пакета.
+
+    Yields:
+        tuple[RenameOp, Exception | None]: Операция и ошибка, если её не
+            удалось выполнить.
+    """
+    iterator = iter(operations)
+    index: int = 0
+    done: int = 0
+
+    with open(path, "w", encoding="utf-8") as file:
+        _append(file, {
+            "type": "plan",
+            "version": JOURNAL_VERSION,
+            "directory": os.fspath(directory),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "count": None,
+        })
+        try:
+            while batch := list(islice(iterator, batch_size)):
+                for offset, (root, filename, new_filename) in enumerate(batch):
+                    _append(file, {
+                        "type": "op",
+                        "id": index + offset,
+                        "root": root,
+                        "src": filename,
+                        "dst": new_filename,
+                    })
+                _sync(file)
+
+                for op in batch:
+                    error = None
+                    if not dry_run:
+                        try:
+                            _move(
+                                os.path.join(op.root, op.filename),
+                                os.path.join(op.root, op.new_filename),
+                            )
+                        except OSError as e:
+                            error = e
+                            _append(file, {
+                                "type": "error", "id": index, "error": str(e),
+                            })
+                        done = index + 1
+                    index += 1
+                    yield op, error
+
+                if not dry_run:
+                    _append(file, {"type": "applied", "count": done})
+                    _sync(file)
+        finally:
+            if not dry_run:
+                _append(file, {"type": "applied", "count": done})
+            _sync(file)
+
+
+def undo_journal(
+    path: str | Path,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[tuple[RenameOp, Exception | None]]:
+    """
+    Отменяет выполненную часть плана, проигрывая журнал в обратном порядке.
+
+    Операции, завершившиеся ошибкой при выполнении, пропускаются.
+    Повторный вызов продолжает отмену с последней контрольной точки.
+    Контрольная точка не сдвигается дальше первой неудачной отмены,
+    поэтому повторный вызов повторит её; уже отменённые после неё
+    операции при этом выполняются как пустые (`_move()` не трогает
+    файл, который уже на месте).
+
+    Args:
+        path (str | Path): Путь к файлу журнала.
+        batch_size (int): Размер пакета между контрольными точками.
+
+    Yields:
+        tuple[RenameOp, Exception | None]: Обратная операция
+            (`new_filename → filename`) и ошибка, если её не удалось
+            выполнить.
+    """
+    state = read_journal(path)
+    done = state.undone
+    pending = range(state.applied - state.undone - 1, -1, -1)
+    blocked = False
+
+    with open(path, "a", encoding="utf-8") as file:
+        try:
+            for index in pending:
+                if index in state.failed:
+                    if not blocked:
+                        done += 1
+                    continue
+
+                op = state.operations[index]
+                reverse = RenameOp(op.root, op.new_filename, op.filename)
+                error = None
+                try:
+                    _move(
+                        os.path.join(op.root, op.new_filename),
+                        os.path.join(op.root, op.filename),
+                    )
+                except OSError as e:
+                    error = e
+                    blocked = True
+
+                if not blocked:
+                    done += 1
+                    if done % batch_size == 0:
+                        _append(file, {"type": "undone", "count": done})
+                        _sync(file)
+
+                yield reverse, error
+        finally:
+            _append(file, {"type": "undone", "count": done})
+            _sync(file)
@@ -0,0 +1,205 @@
+"""
+Манифест директорий для инкрементальных запусков Renamer.
+
+Манифест хранится в SQLite в кэше Repo-Tools. Для каждой директории, в
+которой после запуска не осталось файлов для переименования, запоминается
+отпечаток `(mtime_ns, inode)` и список вложенных директорий. При
+следующем запуске директория с тем же отпечатком не читается вовсе:
+сканер сразу переходит к её поддиректориям.
+
+Вместе с отпечатком хранится хэш правил исключения: исключённые
+изображения не переименовываются, поэтому после изменения
+`.renamerignore` директория сканируется заново.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from .utils import get_cache_dir
+
+MANIFEST_FILE_NAME: str = "renamer-manifest.sqlite3"
+# Директории, изменённые менее чем RACY_WINDOW_NS назад, не запоминаются:
+# их mtime может не измениться при последующей правке в тот же квант времени
+RACY_WINDOW_NS: int = 2_000_000_000
+# Версия схемы базы (`PRAGMA user_version`): база другой версии
+# пересоздаётся, так как манифест — только кэш
+SCHEMA_VERSION: int = 2
+
+DirectoryStamp = tuple[int, int]
+
+
+def get_directory_stamp(path: str) -> DirectoryStamp:
+    """
+    Возвращает отпечаток директории `(mtime_ns, inode)`.
+
+    Args:
+        path (str): Путь к директории.
+
+    Returns:
+        DirectoryStamp: Время модификации в наносекундах и номер inode.
+
+    Raises:
+        OSError: Если директория недоступна.
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_ino
+
+
+def get_rules_digest(root: str, patterns: list[str]) -> str:
+    """
+    Возвращает хэш правил исключения для корня обхода.
+
+    Корень входит в хэш, так как шаблоны с `/` привязаны к нему.
+
+    Args:
+        root (str): Абсолютный путь к корню обхода.
+        patterns (list[str]): Правила (`IgnoreMatcher.patterns`).
+
+    Returns:
+        str: Шестнадцатеричный хэш SHA-256.
+    """
+    data = "\0".join([root, *patterns]).encode("utf-8", "surrogateescape")
+    return hashlib.sha256(data).hexdigest()
+
+
+class Manifest:
+    """Отпечатки неизменившихся директорий в пределах одного корня."""
+
+    def __init__(
+        self,
+        root: str | Path,
+        db_path: str | Path | None = None,
+        refresh: bool = False,
+        ignore_patterns: list[str] | None = None,
+    ):
+        """
+        Открывает базу манифеста и загружает записи для корня `root`.
+
+        Args:
+            root (str | Path): Корневая директория запуска.
+            db_path (str | Path | None): Путь к базе. По умолчанию —
+                файл `MANIFEST_FILE_NAME` в кэше Repo-Tools.
+            refresh (bool): Если True — сохранённые записи не используются
+                (полное сканирование), но манифест обновляется по его
+                результатам.
+            ignore_patterns (list[str] | None): Правила исключения
+                обхода. Записи, сохранённые с другими правилами, не
+                используются.
+        """
+        self.root = os.path.abspath(root)
+        self.refresh = refresh
+        self.rules = get_rules_digest(self.root, ignore_patterns or [])
+        self.db_path = Path(db_path or get_cache_dir() / MANIFEST_FILE_NAME)
+        self._connection = sqlite3.connect(self.db_path)
+        version = self._connection.execute("PRAGMA user_version").fetchone()
+        if version[0] != SCHEMA_VERSION:
+            with self._connection:
+                self._connection.execute("DROP TABLE IF EXISTS directories")
+                self._connection.execute(
+                    f"PRAGMA user_version = {SCHEMA_VERSION}"
+                )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS directories ("
+            " path TEXT PRIMARY KEY,"
+            " mtime_ns INTEGER NOT NULL,"
+            " inode INTEGER NOT NULL,"
+            " subdirs TEXT NOT NULL,"
+            " rules TEXT NOT NULL)"
+        )
+        self._entries = self._load()
+        self._updates: dict[str, tuple[int, int, str, str]] = {}
+        self._valid: set[str] = set()
+
+    def _load(self) -> dict[str, tuple[DirectoryStamp, list[str], str]]:
+        """Загружает записи корня и всех его поддиректорий."""
+        prefix = os.path.join(self.root, "")
+        rows = self._connection.execute(
+            "SELECT path, mtime_ns, inode, subdirs, rules FROM directories"
+            " WHERE path = ? OR (path >= ? AND path < ?)",
+            (self.root, prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)),
+        )
+        return {
+            path: ((mtime_ns, inode), json.loads(subdirs), rules)
+            for path, mtime_ns, inode, subdirs, rules in rows
+        }
+
+    def lookup(self, path: str, stamp: DirectoryStamp) -> list[str] | None:
+        """
+        Проверяет, изменилась ли директория с прошлого запуска.
+
+        Метод вызывается из потоков сканера и только читает данные,
+        загруженные при открытии манифеста.
+
+        Args:
+            path (str): Абсолютный путь к директории.
+            stamp (DirectoryStamp): Текущий отпечаток директории.
+
+        Returns:
+            list[str] | None: Имена вложенных директорий, если директория
+                не изменилась и правила исключения те же, иначе None.
+        """
+        entry = self._entries.get(path)
+        if (
+            self.refresh
+            or entry is None
+            or entry[0] != stamp
+            or entry[2] != self.rules
+        ):
+            return None
+        self._valid.add(path)
+        return entry[1]
+
+    def record(
+        self,
+        path: str,
+        stamp: DirectoryStamp,
+        subdirs: list[str],
+    ) -> None:
+        """
+        Запоминает директорию как не требующую обработки.
+
+        Args:
+            path (str): Абсолютный путь к директории.
+            stamp (DirectoryStamp): Отпечаток директории после обработки.
+            subdirs (list[str]): Имена вложенных директорий.
+        """
+        mtime_ns, inode = stamp
+        if time.time_ns() - mtime_ns < RACY_WINDOW_NS:
+            return
+        self._updates[path] = (
+            mtime_ns, inode, json.dumps(subdirs), self.rules
+        )
+
+    def save(self) -> None:
+        """
+        Сохраняет новые записи и удаляет устаревшие: о директориях,
+        которые изменились или больше не встречаются в дереве.
+        """
+        stale = [
+            (path,) for path in self._entries
+            if path not in self._valid and path not in self._updates
+        ]
+        with self._connection:
+            self._connection.executemany(
+                "DELETE FROM directories WHERE path = ?", stale
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO directories"
+                " (path, mtime_ns, inode, subdirs, rules)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(path, *values) for path, values in self._updates.items()],
+            )
+        self._updates.clear()
+
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        self._connection.close()
+
+    def __enter__(self) -> "Manifest":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,325 @@
+"""
+Извлечение метаданных изображений из заголовков файлов.
+
+Изображения не декодируются: парсеры читают только заголовки форматов
+JPEG, PNG, WebP и TIFF, перемещаясь между блоками через `seek`, и
+находят дату съёмки EXIF (`DateTimeOriginal`) и размеры в пикселях.
+Блок EXIF читается не больше чем на `MAX_EXIF_SIZE` байт, поэтому объём
+чтения на файл обычно составляет несколько КиБ.
+
+Используется Renamer как альтернативный источник временной метки: при
+копировании или клонировании через git время модификации файлов
+становится «текущим», а дата съёмки сохраняется.
+"""
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import BinaryIO, Callable, Iterable, Iterator, NamedTuple
+
+from .scanner import DirectoryScan
+from .utils import LENGTH_UNIX_TIME, is_already_renamed
+
+MAX_EXIF_SIZE: int = 64 * 1024  # 64 КиБ
+MAX_IFD_ENTRIES: int = 1024
+DEFAULT_METADATA_WORKERS: int = min(32, (os.cpu_count() or 1) + 4)
+TIMESTAMP_SOURCES: tuple[str, ...] = ("mtime", "exif")
+
+PNG_SIGNATURE: bytes = b"\x89PNG\r\n\x1a\n"
+# Маркеры SOF, содержащие размеры кадра (кроме DHT, JPG и DAC)
+JPEG_SOF_MARKERS: set[int] = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+TAG_IMAGE_WIDTH: int = 0x0100
+TAG_IMAGE_LENGTH: int = 0x0101
+TAG_DATETIME: int = 0x0132
+TAG_EXIF_IFD: int = 0x8769
+TAG_DATETIME_ORIGINAL: int = 0x9003
+TAG_OFFSET_TIME_ORIGINAL: int = 0x9011
+WANTED_TAGS: set[int] = {
+    TAG_IMAGE_WIDTH,
+    TAG_IMAGE_LENGTH,
+    TAG_DATETIME,
+    TAG_EXIF_IFD,
+    TAG_DATETIME_ORIGINAL,
+    TAG_OFFSET_TIME_ORIGINAL,
+}
+
+ReadAt = Callable[[int, int], bytes]
+
+
+class ImageMetadata(NamedTuple):
+    """Метаданные изображения (None — значение не найдено)."""
+    taken: int | None
+    width: int | None
+    height: int | None
+
+
+EMPTY_METADATA = ImageMetadata(None, None, None)
+
+
+def _parse_exif_datetime(value: str | None, offset: str | None) -> int | None:
+    """
+    Преобразует дату EXIF `YYYY:MM:DD HH:MM:SS` в Unix-время.
+
+    Без смещения часового пояса (`OffsetTimeOriginal`) дата считается
+    локальной. Даты, дающие метку короче `LENGTH_UNIX_TIME` цифр,
+    отбрасываются: такие имена не распознаются `is_already_renamed()`.
+    """
+    if not value:
+        return None
+    try:
+        moment = datetime.strptime(value.strip(), "%Y:%m:%d %H:%M:%S")
+        if offset:
+            moment = moment.replace(
+                tzinfo=datetime.strptime(offset.strip(), "%z").tzinfo
+            )
+        timestamp = int(moment.timestamp())
+    except (ValueError, OverflowError, OSError):
+        return None
+    return timestamp if len(str(timestamp)) == LENGTH_UNIX_TIME else None
+
+
+def _read_ifd(read_at: ReadAt, offset: int, order: str) -> dict[int, object]:
+    """Читает нужные теги из каталога (IFD) структуры TIFF."""
+    raw = read_at(offset, 2)
+    if len(raw) < 2:
+        return {}
+    count = struct.unpack(order + "H", raw)[0]
+    if count > MAX_IFD_ENTRIES:
+        return {}
+
+    entries = read_at(offset + 2, count * 12)
+    values: dict[int, object] = {}
+    for start in range(0, len(entries) - 11, 12):
+        tag, kind, length, value = struct.unpack(
+            order + "HHI4s", entries[start:start + 12]
+        )
+        if tag not in WANTED_TAGS:
+            continue
+        if kind == 3:  # SHORT
+            values[tag] = struct.unpack(order + "H", value[:2])[0]
+        elif kind == 4:  # LONG
+            values[tag] = struct.unpack(order + "I", value)[0]
+        elif kind == 2 and length <= 64:  # ASCII
+            data = (
+                value[:length] if length <= 4
+                else read_at(struct.unpack(order + "I", value)[0], length)
+            )
+            values[tag] = data.split(b"\0", 1)[0].decode("ascii", "replace")
+    return values
+
+
+def _parse_tiff(read_at: ReadAt) -> ImageMetadata:
+    """Разбирает структуру TIFF (файл TIFF или блок EXIF)."""
+    header = read_at(0, 8)
+    order = {b"II": "<", b"MM": ">"}.get(header[:2])
+    if len(header) < 8 or order is None:
+        return EMPTY_METADATA
+    if struct.unpack(order + "H", header[2:4])[0] != 42:
+        return EMPTY_METADATA
+
+    ifd0_offset = struct.unpack(order + "I", header[4:8])[0]
+    ifd0 = _read_ifd(read_at, ifd0_offset, order)
+    exif: dict[int, object] = {}
+    if isinstance(ifd0.get(TAG_EXIF_IFD), int):
+        exif = _read_ifd(read_at, ifd0[TAG_EXIF_IFD], order)
+
+    taken = _parse_exif_datetime(
+        exif.get(TAG_DATETIME_ORIGINAL) or ifd0.get(TAG_DATETIME),
+        exif.get(TAG_OFFSET_TIME_ORIGINAL),
+    )
+    return ImageMetadata(
+        taken, ifd0.get(TAG_IMAGE_WIDTH), ifd0.get(TAG_IMAGE_LENGTH)
+    )
+
+
+def _parse_exif_block(block: bytes) -> ImageMetadata:
+    """Разбирает блок EXIF (с префиксом `Exif\\0\\0` или без него)."""
+    if block.startswith(b"Exif\0\0"):
+        block = block[6:]
+    return _parse_tiff(lambda offset, size: block[offset:offset + size])
+
+
+def _parse_jpeg(read_at: ReadAt) -> ImageMetadata:
+    """Обходит сегменты JPEG до начала сжатых данных (SOS)."""
+    taken = width = height = None
+    position = 2
+
+    while True:
+        header = read_at(position, 4)
+        if len(header) < 4 or header[0] != 0xFF:
+            break
+        marker = header[1]
+        if marker == 0xFF:  # байт-заполнитель
+            position += 1
+            continue
+        if marker in (0xDA, 0xD9):  # SOS, EOI
+            break
+
+        length = struct.unpack(">H", header[2:4])[0]
+        if length < 2:
+            break
+        if marker == 0xE1 and taken is None:
+            block = read_at(position + 4, min(length - 2, MAX_EXIF_SIZE))
+            taken = _parse_exif_block(block).taken
+        elif marker in JPEG_SOF_MARKERS:
+            frame = read_at(position + 4, 5)
+            if len(frame) == 5:
+                height, width = struct.unpack(">HH", frame[1:5])
+        if width is not None and taken is not None:
+            break
+        position += 2 + length
+
+    return ImageMetadata(taken, width, height)
+
+
+def _parse_png(read_at: ReadAt) -> ImageMetadata:
+    """Читает IHDR и ищет блок eXIf до начала данных изображения."""
+    header = read_at(16, 8)
+    if len(header) < 8:
+        return EMPTY_METADATA
+    width, height = struct.unpack(">II", header)
+    taken = None
+    position = 8
+
+    while True:
+        chunk = read_at(position, 8)
+        if len(chunk) < 8:
+            break
+        length, kind = struct.unpack(">I4s", chunk)
+        if kind == b"eXIf":
+            block = read_at(position + 8, min(length, MAX_EXIF_SIZE))
+            taken = _parse_exif_block(block).taken
+            break
+        if kind in (b"IDAT", b"IEND"):
+            break
+        position += 12 + length
+
+    return ImageMetadata(taken, width, height)
+
+
+def _parse_webp(read_at: ReadAt) -> ImageMetadata:
+    """Обходит блоки RIFF контейнера WebP, пропуская данные изображения."""
+    taken = width = height = None
+    position = 12
+
+    while True:
+        chunk = read_at(position, 8)
+        if len(chunk) < 8:
+            break
+        kind = chunk[:4]
+        length = struct.unpack("<I", chunk[4:])[0]
+
+        if kind == b"VP8X":
+            body = read_at(position + 8, 10)
+            if len(body) == 10:
+                width = int.from_bytes(body[4:7], "little") + 1
+                height = int.from_bytes(body[7:10], "little") + 1
+        elif kind == b"VP8 " and width is None:
+            body = read_at(position + 8, 10)
+            if len(body) == 10:
+                width, height = (
+                    value & 0x3FFF for value in struct.unpack("<HH", body[6:])
+                )
+        elif kind == b"VP8L" and width is None:
+            body = read_at(position + 8, 5)
+            if len(body) == 5:
+                bits = int.from_bytes(body[1:5], "little")
+                width = (bits & 0x3FFF) + 1
+                height = ((bits >> 14) & 0x3FFF) + 1
+        elif kind == b"EXIF":
+            block = read_at(position + 8, min(length, MAX_EXIF_SIZE))
+            taken = _parse_exif_block(block).taken
+            break
+
+        position += 8 + length + (length & 1)
+
+    return ImageMetadata(taken, width, height)
+
+
+def _file_reader(file: BinaryIO) -> ReadAt:
+    """Создаёт функцию чтения `size` байт по смещению `offset`."""
+    def read_at(offset: int, size: int) -> bytes:
+        file.seek(offset)
+        return file.read(size)
+    return read_at
+
+
+def read_image_metadata(path: str) -> ImageMetadata:
+    """
+    Извлекает дату съёмки и размеры изображения из заголовков файла.
+
+    Args:
+        path (str): Путь к изображению.
+
+    Returns:
+        ImageMetadata: Найденные метаданные. Отсутствующие значения —
+            None; при ошибке чтения или неизвестном формате все поля None.
+    """
+    try:
+        with open(path, "rb") as file:
+            head = file.read(12)
+            read_at = _file_reader(file)
+
+            if head.startswith(b"\xff\xd8"):
+                return _parse_jpeg(read_at)
+            if head.startswith(PNG_SIGNATURE):
+                return _parse_png(read_at)
+            if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+                return _parse_webp(read_at)
+            if head[:4] in (b"II*\0", b"MM\0*"):
+                return _parse_tiff(read_at)
+    except (OSError, struct.error):
+        pass
+    return EMPTY_METADATA
+
+
+def _read_taken(path: str) -> int | None:
+    """Возвращает только дату съёмки изображения."""
+    return read_image_metadata(path).taken
+
+
+def resolve_timestamps(
+    scans: Iterable[DirectoryScan],
+    source: str = "mtime",
+    max_workers: int = DEFAULT_METADATA_WORKERS,
+) -> Iterator[DirectoryScan]:
+    """
+    Подставляет в записи сканирования временные метки из выбранного
+    источника.
+
+    Для источника `exif` время модификации заменяется датой съёмки, если
+    она найдена; заголовки читаются в пуле потоков. Файлы, уже имеющие
+    формат `<timestamp>.<ext>`, не читаются: они не будут переименованы.
+
+    Args:
+        scans (Iterable[DirectoryScan]): Результаты сканирования.
+        source (str): Источник временной метки (`TIMESTAMP_SOURCES`).
+        max_workers (int): Максимальное число потоков чтения.
+
+    Yields:
+        DirectoryScan: Результаты сканирования с выбранными метками.
+    """
+    if source == "mtime":
+        yield from scans
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for scan in scans:
+            indexes = [
+                index for index, record in enumerate(scan.images)
+                if not is_already_renamed(record.filename)
+            ]
+            if not indexes:
+                yield scan
+                continue
+
+            images = list(scan.images)
+            paths = [
+                os.path.join(scan.root, images[index].filename)
+                for index in indexes
+            ]
+            for index, taken in zip(indexes, executor.map(_read_taken, paths)):
+                if taken is not None:
+                    images[index] = images[index]._replace(mtime=taken)
+            yield scan._replace(images=images)
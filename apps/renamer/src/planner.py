@@ -0,0 +1,107 @@
+"""
+Планирование переименований для Renamer.
+
+Целевые имена назначаются в памяти по индексу занятых имён каждой
+директории, который строится один раз по результатам сканирования.
+Разрешение коллизий временных меток не обращается к файловой системе.
+"""
+import os
+from typing import Iterable, Iterator, NamedTuple
+
+from .scanner import DirectoryScan
+from .utils import generate_new_filename, is_already_renamed
+
+
+class RenameOp(NamedTuple):
+    """Запланированное переименование файла внутри одной директории."""
+    root: str
+    filename: str
+    new_filename: str
+
+
+def plan_directory(scan: DirectoryScan) -> tuple[list[RenameOp], int]:
+    """
+    Назначает новые имена изображениям одной директории.
+
+    Индекс занятых имён учитывает как существующие файлы, так и
+    переименования, уже запланированные в этом же пакете: целевое имя
+    занимается сразу, а исходное освобождается. Имена сравниваются без
+    учёта регистра, чтобы план оставался безопасным на
+    регистронезависимых файловых системах.
+
+    Для каждой пары (временная метка, расширение) запоминается последняя
+    выданная метка, поэтому серия из тысяч файлов с одинаковым mtime
+    разрешается за линейное, а не квадратичное время.
+
+    Args:
+        scan (DirectoryScan): Результат сканирования директории.
+
+    Returns:
+        tuple[list[RenameOp], int]: Список переименований и количество
+            пропущенных (уже переименованных) файлов.
+    """
+    taken: set[str] = {name.casefold() for name in scan.names}
+    last_assigned: dict[tuple[int, str], int] = {}
+    operations: list[RenameOp] = []
+    skipped: int = 0
+
+    for record in scan.images:
+        if is_already_renamed(record.filename):
+            skipped += 1
+            continue
+
+        base_timestamp = int(record.mtime)
+        key = (base_timestamp, os.path.splitext(record.filename)[1].lower())
+        timestamp = last_assigned.get(key, base_timestamp)
+        new_filename = generate_new_filename(record.filename, timestamp)
+
+        # Разрешаем коллизии временных меток
+        while new_filename.casefold() in taken:
+            timestamp += 1
+            new_filename = generate_new_filename(record.filename, timestamp)
+
+        last_assigned[key] = timestamp
+        taken.discard(record.filename.casefold())
+        taken.add(new_filename.casefold())
+        operations.append(RenameOp(scan.root, record.filename, new_filename))
+
+    return operations, skipped
+
+
+def iter_plans(
+    scans: Iterable[DirectoryScan],
+) -> Iterator[tuple[DirectoryScan, list[RenameOp], int]]:
+    """
+    Потоково планирует переименования по мере поступления директорий.
+
+    Args:
+        scans (Iterable[DirectoryScan]): Результаты сканирования.
+
+    Yields:
+        tuple[DirectoryScan, list[RenameOp], int]: Директория, её
+            переименования и количество пропущенных файлов.
+    """
+    for scan in scans:
+        operations, skipped = plan_directory(scan)
+        yield scan, operations, skipped
+
+
+def plan_renames(scans: Iterable[DirectoryScan]) -> tuple[list[RenameOp], int]:
+    """
+    Строит план переименований для набора директорий.
+
+    Args:
+        scans (Iterable[DirectoryScan]): Результаты сканирования.
+
+    Returns:
+        tuple[list[RenameOp], int]: Полный список переименований и общее
+            количество пропущенных файлов.
+    """
+    operations: list[RenameOp] = []
+    skipped: int = 0
+
+    for _, directory_operations, directory_skipped in iter_plans(scans):
+        operations.extend(directory_operations)
+        skipped += directory_skipped
+
+    return operations, skipped
@@ -0,0 +1,239 @@
+"""
+Сканер файловой системы для Renamer.
+
+Обходит дерево директорий через `os.scandir`, переиспользуя данные
+`DirEntry`, и распределяет поддиректории по ограниченному пулу потоков.
+Результаты можно получать целиком или потоком, по одной директории.
+За один проход возвращает записи `(root, filename, mtime, size)`, поэтому
+этапу переименования не требуется повторно вызывать `stat`, а также набор
+всех имён в каждой директории для разрешения коллизий в памяти.
+Директории, исключённые правилами `IgnoreMatcher`, не открываются.
+"""
+import os
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+try:
+    from apps.shared import profiling
+except ImportError:  # Автономный запуск из директории `apps`
+    from shared import profiling
+
+from .ignore import IgnoreMatcher
+from .manifest import DirectoryStamp, Manifest, get_directory_stamp
+from .utils import is_image
+
+DEFAULT_SCAN_WORKERS: int = min(32, (os.cpu_count() or 1) + 4)
+
+
+class ImageRecord(NamedTuple):
+    """Найденное изображение вместе с уже полученными данными `stat`."""
+    root: str
+    filename: str
+    mtime: float
+    size: int
+
+
+class DirectoryScan(NamedTuple):
+    """Результат сканирования одной директории."""
+    root: str
+    images: list[ImageRecord]
+    names: set[str]
+    subdirs: list[str]
+    stamp: DirectoryStamp | None = None
+    cached: bool = False
+
+
+def _scan_directory(
+    path: str,
+    manifest: Manifest | None = None,
+    ignore: IgnoreMatcher | None = None,
+    prefix: str = "",
+) -> DirectoryScan:
+    """
+    Сканирует одну директорию без рекурсии.
+
+    Поведение повторяет `os.walk`: символические ссылки на директории
+    не раскрываются, а ошибки доступа молча пропускаются.
+
+    Если передан манифест и директория не изменилась с прошлого запуска,
+    её содержимое не читается: возвращаются только сохранённые имена
+    вложенных директорий.
+
+    Исключённые правилами изображения не попадают в результат, но их
+    имена остаются в наборе занятых. Вложенные директории возвращаются
+    все: правила к ним применяет `iter_directories()`. Записи манифеста
+    действуют только при тех же правилах (`Manifest.rules`).
+
+    Args:
+        path (str): Путь к директории.
+        manifest (Manifest | None): Манифест для инкрементального запуска.
+        ignore (IgnoreMatcher | None): Правила исключения.
+        prefix (str): Путь директории относительно корня обхода с `/` на
+            конце (пустая строка для корня).
+
+    Returns:
+        DirectoryScan: Результат сканирования директории.
+    """
+    images: list[ImageRecord] = []
+    names: set[str] = set()
+    subdirs: list[str] = []
+    stamp: DirectoryStamp | None = None
+
+    if manifest is not None:
+        try:
+            stamp = get_directory_stamp(path)
+        except OSError:
+            return DirectoryScan(path, images, names, subdirs)
+
+        cached_subdirs = manifest.lookup(path, stamp)
+        if cached_subdirs is not None:
+            return DirectoryScan(
+                path, images, names, cached_subdirs, stamp, cached=True
+            )
+
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                names.add(entry.name)
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                        continue
+                    if not is_image(entry.name) or not entry.is_file():
+                        continue
+                    if ignore and ignore.match(prefix + entry.name):
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                images.append(
+                    ImageRecord(path, entry.name, stat.st_mtime, stat.st_size)
+                )
+    except OSError:
+        pass
+
+    images.sort()
+    return DirectoryScan(path, images, names, subdirs, stamp)
+
+
+def iter_directories(
+    directory: str | Path,
+    max_workers: int = DEFAULT_SCAN_WORKERS,
+    manifest: Manifest | None = None,
+    max_pending: int | None = None,
+    ignore: IgnoreMatcher | None = None,
+) -> Iterator[DirectoryScan]:
+    """
+    Рекурсивно сканирует директорию, выдавая результаты по мере готовности.
+
+    Каждая поддиректория сканируется отдельной задачей в пуле потоков,
+    что особенно заметно ускоряет обход сетевых хранилищ (NAS), где
+    основное время уходит на ожидание ответа файловой системы.
+
+    Одновременно выполняется не более `max_pending` задач, а ещё не
+    отправленные в пул директории хранятся только как пути. Пока
+    потребитель обрабатывает очередной результат, новые задачи не
+    ставятся, поэтому расход памяти не зависит от размера дерева.
+
+    Args:
+        directory (str | Path): Корневая директория для обхода.
+        max_workers (int): Максимальное число потоков сканирования.
+        manifest (Manifest | None): Манифест, позволяющий пропускать
+            директории, не изменившиеся с прошлого запуска.
+        max_pending (int | None): Максимальное число задач в пуле.
+            По умолчанию — удвоенное число потоков.
+        ignore (IgnoreMatcher | None): Правила исключения. Исключённые
+            директории не ставятся в очередь, и их поддеревья не читаются.
+
+    Yields:
+        DirectoryScan: Результат сканирования очередной директории.
+    """
+    max_pending = max_pending or max_workers * 2
+    # Стек (обход в глубину) держит очередь путей короче, чем обход в ширину
+    # Элементы очереди: путь и путь относительно корня для правил исключения
+    queue: list[tuple[str, str]] = [(os.fspath(directory), "")]
+    pending: dict[Future, str] = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while queue or pending:
+            while queue and len(pending) < max_pending:
+                path, prefix = queue.pop()
+                future = executor.submit(
+                    _scan_directory, path, manifest, ignore, prefix
+                )
+                pending[future] = prefix
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                prefix = pending.pop(future)
+                scan = future.result()
+                # Счётчики обновляются здесь, а не в потоках сканирования,
+                # по одному разу на директорию
+                profiling.count("renamer.directories_scanned")
+                profiling.count("renamer.entries_scanned", len(scan.names))
+                profiling.count("renamer.stat_calls", len(scan.images))
+                profiling.count("renamer.directories_cached", scan.cached)
+                for name in scan.subdirs:
+                    relative = prefix + name
+                    if ignore and ignore.match(relative, is_dir=True):
+                        continue
+                    queue.append(
+                        (os.path.join(scan.root, name), relative + "/")
+                    )
+                yield scan
+
+
+def scan_directories(
+    directory: str | Path,
+    max_workers: int = DEFAULT_SCAN_WORKERS,
+    manifest: Manifest | None = None,
+    ignore: IgnoreMatcher | None = None,
+) -> list[DirectoryScan]:
+    """
+    Рекурсивно сканирует директорию, группируя результаты по поддиректориям.
+
+    Args:
+        directory (str | Path): Корневая директория для обхода.
+        max_workers (int): Максимальное число потоков сканирования.
+        manifest (Manifest | None): Манифест, позволяющий пропускать
+            директории, не изменившиеся с прошлого запуска.
+        ignore (IgnoreMatcher | None): Правила исключения.
+
+    Returns:
+        list[DirectoryScan]: Результаты сканирования, отсортированные
+            по пути директории.
+    """
+    scans = list(iter_directories(
+        directory, max_workers, manifest, ignore=ignore
+    ))
+    scans.sort(key=lambda scan: scan.root)
+    return scans
+
+
+def scan_images(
+    directory: str | Path,
+    max_workers: int = DEFAULT_SCAN_WORKERS,
+    ignore: IgnoreMatcher | None = None,
+) -> list[ImageRecord]:
+    """
+    Рекурсивно собирает изображения в директории.
+
+    Args:
+        directory (str | Path): Корневая директория для обхода.
+        max_workers (int): Максимальное число потоков сканирования.
+        ignore (IgnoreMatcher | None): Правила исключения.
+
+    Returns:
+        list[ImageRecord]: Записи об изображениях, отсортированные по пути.
+    """
+    return [
+        record
+        for scan in scan_directories(directory, max_workers, ignore=ignore)
+        for record in scan.images
+    ]
@@ -1,8 +1,12 @@
 import os
 
-SUPPORTED_IMAGE_EXTENSIONS: set = {
-    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'
-}
+try:
+    from apps.shared.cache import get_cache_dir
+    from apps.shared.images import SUPPORTED_IMAGE_EXTENSIONS
+except ImportError:  # Автономный запуск из директории `apps`
+    from shared.cache import get_cache_dir
+    from shared.images import SUPPORTED_IMAGE_EXTENSIONS
+
 LENGTH_UNIX_TIME: int = 10
 
 
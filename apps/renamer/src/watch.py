@@ -0,0 +1,457 @@
+"""
+Отслеживание новых изображений для режима наблюдения Renamer.
+
+На Linux используется inotify (через `ctypes`, без внешних зависимостей):
+ядро само сообщает о записанных и перемещённых в дерево файлах, поэтому
+работа на событие пропорциональна числу новых файлов, а не размеру
+коллекции. На других системах, а также при исчерпании лимита
+`fs.inotify.max_user_watches`, используется опрос: на каждом шаге
+проверяются только отпечатки директорий (`get_directory_stamp()`), а
+читаются лишь изменившиеся директории. В них обрабатываются все ещё не
+переименованные изображения, в том числе появившиеся до запуска.
+
+События не обрабатываются сразу: файл считается готовым, когда его
+размер и mtime не меняются в течение `settle` секунд. Так недокачанные
+и ещё копируемые файлы не переименовываются раньше времени.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import stat
+import struct
+import sys
+from abc import ABC, abstractmethod
+from time import monotonic, sleep
+from typing import Callable, Iterator
+
+from .ignore import IgnoreMatcher
+from .manifest import DirectoryStamp, get_directory_stamp
+from .planner import RenameOp
+from .utils import generate_new_filename, is_already_renamed, is_image
+
+WATCH_BACKENDS: tuple[str, ...] = ("auto", "inotify", "poll")
+DEFAULT_SETTLE_SECONDS: float = 2.0
+DEFAULT_POLL_INTERVAL: float = 5.0
+INOTIFY_BUFFER_SIZE: int = 64 * 1024
+
+# Флаги inotify из <sys/inotify.h>
+IN_CLOSE_WRITE: int = 0x00000008
+IN_MOVED_TO: int = 0x00000080
+IN_CREATE: int = 0x00000100
+IN_DELETE_SELF: int = 0x00000400
+IN_MOVE_SELF: int = 0x00000800
+IN_Q_OVERFLOW: int = 0x00004000
+IN_IGNORED: int = 0x00008000
+IN_ONLYDIR: int = 0x01000000
+IN_ISDIR: int = 0x40000000
+INOTIFY_MASK: int = (
+    IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+INOTIFY_EVENT = struct.Struct("iIII")
+
+FileSignature = tuple[int, int] | None
+
+
+def _file_signature(path: str) -> FileSignature:
+    """Возвращает `(size, mtime_ns)` файла или None, если он недоступен."""
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(file_stat.st_mode):
+        return None
+    return file_stat.st_size, file_stat.st_mtime_ns
+
+
+def _iter_subdirectories(
+    root: str,
+    skip: Callable[[str], bool] | None = None,
+) -> Iterator[str]:
+    """
+    Обходит дерево директорий, не читая данные файлов.
+
+    Директории, для которых `skip` возвращает True, не открываются.
+    """
+    queue = [root]
+    while queue:
+        path = queue.pop()
+        yield path
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if not entry.is_dir(follow_symlinks=False):
+                            continue
+                        if skip is None or not skip(entry.path):
+                            queue.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+def plan_file(path: str) -> RenameOp | None:
+    """
+    Назначает новое имя одному готовому файлу.
+
+    Занятость имени проверяется на диске (`os.path.lexists`), поэтому
+    стоимость не зависит от размера директории. Операции выполняются по
+    одной, так что следующая проверка уже видит результат предыдущей.
+
+    Args:
+        path (str): Путь к файлу.
+
+    Returns:
+        RenameOp | None: Переименование или None, если файл не нужно
+            (или уже нельзя) переименовывать.
+    """
+    root, filename = os.path.split(path)
+    if not is_image(filename) or is_already_renamed(filename):
+        return None
+    try:
+        timestamp = int(os.stat(path).st_mtime)
+    except OSError:
+        return None
+
+    new_filename = generate_new_filename(filename, timestamp)
+    while os.path.lexists(os.path.join(root, new_filename)):
+        timestamp += 1
+        new_filename = generate_new_filename(filename, timestamp)
+    return RenameOp(root, filename, new_filename)
+
+
+class Watcher(ABC):
+    """
+    Общая часть наблюдателей: очередь файлов и ожидание их готовности.
+
+    Наследники реализуют `_collect()`, который ждёт событий файловой
+    системы не дольше `timeout` секунд и передаёт новые файлы в
+    `_touch()`.
+    """
+
+    name: str = ""
+
+    def __init__(
+        self,
+        root: str,
+        settle: float = DEFAULT_SETTLE_SECONDS,
+        ignore: IgnoreMatcher | None = None,
+    ):
+        """
+        Args:
+            root (str): Абсолютный путь к наблюдаемой директории.
+            settle (float): Сколько секунд файл должен оставаться
+                неизменным, чтобы считаться готовым.
+            ignore (IgnoreMatcher | None): Правила исключения.
+        """
+        self.root = root
+        self.settle = settle
+        self.ignore = ignore
+        self._pending: dict[str, tuple[float, FileSignature]] = {}
+
+    def _ignored(self, path: str, is_dir: bool = False) -> bool:
+        """Проверяет путь по правилам исключения."""
+        if not self.ignore:
+            return False
+        relative = os.path.relpath(path, self.root).replace(os.sep, "/")
+        return self.ignore.match(relative, is_dir)
+
+    def _ignored_dir(self, path: str) -> bool:
+        """`_ignored()` для директорий (для `_iter_subdirectories()`)."""
+        return self._ignored(path, is_dir=True)
+
+    def _touch(self, path: str, reset: bool = True) -> None:
+        """
+        Ставит файл в очередь ожидания готовности.
+
+        Args:
+            path (str): Путь к файлу.
+            reset (bool): Если False — уже ожидающий файл не перезапускает
+                отсчёт времени.
+        """
+        filename = os.path.basename(path)
+        if not is_image(filename) or is_already_renamed(filename):
+            return
+        if not reset and path in self._pending:
+            return
+        if self._ignored(path):
+            return
+        self._pending[path] = (monotonic(), _file_signature(path))
+
+    def _touch_tree(self, directory: str) -> None:
+        """Ставит в очередь все изображения директории (без рекурсии)."""
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    self._touch(entry.path, reset=False)
+        except OSError:
+            pass
+
+    def _settled(self) -> list[str]:
+        """
+        Возвращает файлы, не менявшиеся последние `settle` секунд.
+
+        Файл, изменившийся с прошлой проверки, остаётся в очереди с
+        новым отсчётом времени; исчезнувший файл удаляется из очереди.
+        """
+        now = monotonic()
+        ready: list[str] = []
+        for path, (seen, signature) in list(self._pending.items()):
+            if now - seen < self.settle:
+                continue
+            current = _file_signature(path)
+            if current is None:
+                del self._pending[path]
+            elif current != signature:
+                self._pending[path] = (now, current)
+            else:
+                del self._pending[path]
+                ready.append(path)
+        ready.sort()
+        return ready
+
+    @abstractmethod
+    def _collect(self, timeout: float | None) -> None:
+        """Ждёт событий файловой системы не дольше `timeout` секунд."""
+
+    def close(self) -> None:
+        """Освобождает ресурсы наблюдателя."""
+
+    def operations(self) -> Iterator[RenameOp]:
+        """
+        Бесконечно выдаёт переименования готовых новых файлов.
+
+        Yields:
+            RenameOp: Переименование очередного готового файла.
+        """
+        while True:
+            timeout = None
+            if self._pending:
+                oldest = min(seen for seen, _ in self._pending.values())
+                timeout = max(0.0, oldest + self.settle - monotonic())
+            self._collect(timeout)
+            for path in self._settled():
+                op = plan_file(path)
+                if op is not None:
+                    yield op
+
+    def __enter__(self) -> "Watcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class InotifyWatcher(Watcher):
+    """Наблюдатель на основе inotify (только Linux)."""
+
+    name = "inotify"
+
+    def __init__(
+        self,
+        root: str,
+        settle: float = DEFAULT_SETTLE_SECONDS,
+        ignore: IgnoreMatcher | None = None,
+    ):
+        """
+        Инициализирует inotify и ставит наблюдение на всё дерево, кроме
+        исключённых директорий.
+
+        Raises:
+            OSError: Если inotify недоступен или исчерпан лимит
+                наблюдений.
+        """
+        super().__init__(root, settle, ignore)
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify доступен только в Linux")
+
+        self._libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+        )
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("библиотека C не поддерживает inotify")
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._watches: dict[int, str] = {}
+
+        try:
+            for path in _iter_subdirectories(root, self._ignored_dir):
+                self._add_watch(path)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, path: str) -> None:
+        """Ставит наблюдение на одну директорию."""
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(path), INOTIFY_MASK
+        )
+        if wd < 0:
+            errno = ctypes.get_errno()
+            # Директория могла исчезнуть до постановки наблюдения
+            if errno in (2, 20):  # ENOENT, ENOTDIR
+                return
+            raise OSError(errno, os.strerror(errno), path)
+        self._watches[wd] = path
+
+    def _add_tree(self, directory: str) -> None:
+        """
+        Наблюдает за новой директорией и её поддеревом.
+
+        Файлы могли появиться до постановки наблюдения (или директория
+        перемещена в дерево целиком), поэтому её содержимое читается.
+        """
+        if self._ignored_dir(directory):
+            return
+        for path in _iter_subdirectories(directory, self._ignored_dir):
+            self._add_watch(path)
+            self._touch_tree(path)
+
+    def _collect(self, timeout: float | None) -> None:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return
+        try:
+            data = os.read(self._fd, INOTIFY_BUFFER_SIZE)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Очередь ядра переполнена: события потеряны
+                for path in list(self._watches.values()):
+                    self._touch_tree(path)
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            directory = self._watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE):
+                self._touch(path)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher(Watcher):
+    """Наблюдатель, периодически сверяющий отпечатки директорий."""
+
+    name = "poll"
+
+    def __init__(
+        self,
+        root: str,
+        settle: float = DEFAULT_SETTLE_SECONDS,
+        interval: float = DEFAULT_POLL_INTERVAL,
+        ignore: IgnoreMatcher | None = None,
+    ):
+        """
+        Запоминает отпечатки всех директорий дерева, кроме исключённых.
+
+        Args:
+            root (str): Абсолютный путь к наблюдаемой директории.
+            settle (float): Время готовности файла в секундах.
+            interval (float): Интервал опроса в секундах.
+            ignore (IgnoreMatcher | None): Правила исключения.
+        """
+        super().__init__(root, settle, ignore)
+        self.interval = interval
+        self._stamps: dict[str, DirectoryStamp] = {}
+        for path in _iter_subdirectories(root, self._ignored_dir):
+            try:
+                self._stamps[path] = get_directory_stamp(path)
+            except OSError:
+                continue
+
+    def _rescan(self, directory: str) -> None:
+        """Читает изменившуюся директорию: новые файлы и поддиректории."""
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if not is_dir:
+                        self._touch(entry.path, reset=False)
+                    elif (
+                        entry.path not in self._stamps
+                        and not self._ignored_dir(entry.path)
+                    ):
+                        for path in _iter_subdirectories(
+                            entry.path, self._ignored_dir
+                        ):
+                            try:
+                                self._stamps[path] = get_directory_stamp(path)
+                            except OSError:
+                                continue
+                            self._touch_tree(path)
+        except OSError:
+            pass
+
+    def _collect(self, timeout: float | None) -> None:
+        if timeout is not None:
+            timeout = min(timeout, self.interval)
+        sleep(self.interval if timeout is None else timeout)
+
+        for path, stamp in list(self._stamps.items()):
+            try:
+                current = get_directory_stamp(path)
+            except OSError:
+                del self._stamps[path]
+                continue
+            if current != stamp:
+                self._stamps[path] = current
+                self._rescan(path)
+
+
+def open_watcher(
+    root: str,
+    backend: str = "auto",
+    settle: float = DEFAULT_SETTLE_SECONDS,
+    interval: float = DEFAULT_POLL_INTERVAL,
+    ignore: IgnoreMatcher | None = None,
+) -> Watcher:
+    """
+    Создаёт наблюдатель для директории.
+
+    Args:
+        root (str): Абсолютный путь к наблюдаемой директории.
+        backend (str): `inotify`, `poll` или `auto` — inotify, если он
+            доступен, иначе опрос.
+        settle (float): Время готовности файла в секундах.
+        interval (float): Интервал опроса в секундах.
+        ignore (IgnoreMatcher | None): Правила исключения.
+
+    Returns:
+        Watcher: Наблюдатель.
+
+    Raises:
+        OSError: Если inotify выбран явно, но недоступен.
+    """
+    if backend in ("auto", "inotify"):
+        try:
+            return InotifyWatcher(root, settle, ignore)
+        except OSError:
+            if backend == "inotify":
+                raise
+    return PollingWatcher(root, settle, interval, ignore)
@@ -0,0 +1 @@
+# Пакет shared — общие модули приложений Repo-Tools.
@@ -0,0 +1,23 @@
+"""
+Директория кэша приложений Repo-Tools.
+"""
+import os
+from pathlib import Path
+
+CACHE_DIR_NAME: str = "repo-tools"
+
+
+def get_cache_dir() -> Path:
+    """
+    Возвращает директорию кэша Repo-Tools, создавая её при необходимости.
+
+    Используется `$XDG_CACHE_HOME`, а если переменная не задана —
+    `~/.cache`.
+
+    Returns:
+        Path: Путь к директории кэша.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    path = Path(base) / CACHE_DIR_NAME
+    path.mkdir(parents=True, exist_ok=True)
+    return path
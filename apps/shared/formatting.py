@@ -0,0 +1,22 @@
+"""
+Форматирование значений для вывода приложений Repo-Tools.
+"""
+
+
+def format_size(size: int | float) -> str:
+    """
+    Форматирует размер в байтах в человекочитаемый вид.
+
+    Args:
+        size (int | float): Размер в байтах.
+
+    Returns:
+        str: Размер с двоичной единицей измерения, например `1.5 МиБ`.
+    """
+    if size < 1024:
+        return f"{size} Б"
+    for unit in ("КиБ", "МиБ", "ГиБ"):
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+    return f"{size / 1024:.1f} ТиБ"
@@ -0,0 +1,9 @@
+"""
+Форматы изображений, с которыми работают приложения Repo-Tools.
+"""
+
+# Расширения (в нижнем регистре, с точкой), которые Renamer считает
+# изображениями, а GitOps по умолчанию предлагает хранить в Git LFS
+SUPPORTED_IMAGE_EXTENSIONS: set = {
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'
+}
@@ -0,0 +1,334 @@
+"""
+Профилирование этапов Repo-Tools.
+
+Профилирование включается флагом `--profile [FILE]` или переменной
+окружения `REPO_TOOLS_PROFILE` (`1` — файл по умолчанию, иначе — путь
+к файлу). Пока оно выключено, `phase()` возвращает общий пустой
+контекстный менеджер, а `count()` и `record_subprocess()` сразу
+возвращаются, поэтому инструментированный код не платит ни за
+замеры, ни за хранение данных.
+
+Во включённом режиме записываются:
+  - этапы (`phase()`): вложенные интервалы с длительностью;
+  - внешние процессы (`record_subprocess()`): команда, длительность,
+    код возврата и объём захваченного вывода;
+  - счётчики (`count()`): просканированные файлы, вызовы `stat`,
+    запуски Git и т. п.
+
+При завершении программы трасса записывается в JSON в формате Trace
+Event (открывается в `chrome://tracing` и Perfetto), а в консоль
+выводится сводная таблица.
+"""
+import atexit
+import json
+import os
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import Iterator
+
+from .cache import get_cache_dir
+
+PROFILE_ENV_VAR: str = "REPO_TOOLS_PROFILE"
+PROFILES_DIR_NAME: str = "profiles"
+# Значения переменной окружения, означающие «включить с файлом по умолчанию»
+ENABLE_VALUES: frozenset[str] = frozenset({"1", "true", "yes", "on"})
+DISABLE_VALUES: frozenset[str] = frozenset({"", "0", "false", "no", "off"})
+
+enabled: bool = False
+
+_NULL_CONTEXT = nullcontext()
+_lock = threading.Lock()
+_local = threading.local()
+_started: float = 0.0
+_trace_path: Path | None = None
+_events: list[dict] = []
+_counters: dict[str, int] = {}
+
+
+def default_trace_path() -> Path:
+    """
+    Возвращает путь к файлу трассы по умолчанию.
+
+    Трассы хранятся в кэше Repo-Tools (`$XDG_CACHE_HOME/repo-tools/
+    profiles/`), имя файла содержит время запуска.
+
+    Returns:
+        Path: Путь к новому файлу трассы.
+    """
+    path = get_cache_dir() / PROFILES_DIR_NAME
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return path / f"profile-{stamp}-{os.getpid()}.json"
+
+
+def enable(trace_path: str | Path | None = None) -> None:
+    """
+    Включает профилирование до конца работы программы.
+
+    Повторный вызов только меняет путь к файлу трассы.
+
+    Args:
+        trace_path (str | Path | None): Файл для трассы. По умолчанию —
+            `default_trace_path()`.
+    """
+    global enabled, _started, _trace_path
+    _trace_path = Path(trace_path) if trace_path else default_trace_path()
+    if enabled:
+        return
+    enabled = True
+    _started = perf_counter()
+    atexit.register(finish)
+
+
+def setup(option: str | None = None) -> None:
+    """
+    Включает профилирование по флагу CLI или переменной окружения.
+
+    Флаг имеет приоритет над переменной `REPO_TOOLS_PROFILE`.
+
+    Args:
+        option (str | None): Значение флага `--profile`: путь к файлу,
+            пустая строка (флаг без аргумента) или None (флага нет).
+    """
+    if option is None:
+        option = os.environ.get(PROFILE_ENV_VAR, "")
+        if option.strip().lower() in DISABLE_VALUES:
+            return
+    if option.strip().lower() in ENABLE_VALUES | {""}:
+        option = None
+    enable(option)
+
+
+def _depth() -> int:
+    """Возвращает глубину вложенности этапов в текущем потоке."""
+    return getattr(_local, "depth", 0)
+
+
+@contextmanager
+def _phase(name: str, args: dict) -> Iterator[None]:
+    """Замеряет этап (реализация `phase()` во включённом режиме)."""
+    depth = _depth()
+    _local.depth = depth + 1
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - started
+        _local.depth = depth
+        _add_event("phase", name, started, elapsed, dict(args, depth=depth))
+
+
+def phase(name: str, **args):
+    """
+    Возвращает контекстный менеджер, замеряющий этап.
+
+    Пример:
+        with profiling.phase("renamer.scan", root=root):
+            scans = scan_directories(root)
+
+    Args:
+        name (str): Имя этапа в виде `<приложение>.<этап>`.
+        **args: Дополнительные данные для трассы.
+
+    Returns:
+        Контекстный менеджер (пустой, если профилирование выключено).
+    """
+    if not enabled:
+        return _NULL_CONTEXT
+    return _phase(name, args)
+
+
+def count(name: str, value: int = 1) -> None:
+    """
+    Увеличивает счётчик.
+
+    Args:
+        name (str): Имя счётчика, например `renamer.files_scanned`.
+        value (int): На сколько увеличить.
+    """
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def record_subprocess(
+    args: list[str],
+    started: float,
+    elapsed: float,
+    returncode: int | None,
+    output: str | bytes | None = None,
+) -> None:
+    """
+    Записывает запуск внешнего процесса.
+
+    Имя события — программа и первый аргумент (`git status`), поэтому
+    в сводке запуски группируются по подкомандам.
+
+    Args:
+        args (list[str]): Командная строка.
+        started (float): Время запуска по `perf_counter()`.
+        elapsed (float): Длительность в секундах.
+        returncode (int | None): Код возврата (None — процесс не
+            удалось запустить).
+        output (str | bytes | None): Захваченный вывод (учитывается
+            только его размер в байтах).
+    """
+    if not enabled:
+        return
+    if isinstance(output, str):
+        output = output.encode("utf-8", "surrogateescape")
+    captured = len(output or b"")
+    name = " ".join(args[:2])
+    program = os.path.basename(args[0]) if args else "?"
+    with _lock:
+        _counters[f"{program}.invocations"] = (
+            _counters.get(f"{program}.invocations", 0) + 1
+        )
+        _counters[f"{program}.bytes_captured"] = (
+            _counters.get(f"{program}.bytes_captured", 0) + captured
+        )
+    _add_event("subprocess", name, started, elapsed, {
+        "argv": list(args),
+        "returncode": returncode,
+        "captured": captured,
+    })
+
+
+def _add_event(
+    category: str, name: str, started: float, elapsed: float, args: dict
+) -> None:
+    """Добавляет событие в трассу."""
+    event = {
+        "name": name,
+        "cat": category,
+        "ph": "X",
+        "ts": round((started - _started) * 1e6),
+        "dur": round(elapsed * 1e6),
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "args": args,
+    }
+    with _lock:
+        _events.append(event)
+
+
+def summarize() -> list[tuple[str, str, int, float, float]]:
+    """
+    Сводит события по имени.
+
+    Returns:
+        list[tuple[str, str, int, float, float]]: Категория, имя, число
+            вызовов, суммарное и максимальное время в секундах;
+            отсортировано по убыванию суммарного времени.
+    """
+    totals: dict[tuple[str, str], list] = {}
+    with _lock:
+        events = list(_events)
+    for event in events:
+        item = totals.setdefault((event["cat"], event["name"]), [0, 0, 0])
+        duration = event["dur"] / 1e6
+        item[0] += 1
+        item[1] += duration
+        item[2] = max(item[2], duration)
+    rows = [
+        (category, name, calls, total, longest)
+        for (category, name), (calls, total, longest) in totals.items()
+    ]
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows
+
+
+def write_trace(path: str | Path) -> Path:
+    """
+    Записывает трассу в JSON (формат Trace Event).
+
+    Args:
+        path (str | Path): Путь к файлу трассы.
+
+    Returns:
+        Path: Путь к записанному файлу.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _lock:
+        trace = {
+            "traceEvents": list(_events),
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "elapsed": perf_counter() - _started,
+                "counters": dict(_counters),
+            },
+        }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(trace, file, ensure_ascii=False, indent=1)
+        file.write("\n")
+    return path
+
+
+def print_summary(
+    trace_path: Path | None = None,
+    error: OSError | None = None,
+) -> None:
+    """
+    Выводит сводные таблицы этапов, процессов и счётчиков.
+
+    Args:
+        trace_path (Path | None): Путь к записанной трассе (для вывода).
+        error (OSError | None): Ошибка записи трассы, если она возникла.
+    """
+    # rich импортируется только при включённом профилировании
+    from rich.console import Console
+    from rich.table import Table
+
+    console = Console()
+    table = Table(
+        title=f"Профиль ({perf_counter() - _started:.3f} с)",
+        show_lines=True,
+    )
+    table.add_column("Тип", style="dim")
+    table.add_column("Этап / команда", style="bold cyan")
+    table.add_column("Вызовов", justify="right")
+    table.add_column("Всего, с", style="bold white", justify="right")
+    table.add_column("Макс., с", justify="right")
+    for category, name, calls, total, longest in summarize():
+        kind = "процесс" if category == "subprocess" else "этап"
+        table.add_row(
+            kind, name, str(calls), f"{total:.3f}", f"{longest:.3f}"
+        )
+    console.print(table)
+
+    if _counters:
+        table = Table(title="Счётчики", show_lines=True)
+        table.add_column("Счётчик", style="bold cyan")
+        table.add_column("Значение", style="bold white", justify="right")
+        for name, value in sorted(_counters.items()):
+            table.add_row(name, str(value))
+        console.print(table)
+
+    if trace_path:
+        console.print(f"Трасса записана в {trace_path}", style="green")
+    if error:
+        console.print(
+            f"Не удалось записать трассу профиля: {error}", style="red"
+        )
+
+
+def finish() -> None:
+    """
+    Записывает трассу и выводит сводку.
+
+    Вызывается автоматически при завершении программы; ошибки записи
+    не прерывают завершение.
+    """
+    if not enabled:
+        return
+    try:
+        path = write_trace(_trace_path or default_trace_path())
+    except OSError as e:
+        print_summary(error=e)
+    else:
+        print_summary(path)